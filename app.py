@@ -1,29 +1,32 @@
+import startup  # первым: отсюда отсчитывается время запуска
+import os
 import sys
+import time
 import asyncio
 import voice  # Ваш модуль для TTS или звукового вывода
+import earcons
+import asr_models
 import sounddevice as sd
-import vosk
-import g4f
-from fuzzywuzzy import fuzz
+import metrics
+import concurrency
+import llm
+from assistant import Assistant, fixed_phrases, default_llm_backend
+from audio_buffer import AudioRingBuffer
+from resample import Resampler
+from chat_view import ChatView
+from scheduler import Scheduler
 import random
-import json
-import queue
-import webbrowser
-from datetime import datetime, timedelta
 import logging
-import subprocess
-import os
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QLineEdit, QMessageBox, QScrollArea, QSizePolicy,
+    QPushButton, QLabel, QLineEdit, QMessageBox, QSizePolicy,
     QSpacerItem, QFrame, QMenu, QMenuBar, QStatusBar, QPlainTextEdit
 )
-from PyQt6.QtGui import QFont, QColor, QPalette, QIcon, QPixmap, QAction
-from PyQt6.QtCore import (
-    Qt, QThread, pyqtSignal, QSize, QTimer,
-    QPropertyAnimation, QEasingCurve
-)
+from PyQt6.QtGui import QFont, QColor, QPalette, QIcon, QPixmap, QAction, QActionGroup
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QTimer
+
+startup.timer.mark("imports_done")
 
 # --- Логирование ---
 logger = logging.getLogger('sonya_assistant_gui')
@@ -36,323 +39,272 @@ if logger.hasHandlers():
     logger.handlers.clear()
 logger.addHandler(console_handler)
 
-# --- Базовый контекст для GPT ---
-base_dialogue = [
-    {
-        "role": "system",
-        "content": (
-            "Ты интеллектуальный голосовой помощник Соня. Твоя задача помогать "
-            "пользователю с решением разных задач, беседовать с ним на различные темы "
-            "и управлять его делами. Важно, все цифры прописывай буквами, например не 8, а восемь. "
-            "Помни, у тебя женский пол. Обязательно запоминай контекст разговора"
-        )
-    }
-]
+# --- Файл расписания будильников и напоминаний ---
+schedule_file = "schedule.json"
+
+# --- Захват аудио для Vosk ---
+audio_blocksize = 8000
+audio_buffer_blocks = 20
+audio_overflow = "drop_oldest"  # или "drop_newest"
+# Частота распознавания: звук с микрофона приводится к ней (resample.py); None — частота устройства
+asr_samplerate = 16000
+# Форматы захвата в порядке предпочтения: (каналы, тип отсчётов)
+capture_formats = [(1, "int16"), (2, "int16"), (1, "float32"), (2, "float32")]
+
+# --- Сроки задач (с): команды из окна и сработавшие таймеры ---
+command_deadline = 120.0
+# Жёсткий предел остановки потока ассистента
+stop_deadline = 2 * concurrency.shutdown_timeout
+
+# --- Локальный эндпойнт метрик (/metrics, /metrics.json); None — не запускать ---
+metrics_port = 9464
+
+audio_buffer_fill_seconds = metrics.gauge(
+    "sonya_audio_buffer_fill_seconds", "Заполненность аудиобуфера, с")
+audio_overruns_total = metrics.counter(
+    "sonya_audio_overruns_total", "Переполнения аудиобуфера")
+audio_dropped_frames_total = metrics.counter(
+    "sonya_audio_dropped_frames_total", "Потерянные при переполнении аудиокадры")
+
+# Модель Vosk при запуске: имя из каталогов asr_models.model_roots или путь к модели
+asr_model_path = "model_small_ru"
+asr_registry = asr_models.ASRModelRegistry()
+
+
+def load_asr_model():
+    return asr_registry.load(asr_model_path)
+
+
+def pick_capture_format(device, samplerate):
+    for channels, dtype in capture_formats:
+        try:
+            sd.check_input_settings(device=device, channels=channels, dtype=dtype,
+                                    samplerate=samplerate)
+            return channels, dtype
+        except (sd.PortAudioError, ValueError):
+            continue
+    raise RuntimeError("Микрофон не поддерживает ни один из форматов capture_formats")
 
-# --- Списки будильников и напоминаний ---
-alarms = []
-reminders = []
 
-# --- Очередь для аудиоданных (Vosk) ---
-q = queue.Queue(maxsize=20)
+def asr_model_future():
+    return startup.future("asr", load_asr_model)
 
-# Инициализация модели Vosk (укажите путь к вашей модели)
-model = vosk.Model("model_small_ru")  
-device = sd.default.device
-samplerate = int(sd.query_devices(device[0], "input")["default_samplerate"])
+
+def tts_model_future():
+    return startup.future("tts", voice.start_pool)
+
+
+def earcons_future():
+    return startup.future("earcons", earcons.preload)
 
 
 class AssistantThread(QThread):
     """
     Поток ассистента, который:
       - Постоянно слушает микрофон (audio_loop),
-      - Проверяет будильники / напоминания (check_alarms),
-      - Обрабатывает команды (process_command).
+      - Срабатывает по будильникам / напоминаниям (scheduler),
+      - Обрабатывает команды (Assistant из assistant.py).
+
+    Блокирующая работа идёт в пулах concurrency.executors (аудио, ASR,
+    TTS, LLM, команды). Задачи цикла — в двух группах: services (запуск,
+    прогрев кэша TTS, микрофон, замер задержки цикла) живут до остановки, jobs (команды
+    из окна, таймеры, смена модели) — со сроком. stop() только просит
+    цикл остановиться; остановка сама завершает группы, ассистента и
+    пулы не дольше stop_deadline.
     """
     update_chat_signal = pyqtSignal(str, str)  # (sender, message)
     notify_signal = pyqtSignal(str)
+    status_signal = pyqtSignal(str)
+    stream_chat_signal = pyqtSignal(str, bool)  # (текст ответа на данный момент, ответ завершён)
 
     def __init__(self):
         super().__init__()
         self.loop = asyncio.new_event_loop()
-        self.tasks = []
-        self.messages = base_dialogue.copy()
-        self.mute_voice = False  # Если True, бот не озвучивает ответы
+        self.services = concurrency.TaskGroup("services")
+        self.jobs = concurrency.TaskGroup("jobs")
+        self.lag_monitor = concurrency.LoopLagMonitor()
+        self._stop_requested = asyncio.Event()
+        self.assistant = Assistant(
+            llm_client=llm.LLMClient(default_llm_backend(), executor=concurrency.executors["llm"]),
+            on_chat=self.update_chat_signal.emit,
+            on_stream=self.stream_chat_signal.emit,
+            on_notify=self.notify_signal.emit,
+            asr_executor=concurrency.executors["asr"],
+        )
+        self.audio_buffer = None  # создаётся в _audio_loop под формат микрофона
+        self.scheduler = Scheduler(schedule_file, on_fire=self._on_timer)
+        self._asr_wanted = None
+
+    @property
+    def mute_voice(self):
+        return self.assistant.mute_voice
+
+    @mute_voice.setter
+    def mute_voice(self, value):
+        self.assistant.mute_voice = value
 
     def run(self):
         asyncio.set_event_loop(self.loop)
         try:
             self.loop.run_until_complete(self.main())
-        except asyncio.CancelledError:
-            pass
         finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
             self.loop.close()
 
     async def main(self):
-        self._greet_user()
-        audio_task = asyncio.create_task(self._audio_loop())
-        alarms_task = asyncio.create_task(self._check_alarms())
-        self.tasks = [audio_task, alarms_task]
+        self.services.create_task(self.lag_monitor.run(), name="loop-lag")
+        self.services.create_task(self._start(), name="start")
+        await self._stop_requested.wait()
         try:
-            await asyncio.gather(*self.tasks)
-        except asyncio.CancelledError:
-            for task in self.tasks:
-                task.cancel()
-            await asyncio.gather(*self.tasks, return_exceptions=True)
-            raise
+            await asyncio.wait_for(self._shutdown(), stop_deadline)
+        except asyncio.TimeoutError:
+            logger.error(f"Ассистент не остановился за {stop_deadline:.0f} с")
+
+    async def _start(self):
+        self.scheduler.start(self.loop)
+        # Приветствие звучит, как только готов TTS; ASR догружается параллельно
+        self.status_signal.emit("Загрузка моделей...")
+        await asyncio.wrap_future(tts_model_future())
+        await self.assistant.greet()
+        await asyncio.wrap_future(asr_model_future())
+        startup.timer.report()
+        # Прогрев кэша TTS в фоне, не задерживая запуск
+        self.services.create_task(voice.warm_up_async(fixed_phrases), name="tts-warm-up")
+        self.services.create_task(self._audio_loop(), name="audio")
+
+    async def _shutdown(self):
+        start = time.perf_counter()
+        self.scheduler.stop()
+        # Сначала источники новой работы (микрофон), затем то, что уже идёт
+        await self.services.close(cancel=True)
+        await asyncio.gather(self.jobs.close(), self.assistant.shutdown())
+        concurrency.executors.shutdown()
+        asr_registry.close()
+        if voice.output is not None:
+            voice.output.close()
+        if voice.pool is not None:
+            voice.pool.close()
+        lag = self.lag_monitor.stats()
+        logger.info(f"Ассистент остановлен за {time.perf_counter() - start:.2f} с; задержка цикла "
+                    f"p99 {lag['p99'] * 1000:.1f} мс, макс. {lag['max'] * 1000:.1f} мс")
 
     def stop(self):
-        for task in self.tasks:
-            task.cancel()
-        self.loop.call_soon_threadsafe(self.loop.stop)
+        """
+        Вызывается из потока Qt: просит цикл остановиться (сама остановка — в _shutdown).
+        """
+        try:
+            self.loop.call_soon_threadsafe(self._stop_requested.set)
+        except RuntimeError:
+            pass  # цикл уже закрыт
+
+    def _submit(self, name, make, deadline=command_deadline):
+        # Из потока Qt: задача создаётся уже в цикле событий, в группе jobs
+        def create():
+            if not self._stop_requested.is_set():
+                self.jobs.create_task(make(), name=name, deadline=deadline)
+        try:
+            self.loop.call_soon_threadsafe(create)
+        except RuntimeError:
+            logger.warning(f"Ассистент остановлен, задача {name} отброшена")
 
     def send_command(self, command: str):
         """
         Вызывается из MainWindow, чтобы передать команду ассистенту.
         """
         self.update_chat_signal.emit("user", command)
-        asyncio.run_coroutine_threadsafe(self._process_command(command), self.loop)
+        self._submit("command", lambda: self.assistant.process_command(command))
+
+    def switch_asr_model(self, name: str):
+        """
+        Вызывается из MainWindow: модель грузится в фоне, распознавание
+        переключается на неё на границе фразы.
+        """
+        self._asr_wanted = name
+        self._submit("asr-model", lambda: self._switch_asr_model(name), deadline=None)
+
+    async def _switch_asr_model(self, name: str):
+        if name == asr_registry.active:
+            return
+        self.status_signal.emit(f"Загрузка модели распознавания {name}...")
+        try:
+            model = await asyncio.wrap_future(asr_registry.load_async(name))
+        except Exception as e:
+            logger.error(f"Не удалось загрузить модель {name}: {e}")
+            self.status_signal.emit(f"Ошибка загрузки модели {name}")
+            return
+        if self._asr_wanted != name:
+            return  # пока грузилась, выбрали другую
+        asr_registry.activate(name, model)
+        self.assistant.switch_model(model)
+        self.status_signal.emit(f"Модель распознавания: {name}")
 
     # --- Основные корутины ---
 
     async def _audio_loop(self):
+        model = await asyncio.wrap_future(asr_model_future())
+        self.status_signal.emit("Готово")
+        device = sd.default.device
+        samplerate = int(sd.query_devices(device[0], "input")["default_samplerate"])
+        channels, dtype = pick_capture_format(device[0], samplerate)
+        self.audio_buffer = AudioRingBuffer(
+            audio_blocksize * audio_buffer_blocks, channels=channels, dtype=dtype,
+            overflow=audio_overflow)
+        self.audio_buffer.attach(asyncio.get_running_loop())
+        # Vosk получает int16 моно на частоте модели, а не сырой поток устройства
+        rate = asr_samplerate or samplerate
+        resampler = None
+        if rate != samplerate or channels != 1 or dtype != "int16":
+            resampler = Resampler(samplerate, rate)
+            logger.info(f"Захват: {samplerate} Гц, {channels} кан., {dtype} → {rate} Гц моно int16")
+        overruns = dropped = 0
         with sd.RawInputStream(
             samplerate=samplerate,
-            blocksize=8000,
+            blocksize=audio_blocksize,
             device=device[0],
-            dtype="int16",
-            channels=1,
+            dtype=dtype,
+            channels=channels,
             callback=self._audio_callback,
         ):
-            rec = vosk.KaldiRecognizer(model, samplerate)
+            self.assistant.start_recognition(model, rate)
             while True:
                 try:
-                    data = await asyncio.get_event_loop().run_in_executor(None, q.get)
-                    if rec.AcceptWaveform(data):
-                        data_text = json.loads(rec.Result())["text"]
-                        await self._recognize(data_text)
+                    block = await self.audio_buffer.read(audio_blocksize)
+                    # Конец блока был записан раньше на всё, что ещё лежит в буфере
+                    captured_at = time.perf_counter() - self.audio_buffer.fill / samplerate
+                    stats = self.audio_buffer.stats
+                    audio_buffer_fill_seconds.set(self.audio_buffer.fill / samplerate)
+                    if stats["overruns"] != overruns:
+                        audio_overruns_total.inc(stats["overruns"] - overruns)
+                        audio_dropped_frames_total.inc(stats["dropped_frames"] - dropped)
+                        overruns, dropped = stats["overruns"], stats["dropped_frames"]
+                        logger.warning(f"Аудиобуфер переполнен: {stats}")
+                    if resampler is not None:
+                        block = resampler.process(block)
+                    await self.assistant.feed(block.tobytes(), captured_at)
                 except asyncio.CancelledError:
                     logger.info("audio_loop отменена")
                     break
                 except Exception as e:
                     logger.error(f"Ошибка распознавания: {e}")
 
-    async def _recognize(self, data: str):
-        logger.info(f"Пользователь сказал: {data}")
-        if self._is_wake_word(data):
-            self._play_sound()
-            command = data.lower()
-            for wake_word in ["соня", "сонька", "сонечка", "sonya"]:
-                command = command.replace(wake_word, "")
-            command = command.strip()
-            if command:
-                await self._process_command(command)
-                self.notify_signal.emit("Соня: Выполнил команду.")
-            else:
-                response = "Я вас слушаю."
-                self._speak(response)
-                self.update_chat_signal.emit("sonya", response)
-                self.notify_signal.emit(response)
-
-    def _is_wake_word(self, data: str) -> bool:
-        # Проверяем, есть ли «соня» (и т.п.) в распознанном тексте
-        wake_words = ["соня", "сонька", "сонечка", "sonya"]
-        for word in wake_words:
-            ratio = fuzz.partial_ratio(data.lower(), word)
-            if ratio > 80:
-                return True
-        return False
-
-    async def _check_alarms(self):
-        try:
-            while True:
-                now = datetime.now()
-                for alarm_time in alarms.copy():
-                    if now >= alarm_time:
-                        response = "Сработал будильник."
-                        self._speak(response)
-                        self.notify_signal.emit(response)
-                        alarms.remove(alarm_time)
-                for reminder_time, reminder_text in reminders.copy():
-                    if now >= reminder_time:
-                        self._speak(reminder_text)
-                        self.notify_signal.emit(reminder_text)
-                        reminders.remove((reminder_time, reminder_text))
-                await asyncio.sleep(30)
-        except asyncio.CancelledError:
-            logger.info("check_alarms отменена")
-
-    async def _process_command(self, command: str):
-        command = command.lower()
-        logger.info(f"Обработка команды: {command}")
-
-        if "открой браузер" in command:
-            response = "Открываю браузер"
-            self._speak(response)
-            self.update_chat_signal.emit("sonya", response)
-            webbrowser.open("https://www.google.com")
-
-        # Добавляйте здесь свои «известные» команды...
+    def _on_timer(self, timer: dict):
+        # Вызывается планировщиком в цикле событий
+        if not self._stop_requested.is_set():
+            self.jobs.create_task(self._fire_timer(timer), name="timer", deadline=command_deadline)
 
+    async def _fire_timer(self, timer: dict):
+        if timer["kind"] == "alarm":
+            self.assistant.play_earcon("alarm")
+            response = "Сработал будильник."
         else:
-            # Любой другой запрос — отправляем в ChatCompletion
-            self._update_chat("user", command)
-            try:
-                response = g4f.ChatCompletion.create(
-                    model="gpt-4o",
-                    messages=self.messages,
-                )
-                if isinstance(response, str):
-                    self._speak(response.lower())
-                    self.update_chat_signal.emit("sonya", response)
-                    self._clear_context()
-                else:
-                    error_msg = "Ошибка: непредвиденный формат ответа."
-                    self._speak(error_msg)
-                    self.update_chat_signal.emit("sonya", error_msg)
-                    self._clear_context()
-            except Exception as e:
-                error_msg = "Произошла ошибка при получении ответа."
-                logger.error(f"Ошибка при генерации ответа: {e}")
-                self._speak(error_msg)
-                self.update_chat_signal.emit("sonya", error_msg)
+            response = timer["text"]
+        await self.assistant.speak(response)
+        self.notify_signal.emit(response)
 
     # --- Вспомогательные методы ---
     def _audio_callback(self, indata, frames, time, status):
-        try:
-            q.put_nowait(bytes(indata))
-        except queue.Full:
-            logger.warning("Очередь аудио переполнена.")
-
-    def _update_chat(self, role: str, content: str):
-        self.messages.append({"role": role, "content": content})
-
-    def _clear_context(self):
-        self.messages = base_dialogue.copy()
-
-    def _speak(self, text: str):
-        if not self.mute_voice:
-            voice.bot_speak(text)
-
-    def _play_sound(self):
-        if sys.platform.startswith("linux"):
-            sound_file = "beep.mp3"
-            if os.path.exists(sound_file):
-                subprocess.call(["paplay", sound_file])
-
-    def _greet_user(self):
-        hour = datetime.now().hour
-        if 5 <= hour < 12:
-            greeting = "Доброе утро! Как я могу помочь тебе сегодня?"
-        elif 12 <= hour < 18:
-            greeting = "Добрый день! Чем могу помочь?"
-        else:
-            greeting = "Добрый вечер! Какие у тебя планы на вечер?"
-        self._speak(greeting)
-        self.update_chat_signal.emit("sonya", greeting)
-
-
-class MessageBubble(QWidget):
-    """
-    Виджет-«пузырёк» для одного сообщения (от пользователя или бота).
-    """
-    def __init__(self, message, sender, avatar_path=None):
-        super().__init__()
-        self.sender = sender
-        self.message = message
-        self.avatar_path = avatar_path
-        self.init_ui()
-        self.animate_appearance()
-
-    def init_ui(self):
-        layout = QHBoxLayout()
-        layout.setContentsMargins(10, 10, 10, 10)
-        layout.setSpacing(10)
-
-        timestamp = QLabel(datetime.now().strftime("%H:%M"))
-        timestamp.setFont(QFont("Arial", 8))
-        timestamp.setStyleSheet("color: gray;")
-
-        if self.sender == "user":
-            # Пользовательский вариант (справа)
-            if self.avatar_path and os.path.exists(self.avatar_path):
-                avatar = QLabel()
-                pixmap = QPixmap(self.avatar_path)
-                pixmap = pixmap.scaled(
-                    50, 50,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                avatar.setPixmap(pixmap)
-                avatar.setFixedSize(50, 50)
-                layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignRight)
-
-            bubble = QLabel(self.message)
-            bubble.setWordWrap(True)
-            bubble.setStyleSheet("""
-                QLabel {
-                    background-color: #7289DA;
-                    color: white;
-                    padding: 10px;
-                    border-radius: 15px;
-                    font-size: 14px;
-                    max-width: 300px;
-                }
-            """)
-
-            bubble_layout = QVBoxLayout()
-            bubble_layout.addWidget(bubble)
-            bubble_layout.addWidget(timestamp, alignment=Qt.AlignmentFlag.AlignRight)
-
-            container = QWidget()
-            container.setLayout(bubble_layout)
-            layout.addWidget(container, alignment=Qt.AlignmentFlag.AlignRight)
-
-        else:
-            # Бот (слева)
-            if self.avatar_path and os.path.exists(self.avatar_path):
-                avatar = QLabel()
-                pixmap = QPixmap(self.avatar_path)
-                pixmap = pixmap.scaled(
-                    50, 50,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                avatar.setPixmap(pixmap)
-                avatar.setFixedSize(50, 50)
-                layout.addWidget(avatar, alignment=Qt.AlignmentFlag.AlignLeft)
-
-            bubble = QLabel(self.message)
-            bubble.setWordWrap(True)
-            bubble.setStyleSheet("""
-                QLabel {
-                    background-color: #99AAB5;
-                    color: white;
-                    padding: 10px;
-                    border-radius: 15px;
-                    font-size: 14px;
-                    max-width: 300px;
-                }
-            """)
-
-            bubble_layout = QVBoxLayout()
-            bubble_layout.addWidget(bubble)
-            bubble_layout.addWidget(timestamp, alignment=Qt.AlignmentFlag.AlignLeft)
-
-            container = QWidget()
-            container.setLayout(bubble_layout)
-            layout.addWidget(container, alignment=Qt.AlignmentFlag.AlignLeft)
-
-        self.setLayout(layout)
-
-    def animate_appearance(self):
-        self.setWindowOpacity(0)
-        self.animation = QPropertyAnimation(self, b"windowOpacity")
-        self.animation.setDuration(500)
-        self.animation.setStartValue(0)
-        self.animation.setEndValue(1)
-        self.animation.setEasingCurve(QEasingCurve.Type.OutBounce)
-        self.animation.start()
+        # Поток PortAudio: только копирование в кольцевой буфер, без выделений памяти
+        self.audio_buffer.write(indata)
 
 
 class SimplifiedWindow(QWidget):
@@ -480,10 +432,14 @@ class MainWindow(QMainWindow):
 
         self.setup_ui()
         self.show()
+        startup.timer.mark("window_shown")
 
         self.assistant_thread = AssistantThread()
         self.assistant_thread.update_chat_signal.connect(self.update_chat)
         self.assistant_thread.notify_signal.connect(self.notify)
+        self.assistant_thread.status_signal.connect(self.status_bar.showMessage)
+        self.assistant_thread.stream_chat_signal.connect(self.update_stream)
+        self._stream_message = None  # номер сообщения, которое сейчас дописывается потоком
         self.assistant_thread.start()
 
         # Создаём упрощённое окно (скрыто, покажется при включении режима)
@@ -553,26 +509,9 @@ class MainWindow(QMainWindow):
         self.top_bar.setLayout(top_layout)
         self.main_layout.addWidget(self.top_bar)
 
-        # Чат с прокруткой
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setStyleSheet("""
-            QScrollArea {
-                background-color: #2C2F33;
-                border: 2px solid #23272A;
-                border-radius: 10px;
-            }
-        """)
-        self.chat_widget = QWidget()
-        self.chat_layout = QVBoxLayout()
-        self.chat_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.chat_layout.setSpacing(10)
-        self.chat_widget.setLayout(self.chat_layout)
-
-        spacer_chat = QSpacerItem(20, 40, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
-        self.chat_layout.addItem(spacer_chat)
-        self.scroll_area.setWidget(self.chat_widget)
-        self.main_layout.addWidget(self.scroll_area)
+        # Чат (модель/представление, старые сообщения уходят на диск)
+        self.chat_view = ChatView("chat_history.jsonl")
+        self.main_layout.addWidget(self.chat_view)
 
         # Поле ввода команды
         self.input_widget = QWidget()
@@ -660,7 +599,14 @@ class MainWindow(QMainWindow):
             }
         """)
         self.setStatusBar(self.status_bar)
-        self.status_bar.showMessage("Готово")
+        self.status_bar.showMessage("Загрузка...")
+        # Сводка метрик конвейера справа в строке состояния
+        self.metrics_label = QLabel(metrics.summary())
+        self.metrics_label.setStyleSheet("color: #99AAB5;")
+        self.status_bar.addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(lambda: self.metrics_label.setText(metrics.summary()))
+        self.metrics_timer.start(2000)
 
         # Меню
         menubar = self.menuBar()
@@ -693,6 +639,16 @@ class MainWindow(QMainWindow):
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
 
+        # Модели распознавания: точность против нагрузки на процессор
+        asr_menu = menubar.addMenu("Распознавание")
+        asr_group = QActionGroup(self)
+        for name in asr_registry.names():
+            action = QAction(name, self, checkable=True)
+            action.setChecked(name == os.path.basename(os.path.abspath(asr_model_path)))
+            action.triggered.connect(lambda checked, name=name: self.assistant_thread.switch_asr_model(name))
+            asr_group.addAction(action)
+            asr_menu.addAction(action)
+
         help_menu = menubar.addMenu("Помощь")
         about_action = QAction("О программе", self)
         about_action.triggered.connect(self.show_about)
@@ -711,39 +667,43 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Пустая команда", "Пожалуйста, введите команду.")
 
     def update_chat(self, sender: str, message: str):
-        if sender == "user":
-            avatar_path = "user_avatar.png"
-        else:
-            avatar_path = "bot_avatar.png"
-
-        bubble = MessageBubble(message, sender, avatar_path=avatar_path)
-        self.chat_layout.insertWidget(self.chat_layout.count() - 1, bubble)
-        QTimer.singleShot(100, lambda: self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()))
+        self.chat_view.add_message(sender, message)
 
         # Дублируем в упрощённое окно
         self.simplified_window.add_message(sender, message)
 
+    def update_stream(self, message: str, finished: bool):
+        """
+        Потоковый ответ: первый фрагмент создаёт пузырёк, следующие обновляют его текст.
+        """
+        if self._stream_message is None:
+            if not message and finished:
+                return
+            self._stream_message = self.chat_view.add_message("sonya", message)
+        else:
+            self.chat_view.set_text(self._stream_message, message)
+
+        if finished:
+            self._stream_message = None
+            # В упрощённое окно — только готовый ответ
+            self.simplified_window.add_message("sonya", message)
+
     def notify(self, message: str):
         sender = "sonya"
-        avatar_path = "bot_avatar.png"
-        bubble = MessageBubble(message, sender, avatar_path=avatar_path)
-        self.chat_layout.insertWidget(self.chat_layout.count() - 1, bubble)
+        self.chat_view.add_message(sender, message)
         self.status_bar.showMessage(message)
 
         # Дублируем в упрощённое окно
         self.simplified_window.add_message(sender, message)
 
-        QTimer.singleShot(100, lambda: self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()))
-
     def show_about(self):
         QMessageBox.information(self, "О программе", "Соня - голосовой помощник\nВерсия 1.1")
 
     def closeEvent(self, event):
         self.assistant_thread.stop()
-        self.assistant_thread.quit()
-        self.assistant_thread.wait()
+        if not self.assistant_thread.wait(int(stop_deadline * 1000) + 1000):
+            logger.error("Поток ассистента не завершился вовремя")
+        self.chat_view.chat_model.close()
         event.accept()
 
     def toggle_theme(self):
@@ -802,7 +762,7 @@ class MainWindow(QMainWindow):
         """
         # Скрываем элементы основного окна
         self.top_bar.hide()
-        self.scroll_area.hide()
+        self.chat_view.hide()
         self.input_widget.hide()
         self.buttons_widget.hide()
 
@@ -835,7 +795,7 @@ class MainWindow(QMainWindow):
         self.simplified_window.hide()
 
         self.top_bar.show()
-        self.scroll_area.show()
+        self.chat_view.show()
         self.input_widget.show()
         self.buttons_widget.show()
 
@@ -876,6 +836,15 @@ def button_style():
 
 
 def main():
+    # Модели начинают грузиться в фоне ещё до создания окна
+    asr_model_future()
+    tts_model_future()
+    earcons_future()
+    if metrics_port:
+        try:
+            metrics.serve(metrics_port)
+        except OSError as e:
+            logger.warning(f"Не удалось запустить эндпойнт метрик: {e}")
     app = QApplication(sys.argv)
 
     # Тёмная палитра по умолчанию
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import wave
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import vosk
+
+import metrics
+from resample import Resampler
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+# Где искать модели Vosk: сами каталоги моделей и каталоги с ними
+model_roots = [".", "models"]
+default_model = "model_small_ru"
+profile_samplerate = 16000
+profile_block_seconds = 0.5
+
+asr_model_load_seconds = metrics.gauge(
+    "sonya_asr_model_load_seconds", "Время загрузки последней модели Vosk, с")
+asr_model_rss_bytes = metrics.gauge(
+    "sonya_asr_model_rss_bytes", "Прирост резидентной памяти при загрузке последней модели Vosk")
+asr_model_swaps_total = metrics.counter(
+    "sonya_asr_model_swaps_total", "Переключения модели распознавания")
+
+
+def is_model_dir(path):
+    # У моделей Vosk есть conf/model.conf (новые) или am/final.mdl (старые)
+    return os.path.isfile(os.path.join(path, "conf", "model.conf")) or \
+        os.path.isfile(os.path.join(path, "am", "final.mdl"))
+
+
+def discover(roots=None):
+    """
+    Находит модели в roots (без рекурсии вглубь моделей): имя каталога → путь.
+    """
+    found = {}
+    for root in roots or model_roots:
+        if not os.path.isdir(root):
+            continue
+        candidates = [root] + [os.path.join(root, entry) for entry in sorted(os.listdir(root))]
+        for path in candidates:
+            name = os.path.basename(os.path.abspath(path))
+            if name not in found and os.path.isdir(path) and is_model_dir(path):
+                found[name] = path
+    return found
+
+
+def rss_bytes():
+    """
+    Текущая резидентная память процесса (на Linux — из /proc, иначе пик по getrusage).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ASRModelRegistry:
+    """
+    Реестр локальных моделей Vosk.
+
+    Модели ищутся в roots; load() грузит модель и запоминает время загрузки
+    и прирост резидентной памяти, load_async() делает то же в отдельном
+    потоке. Активной считается одна модель (activate): старая освобождается,
+    как только её перестанет использовать распознаватель, поэтому две
+    модели в памяти одновременно только на время переключения.
+    """
+
+    def __init__(self, roots=None):
+        self.roots = list(roots or model_roots)
+        self.paths = {}
+        self.active = None  # имя активной модели
+        self.model = None
+        self.stats = {}  # имя → {"load_seconds", "rss_bytes"}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr-model")
+        self.refresh()
+
+    def refresh(self):
+        """
+        Заново просматривает каталоги (например, после скачивания модели).
+        """
+        paths = discover(self.roots)
+        with self._lock:
+            self.paths = paths
+        return self.names()
+
+    def names(self):
+        return sorted(self.paths)
+
+    def path(self, name):
+        """
+        Путь модели по имени; путь к каталогу модели тоже принимается.
+        """
+        if name in self.paths:
+            return self.paths[name]
+        if os.path.isdir(name) and is_model_dir(name):
+            return name
+        raise KeyError(f"Модель распознавания не найдена: {name} (есть: {', '.join(self.names()) or 'нет'})")
+
+    def load(self, name):
+        """
+        Загружает модель (блокирует); первая загруженная становится активной.
+        """
+        path = self.path(name)
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        model = vosk.Model(path)
+        seconds = time.perf_counter() - start
+        grown = max(0, rss_bytes() - rss_before)
+        with self._lock:
+            self.stats[name] = {"load_seconds": seconds, "rss_bytes": grown}
+            if self.model is None:
+                self.active, self.model = name, model
+        asr_model_load_seconds.set(seconds)
+        asr_model_rss_bytes.set(grown)
+        logger.info(f"Модель распознавания {name} загружена за {seconds:.2f} с, +{grown / 2 ** 20:.0f} МБ")
+        return model
+
+    def load_async(self, name):
+        """
+        Загружает модель в фоне; возвращает concurrent.futures.Future с моделью.
+        """
+        return self._executor.submit(self.load, name)
+
+    def activate(self, name, model):
+        """
+        Делает загруженную модель активной (распознаватель переключается отдельно).
+        """
+        with self._lock:
+            if self.active == name and self.model is model:
+                return
+            self.active, self.model = name, model
+        asr_model_swaps_total.inc()
+        logger.info(f"Активная модель распознавания: {name}")
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Профилирование ---
+
+def read_wav(path):
+    """
+    WAV 16 бит → (моно int16 на profile_samplerate, длительность в секундах).
+    """
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: нужен WAV 16 бит")
+        rate = wf.getframerate()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        audio = audio.reshape(-1, wf.getnchannels())
+    if audio.shape[1] > 1:
+        audio = audio.mean(axis=1).astype(np.int16)
+    else:
+        audio = audio[:, 0]
+    if rate != profile_samplerate:
+        audio = Resampler(rate, profile_samplerate).process(audio)
+    return audio, len(audio) / profile_samplerate
+
+
+def word_errors(reference, hypothesis):
+    # Расстояние Левенштейна по словам
+    ref, hyp = reference.split(), hypothesis.split()
+    row = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, other in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (word != other))
+    return row[-1], len(ref)
+
+
+def profile_model(path, wavs):
+    """
+    Загрузка модели и распознавание wavs: время загрузки, резидентная память,
+    real-time factor (по времени и по CPU) и WER, если рядом с WAV лежит
+    расшифровка (<имя>.txt).
+    """
+    vosk.SetLogLevel(-1)
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    model = vosk.Model(path)
+    load_seconds = time.perf_counter() - start
+    load_rss = rss_bytes() - rss_before
+    step = int(profile_samplerate * profile_block_seconds)
+    audio_seconds = wall = cpu = 0.0
+    errors = words = 0
+    for wav in wavs:
+        audio, seconds = read_wav(wav)
+        rec = vosk.KaldiRecognizer(model, profile_samplerate)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        for i in range(0, len(audio), step):
+            rec.AcceptWaveform(audio[i:i + step].tobytes())
+        text = json.loads(rec.FinalResult())["text"]
+        wall += time.perf_counter() - wall_start
+        cpu += time.process_time() - cpu_start
+        audio_seconds += seconds
+        transcript = os.path.splitext(wav)[0] + ".txt"
+        if os.path.exists(transcript):
+            with open(transcript, encoding="utf-8") as f:
+                e, n = word_errors(f.read().lower(), text)
+            errors, words = errors + e, words + n
+    return {
+        "load_seconds": load_seconds,
+        "load_rss_bytes": load_rss,
+        "rss_bytes": rss_bytes() - rss_before,
+        "audio_seconds": audio_seconds,
+        "rtf": wall / audio_seconds if audio_seconds else None,
+        "cpu_rtf": cpu / audio_seconds if audio_seconds else None,
+        "wer": errors / words if words else None,
+    }
+
+
+def profile(registry, names, wavs, isolate=True):
+    """
+    Профилирует модели по очереди. isolate — каждая в отдельном процессе:
+    освобождённая память не всегда возвращается системе, и без изоляции
+    замеры следующих моделей искажаются.
+    """
+    results = {}
+    for name in names:
+        path = registry.path(name)
+        try:
+            if isolate:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    results[name] = pool.submit(profile_model, path, wavs).result()
+            else:
+                results[name] = profile_model(path, wavs)
+        except Exception as e:
+            logger.error(f"Не удалось профилировать {name}: {e}")
+            results[name] = {"error": str(e)}
+    return results
@@ -0,0 +1,667 @@
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+
+import vosk
+import numpy as np
+from fuzzywuzzy import fuzz
+
+import voice
+import earcons
+import llm
+import memory
+import metrics
+import concurrency
+import commands
+from memory import ConversationMemory
+from response_cache import ResponseCache, depends_on_context
+from providers import HedgedBackend, make_provider
+from wakeword import WakeWordDetector
+from vad import VADGate
+from echo import EchoSuppressor
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+# --- Базовый контекст для GPT ---
+base_dialogue = [
+    {
+        "role": "system",
+        "content": (
+            "Ты интеллектуальный голосовой помощник Соня. Твоя задача помогать "
+            "пользователю с решением разных задач, беседовать с ним на различные темы "
+            "и управлять его делами. Важно, все цифры прописывай буквами, например не 8, а восемь. "
+            "Помни, у тебя женский пол. Обязательно запоминай контекст разговора"
+        )
+    }
+]
+
+# --- Фиксированные фразы для прогрева кэша TTS ---
+fixed_phrases = [
+    "Доброе утро! Как я могу помочь тебе сегодня?",
+    "Добрый день! Чем могу помочь?",
+    "Добрый вечер! Какие у тебя планы на вечер?",
+    "Я вас слушаю.",
+    "Сработал будильник.",
+    "Открываю браузер",
+    "Яркость увеличена.",
+    "Яркость уменьшена.",
+    "Громкость увеличена.",
+    "Громкость уменьшена.",
+    "Ошибка: непредвиденный формат ответа.",
+    "Произошла ошибка при получении ответа.",
+]
+
+# --- Ранняя активация по частичным результатам Vosk ---
+wake_on_partial = True
+# Эндпойнтер Vosk (с): макс. тишина до речи, пауза, завершающая фразу, макс. длина фразы
+endpointer_delays = (5.0, 0.5, 15.0)
+
+# --- Отдельная ступень wake word: основной распознаватель работает только после активации ---
+wake_word_stage = True
+wake_sensitivity = 0.5  # 0..1, выше — чаще срабатывает
+
+# --- Детектор речи перед Vosk: тишина не декодируется (vad.py) ---
+vad_gate = True
+
+# --- Перебивание: речь во время ответа обрывает озвучку и запрос к LLM ---
+barge_in = True
+barge_in_margin_db = 18.0  # порог речи над шумом после подавления эха, дБ
+barge_in_frames = 3  # речевых кадров (по 20 мс) в блоке
+# Подавление собственного голоса в микрофоне по проигрываемому сигналу (echo.py)
+echo_suppression = True
+
+# --- Сроки фоновых задач (с): ответ на голосовую команду и сжатие памяти ---
+reply_deadline = 180.0
+compaction_deadline = 120.0
+
+# --- Провайдеры LLM: запрос дублируется следующему, если первый медлит (providers.py) ---
+# {"name", "model", "provider"} — g4f (provider необязателен), {"name", "model", "url"} — OpenAI-совместимый сервер
+llm_providers = [
+    {"name": "g4f-gpt-4o", "model": "gpt-4o"},
+    {"name": "g4f-gpt-4o-mini", "model": "gpt-4o-mini"},
+]
+llm_hedge_after = None  # с; None — по p90 времени до первого токена
+_llm_backend = None
+
+# --- Память разговора ---
+conversation_file = "conversation.json"
+memory_token_budget = 1500  # бюджет на дословные реплики в запросе к LLM
+memory_summary_budget = 300
+summarize_with_llm = True  # сжимать старые реплики через LLM, иначе — без неё
+
+# --- Кэш ответов LLM (свой у каждого экземпляра Assistant) ---
+use_response_cache = True
+response_cache_file = "response_cache.json"  # None — кэш только в памяти
+response_cache_ttl = 6 * 3600
+response_cache_fuzzy = 92  # порог нечёткого совпадения запроса; None — только точное
+
+# Изменения памяти разговора и кэша ответов копятся столько секунд до записи на диск
+save_delay = 5.0
+
+
+# --- Метрики конвейера ---
+asr_decode_seconds = metrics.histogram(
+    "sonya_asr_decode_seconds", "Время декодирования одного аудиоблока (Vosk)")
+wake_total = metrics.counter("sonya_wake_total", "Срабатывания wake word")
+barge_in_total = metrics.counter("sonya_barge_in_total", "Ответы, прерванные речью пользователя")
+latency_metrics = {
+    "wake_to_final": metrics.histogram(
+        "sonya_wake_to_final_seconds", "От wake word до итогового текста команды"),
+    "wake_to_response": metrics.histogram(
+        "sonya_wake_to_response_seconds", "От wake word до первой реакции ассистента"),
+}
+vad_audio_seconds_total = metrics.counter(
+    "sonya_vad_audio_seconds_total", "Аудио, прошедшее через детектор речи, с")
+vad_skipped_seconds_total = metrics.counter(
+    "sonya_vad_skipped_seconds_total", "Аудио, не отправленное в Vosk, с")
+vad_cpu_saved_seconds_total = metrics.counter(
+    "sonya_vad_cpu_saved_seconds_total", "Оценка сэкономленного времени декодирования, с")
+llm_first_token_seconds = metrics.histogram(
+    "sonya_llm_first_token_seconds", "Время до первого токена LLM")
+llm_total_seconds = metrics.histogram("sonya_llm_total_seconds", "Полное время ответа LLM")
+llm_errors_total = metrics.counter("sonya_llm_errors_total", "Ошибки и таймауты LLM")
+response_cache_hits_total = metrics.counter(
+    "sonya_response_cache_hits_total", "Ответы из кэша без обращения к LLM")
+llm_prompt_tokens = metrics.histogram(
+    "sonya_llm_prompt_tokens", "Оценка размера запроса к LLM, токены",
+    (250, 500, 750, 1000, 1500, 2000, 3000, 4000, 8000))
+
+
+def default_llm_backend():
+    """
+    Общий для всех экземпляров Assistant бэкенд: статистика провайдеров
+    и автоматы не зависят от сессии.
+    """
+    global _llm_backend
+    if _llm_backend is None:
+        if llm_providers:
+            _llm_backend = HedgedBackend([make_provider(spec) for spec in llm_providers],
+                                         hedge_after=llm_hedge_after)
+        else:
+            _llm_backend = llm.G4FBackend()
+    return _llm_backend
+
+
+def _ignore(*args):
+    pass
+
+
+def _log_reference_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Ошибка опорного сигнала эхоподавления: {future.exception()!r}")
+
+
+class Assistant:
+    """
+    Ядро ассистента без Qt: распознавание, wake word, команды, LLM и озвучка.
+
+    Наружу ассистент сообщает только через колбэки:
+      - on_chat(sender, message) — сообщение в чат,
+      - on_stream(text, finished) — потоковый ответ LLM,
+      - on_notify(message) — уведомление,
+      - on_event(name, value) — события конвейера для замеров: для этапов
+        ("wake", "final", "routed", "llm_first_token", "llm_done", "audio_start",
+        "barge_in", "asr_model_swap") value — момент по perf_counter, для "asr_decode" —
+        длительность в секундах.
+    Оболочкой служит AssistantThread в app.py; её же можно заменить
+    headless-запуском (bench_pipeline.py) или сессией сервера (server.py).
+    asr_executor — пул, в котором декодируется аудио; None — прямо в цикле событий.
+    memory_file — файл памяти разговора; None — не сохранять на диск.
+    cache_file — файл кэша ответов LLM; None — кэш только на время сессии.
+
+    С barge_in ответ идёт отдельной задачей, а микрофон слушается и во
+    время него: блоки проходят через подавитель эха, и если в остатке есть
+    речь, ответ (LLM, синтез, вывод) отменяется, а сказанное распознаётся
+    как новая команда без имени. До перебивания в Vosk ничего не уходит.
+    """
+
+    def __init__(self, llm_client=None, play=None, on_chat=None, on_stream=None,
+                 on_notify=None, on_event=None, asr_executor=None, memory_file=conversation_file,
+                 cache_file=response_cache_file):
+        self.mute_voice = False  # Если True, бот не озвучивает ответы
+        self.earcons = True  # звуковые сигналы событий (earcons.py)
+        self.llm = llm_client or llm.LLMClient(default_llm_backend())
+        self.memory = ConversationMemory(
+            base_dialogue, memory_file, token_budget=memory_token_budget,
+            summary_budget=memory_summary_budget,
+            summarize=self._summarize if summarize_with_llm else None)
+        self._summary_llm = None
+        self._compaction = None
+        self.tasks = concurrency.TaskGroup("assistant")  # ответы и сжатие памяти
+        self.response_cache = ResponseCache(
+            cache_file, ttl=response_cache_ttl,
+            fuzzy_threshold=response_cache_fuzzy) if use_response_cache else None
+        self._save = None
+        self.play = play  # функция воспроизведения; None — вывод voice по умолчанию
+        self.speak_lock = None  # блокировка вывода; None — общая для звуковой карты
+        self.asr_executor = asr_executor
+        self.on_chat = on_chat or _ignore
+        self.on_stream = on_stream or _ignore
+        self.on_notify = on_notify or _ignore
+        self.on_event = on_event or _ignore
+        self.rec = None
+        self.detector = None
+        self.vad = None
+        self.samplerate = None
+        self._decode_cost = None  # секунд декодирования на секунду аудио
+        self.model = None
+        self._next_model = None  # модель, ждущая границы фразы
+        self._wake_time = None  # момент срабатывания wake word (perf_counter)
+        self.barge_in = barge_in
+        self.echo = None
+        self._barge_vad = None
+        self._reply = None  # задача ответа на голосовую команду
+        self._barge_recent = deque()  # последние блоки во время ответа — начало перебивающей фразы
+        self.latency = {
+            "wake_to_final": deque(maxlen=100),
+            "wake_to_response": deque(maxlen=100),
+        }
+
+    # --- Распознавание ---
+
+    def start_recognition(self, model, samplerate):
+        self.samplerate = samplerate
+        self._build_recognizer(model)
+        self.vad = VADGate(samplerate) if vad_gate else None
+        self.echo = EchoSuppressor(samplerate) if self.barge_in and echo_suppression else None
+        self._barge_vad = VADGate(samplerate, margin_db=barge_in_margin_db,
+                                  min_speech_frames=barge_in_frames)
+
+    def _build_recognizer(self, model):
+        self.model = model
+        self.rec = vosk.KaldiRecognizer(model, self.samplerate)
+        self._configure_endpointer(self.rec)
+        self.detector = None
+        if wake_word_stage:
+            self.detector = WakeWordDetector(
+                model, self.samplerate, sensitivity=wake_sensitivity, use_partial=wake_on_partial)
+        self._decode_cost = None
+
+    def switch_model(self, model):
+        """
+        Переключает распознавание на другую модель Vosk (уже загруженную).
+        Распознаватели пересобираются на границе фразы — когда VAD закрыл
+        блоки тишины или Vosk выдал окончательный результат, — чтобы не
+        оборвать сказанное на середине.
+        """
+        self._next_model = model
+
+    def _swap_model(self):
+        if self._next_model is None:
+            return
+        model, self._next_model = self._next_model, None
+        self._build_recognizer(model)
+        logger.info("Распознавание переключено на новую модель")
+        self.on_event("asr_model_swap", time.perf_counter())
+
+    async def feed(self, data: bytes, captured_at=None):
+        """
+        Обрабатывает один блок аудио (int16, моно). captured_at — момент
+        записи последнего отсчёта блока (perf_counter), по умолчанию — сейчас.
+        """
+        if self.echo is not None:
+            data = await self._decode(self.echo.process, data, captured_at or time.perf_counter())
+        if self._replying():
+            data = await self._listen_barge_in(data)
+            if data is None:
+                return
+        if self.vad is not None:
+            seconds = len(data) / 2 / self.samplerate
+            vad_audio_seconds_total.inc(seconds)
+            gated = await self._decode(self.vad.process, data)
+            if gated is None:
+                vad_skipped_seconds_total.inc(seconds)
+                if self._decode_cost is not None:
+                    vad_cpu_saved_seconds_total.inc(seconds * self._decode_cost)
+                self._swap_model()
+                return
+            data = gated
+        start = time.perf_counter()
+        if self.detector is not None and self._wake_time is None:
+            # Ждём имя; полный декодер в это время не работает
+            detected = await self._decode(self.detector.accept, data)
+            if not detected:
+                self._decoded(start, data)
+                return
+            logger.info("Wake word обнаружен детектором")
+            self.detector.reset()
+            self.rec.Reset()
+            self._on_wake()
+            # Команда может начинаться в том же блоке, что и имя
+        final = await self._decode(self.rec.AcceptWaveform, data)
+        self._decoded(start, data)
+        if final:
+            data_text = json.loads(self.rec.Result())["text"]
+            self._swap_model()
+            if self._wake_time is not None and data_text:
+                self.play_earcon("listen_stop")
+            if self.barge_in:
+                # Ответ — отдельной задачей, чтобы слушать микрофон во время него
+                self._barge_recent.clear()
+                self._reply = self.tasks.create_task(
+                    self.recognize(data_text), name="reply", deadline=reply_deadline)
+            else:
+                await self.recognize(data_text)
+        elif wake_on_partial and self._wake_time is None:
+            partial = json.loads(self.rec.PartialResult())["partial"]
+            if partial and self._is_wake_word(partial):
+                logger.info(f"Wake word в частичном результате: {partial}")
+                self._on_wake()
+
+    def _replying(self):
+        return self._reply is not None and not self._reply.done()
+
+    async def _listen_barge_in(self, data):
+        """
+        Блок во время ответа: None, пока пользователь молчит; иначе ответ
+        прерывается и возвращается аудио для распознавания с началом фразы.
+        """
+        if self.echo is not None:
+            # Кадры, где преобладает эхо, не в счёт
+            samples = self.echo.near_end
+        else:
+            samples = np.frombuffer(data, dtype=np.int16)
+        speech = self._barge_vad.speech_frames(samples) >= barge_in_frames
+        if speech and self.echo is not None and self.echo.reference_active and not self.echo.converged:
+            # Путь эха ещё не оценён: в остатке почти всё эхо, а не пользователь
+            speech = False
+        if not speech:
+            self._barge_recent.append(data)
+            while len(self._barge_recent) > 2:
+                self._barge_recent.popleft()
+            return None
+        moment = time.perf_counter()
+        logger.info("Перебивание: ответ прерван")
+        barge_in_total.inc()
+        self.on_event("barge_in", moment)
+        self.llm.cancel()
+        self._reply.cancel()
+        await asyncio.gather(self._reply, return_exceptions=True)
+        if self.echo is not None:
+            self.echo.truncate(moment)
+        data = b"".join(self._barge_recent) + data
+        self._barge_recent.clear()
+        self.rec.Reset()
+        if self.detector is not None:
+            self.detector.reset()
+        if self.vad is not None:
+            self.vad.reset()
+        self._on_wake()
+        return data
+
+    async def wait_reply(self):
+        """
+        Дожидается ответа на последнюю голосовую команду.
+        """
+        if self._reply is not None:
+            await asyncio.gather(self._reply, return_exceptions=True)
+
+    async def _decode(self, fn, *args):
+        # Декодирование и предобработка (эхо, VAD) — в пуле ASR, а не в цикле событий
+        if self.asr_executor is None:
+            return fn(*args)
+        # Vosk отпускает GIL, так что сессии сервера декодируются параллельно
+        return await asyncio.get_running_loop().run_in_executor(self.asr_executor, fn, *args)
+
+    def _decoded(self, start, data):
+        seconds = time.perf_counter() - start
+        asr_decode_seconds.observe(seconds)
+        self.on_event("asr_decode", seconds)
+        if data:
+            cost = seconds / (len(data) / 2 / self.samplerate)
+            self._decode_cost = cost if self._decode_cost is None else 0.9 * self._decode_cost + 0.1 * cost
+
+    async def flush(self):
+        """
+        Конец аудиопотока: дораспознаёт последнюю фразу.
+        """
+        await self.wait_reply()
+        if self.detector is not None and self._wake_time is None:
+            if not self.detector.finish():
+                return
+            self._on_wake()
+        data_text = json.loads(self.rec.FinalResult())["text"]
+        if data_text or self._wake_time is not None:
+            await self.recognize(data_text)
+
+    async def recognize(self, data: str):
+        logger.info(f"Пользователь сказал: {data}")
+        if self._wake_time is not None:
+            # Wake word уже сработал раньше (детектор или частичный результат) — это конец команды
+            self.on_event("final", time.perf_counter())
+            self._record_latency("wake_to_final", time.perf_counter() - self._wake_time)
+        elif self._is_wake_word(data):
+            self._on_wake()
+            self.on_event("final", time.perf_counter())
+        else:
+            return
+        try:
+            command = data.lower()
+            for wake_word in ["соня", "сонька", "сонечка", "sonya"]:
+                command = command.replace(wake_word, "")
+            command = command.strip()
+            if command:
+                await self.process_command(command)
+                self.on_notify("Соня: Выполнил команду.")
+            else:
+                response = "Я вас слушаю."
+                await self.speak(response)
+                self.on_chat("sonya", response)
+                self.on_notify(response)
+        finally:
+            self._wake_time = None
+
+    def _on_wake(self):
+        self._wake_time = time.perf_counter()
+        wake_total.inc()
+        self.on_event("wake", self._wake_time)
+        self.play_earcon("wake")
+
+    def _mark_response(self):
+        # Первая реакция на команду после wake word
+        if self._wake_time is not None:
+            self._record_latency("wake_to_response", time.perf_counter() - self._wake_time)
+            self._wake_time = None
+
+    def _record_latency(self, name: str, seconds: float):
+        latency_metrics[name].observe(seconds)
+        values = self.latency[name]
+        values.append(seconds)
+        median = sorted(values)[len(values) // 2]
+        logger.info(f"Задержка {name}: {seconds:.3f} с (медиана {median:.3f} с, n={len(values)})")
+
+    def _configure_endpointer(self, rec):
+        # SetEndpointerDelays есть только в новых версиях vosk
+        if endpointer_delays and hasattr(rec, "SetEndpointerDelays"):
+            rec.SetEndpointerDelays(*endpointer_delays)
+
+    def _is_wake_word(self, data: str) -> bool:
+        # Проверяем, есть ли «соня» (и т.п.) в распознанном тексте
+        wake_words = ["соня", "сонька", "сонечка", "sonya"]
+        for word in wake_words:
+            ratio = fuzz.partial_ratio(data.lower(), word)
+            if ratio > 80:
+                return True
+        return False
+
+    # --- Команды ---
+
+    async def process_command(self, command: str):
+        command = command.lower()
+        logger.info(f"Обработка команды: {command}")
+        # Новая команда отменяет ещё не завершённый ответ LLM
+        self.llm.cancel()
+
+        # Локальные команды (commands.py) — без обращения к LLM
+        match = commands.router.match(command)
+        self.on_event("routed", time.perf_counter())
+        if match is not None:
+            logger.info(f"Команда {match.intent.name} (фраза «{match.phrase}», {match.score})")
+            try:
+                await match.handler(self, command)
+            except Exception as e:
+                logger.error(f"Ошибка команды {match.intent.name}: {e}")
+
+        else:
+            # Любой другой запрос — потоково отправляем в LLM (предыдущий запрос отменяется)
+            # Ответ на «а почему?» зависит от разговора — такие запросы мимо кэша
+            cache = self.response_cache if not depends_on_context(command) else None
+            cached = cache.get(command) if cache is not None else None
+            if cached is not None:
+                await self._cached_reply(command, cached)
+                return
+            try:
+                request = {"role": "user", "content": command}
+                response = await self._stream_reply(self.memory.messages([request]))
+                if cache is not None:
+                    cache.put(command, response)
+                self.memory.add("user", command)
+                self.memory.add("assistant", response)
+                self._schedule_save()
+                if self.memory.needs_compaction() and self._compaction is None:
+                    # Сжатие — в фоне, не задерживая следующую команду
+                    self._compaction = self.tasks.create_task(
+                        self._compact(), name="compaction", deadline=compaction_deadline)
+            except llm.LLMCancelled:
+                logger.info("Запрос к LLM отменён новой командой")
+            except llm.LLMFormatError as e:
+                llm_errors_total.inc()
+                error_msg = "Ошибка: непредвиденный формат ответа."
+                logger.error(f"Ошибка при генерации ответа: {e}")
+                self.on_stream(error_msg, True)
+                self.play_earcon("error")
+                await self.speak(error_msg)
+            except Exception as e:
+                llm_errors_total.inc()
+                error_msg = "Произошла ошибка при получении ответа."
+                logger.error(f"Ошибка при генерации ответа: {e}")
+                self.on_stream(error_msg, True)
+                self.play_earcon("error")
+                await self.speak(error_msg)
+
+    async def _stream_reply(self, messages) -> str:
+        """
+        Получает ответ LLM по токенам: частичный текст сразу уходит в чат,
+        а готовые предложения — в TTS, не дожидаясь конца ответа.
+        """
+        tokens = asyncio.Queue()
+
+        async def text_chunks():
+            while (token := await tokens.get()) is not None:
+                yield token
+
+        speaker = None
+        if not self.mute_voice:
+            speaker = asyncio.create_task(voice.speak_stream(
+                text_chunks(), play=self.play, on_audio=self._on_audio, lock=self.speak_lock))
+        response = ""
+        llm_prompt_tokens.observe(sum(memory.message_tokens(message) for message in messages))
+        start = time.perf_counter()
+        try:
+            async for token in self.llm.stream(messages):
+                if not response:
+                    now = time.perf_counter()
+                    llm_first_token_seconds.observe(now - start)
+                    self.on_event("llm_first_token", now)
+                    self._mark_response()
+                response += token
+                tokens.put_nowait(token.lower())
+                self.on_stream(response, False)
+            now = time.perf_counter()
+            llm_total_seconds.observe(now - start)
+            self.on_event("llm_done", now)
+        except asyncio.CancelledError:
+            # Перебивание: озвучка обрывается сразу, а не после последнего предложения
+            if speaker is not None:
+                speaker.cancel()
+            raise
+        finally:
+            tokens.put_nowait(None)
+            self.on_stream(response, True)
+            if speaker is not None:
+                await speaker
+        return response
+
+    def _schedule_save(self):
+        if self._save is None:
+            try:
+                self._save = self.tasks.create_task(self._save_state(), name="save")
+            except RuntimeError:
+                pass  # группа закрывается — сохранит close()
+
+    async def _save_state(self):
+        # Изменения за save_delay уходят на диск одной записью, вне цикла событий
+        await asyncio.sleep(save_delay)
+        self._save = None
+        await concurrency.run("commands", self._write_state)
+
+    def _write_state(self):
+        self.memory.save()
+        if self.response_cache is not None:
+            self.response_cache.save()
+
+    async def _cached_reply(self, command: str, response: str):
+        logger.info("Ответ из кэша")
+        response_cache_hits_total.inc()
+        self.on_stream(response, True)
+        self.memory.add("user", command)
+        self.memory.add("assistant", response)
+        self._schedule_save()
+        # В TTS уходил текст в нижнем регистре — так озвучка попадёт в кэш TTS
+        await self.speak(response.lower())
+
+    # --- Вывод ---
+
+    async def respond(self, text: str):
+        """
+        Ответ ассистента: озвучка и сообщение в чат.
+        """
+        await self.speak(text)
+        self.on_chat("sonya", text)
+
+    async def speak(self, text: str):
+        self._mark_response()
+        if not self.mute_voice:
+            await voice.speak_async(text, play=self.play, on_audio=self._on_audio, lock=self.speak_lock)
+
+    def _on_audio(self, audio):
+        now = time.perf_counter()
+        self.on_event("audio_start", now)
+        if self.echo is not None:
+            self._add_reference(audio, voice.sample_rate * voice.playback_speed, now)
+
+    def play_earcon(self, name):
+        """
+        Не блокирует: сигнал подмешивается в общий вывод поверх речи.
+        """
+        if not self.earcons:
+            return
+        handle = earcons.play(name)
+        if handle is not None and self.echo is not None:
+            self._add_reference(handle.samples, handle.engine.samplerate, time.perf_counter())
+
+    def _add_reference(self, audio, rate, start):
+        # Передискретизация опорного сигнала (~20 мс на предложение) — в пуле ASR:
+        # тот же пул, что и echo.process, так что эхо не обгонит свою опору
+        if self.asr_executor is None:
+            self.echo.add_reference(audio, rate, start)
+            return
+        future = self.asr_executor.submit(self.echo.add_reference, audio, rate, start)
+        future.add_done_callback(_log_reference_error)
+
+    async def greet(self):
+        hour = datetime.now().hour
+        if 5 <= hour < 12:
+            greeting = "Доброе утро! Как я могу помочь тебе сегодня?"
+        elif 12 <= hour < 18:
+            greeting = "Добрый день! Чем могу помочь?"
+        else:
+            greeting = "Добрый вечер! Какие у тебя планы на вечер?"
+        await self.speak(greeting)
+        self.on_chat("sonya", greeting)
+
+    # --- Память разговора ---
+
+    async def _compact(self):
+        try:
+            await self.memory.compact()
+        finally:
+            self._compaction = None
+            self._schedule_save()
+
+    async def _summarize(self, summary: str, turns: list) -> str:
+        if self._summary_llm is None:
+            # Свой клиент: сжатие не отменяет ответ на новую команду
+            self._summary_llm = self.llm.detached()
+        dialogue = "\n".join(
+            f"{'Пользователь' if m['role'] == 'user' else 'Соня'}: {m['content']}" for m in turns)
+        words = memory_summary_budget // 2
+        prompt = (
+            f"Сожми разговор в краткую сводку не длиннее {words} слов. Сохрани факты "
+            f"о пользователе, его просьбы и договорённости.\n\n"
+            f"Прежняя сводка: {summary or 'нет'}\n\nНовые реплики:\n{dialogue}"
+        )
+        return (await self._summary_llm.complete([{"role": "user", "content": prompt}])).strip()
+
+    async def shutdown(self, timeout=concurrency.shutdown_timeout):
+        """
+        Плавная остановка: ответ обрывается сразу, сжатие памяти получает
+        до timeout секунд, чтобы сводка успела сохраниться.
+        """
+        if self._reply is not None:
+            self._reply.cancel()
+        if self._save is not None:
+            self._save.cancel()  # память и кэш сохранит close()
+        self.llm.cancel()
+        await self.tasks.close(timeout)
+        self.close()
+
+    def close(self):
+        self.tasks.cancel()
+        self._write_state()
+        self.llm.close()
+        if self._summary_llm is not None:
+            self._summary_llm.close()
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Кольцевой буфер аудио на заранее выделенном массиве NumPy.
+
+    write() вызывается прямо из callback'а sounddevice и не выделяет память;
+    read() — корутина цикла событий, которую будит сам callback
+    (call_soon_threadsafe), без потока исполнителя, ждущего на q.get.
+
+    При переполнении:
+      - "drop_oldest" — затираются самые старые данные,
+      - "drop_newest" — отбрасывается то, что не поместилось.
+    """
+
+    def __init__(self, capacity_frames, channels=1, dtype=np.int16, overflow="drop_oldest"):
+        if overflow not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+        self.capacity = capacity_frames
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.overflow = overflow
+        self._data = np.zeros((capacity_frames, channels), dtype=self.dtype)
+        self._out = None
+        # Монотонные счётчики записанных и прочитанных кадров
+        self._written = 0
+        self._read = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._event = None
+        self._waiting = 0
+        self.stats = {"overruns": 0, "dropped_frames": 0, "max_fill": 0}
+
+    def attach(self, loop):
+        """
+        Привязывает буфер к циклу событий, в котором будет вызываться read().
+        """
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    @property
+    def fill(self):
+        return self._written - self._read
+
+    def write(self, indata):
+        """
+        Записывает блок из callback'а аудиопотока (bytes-like или ndarray).
+        """
+        frames = np.frombuffer(indata, dtype=self.dtype).reshape(-1, self.channels)
+        wake = False
+        with self._lock:
+            count = len(frames)
+            free = self.capacity - (self._written - self._read)
+            if count > free:
+                self.stats["overruns"] += 1
+                if self.overflow == "drop_newest":
+                    self.stats["dropped_frames"] += count - free
+                    frames = frames[:free]
+                    count = free
+                else:
+                    if count > self.capacity:
+                        # Блок больше всего буфера — остаётся только его хвост
+                        self.stats["dropped_frames"] += count - self.capacity
+                        frames = frames[-self.capacity:]
+                        count = self.capacity
+                    lost = count - free
+                    if lost > 0:
+                        self.stats["dropped_frames"] += lost
+                        self._read += lost
+            start = self._written % self.capacity
+            first = min(count, self.capacity - start)
+            self._data[start:start + first] = frames[:first]
+            self._data[:count - first] = frames[first:]
+            self._written += count
+            fill = self._written - self._read
+            if fill > self.stats["max_fill"]:
+                self.stats["max_fill"] = fill
+            if self._waiting and fill >= self._waiting:
+                self._waiting = 0
+                wake = True
+        if wake:
+            try:
+                self._loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                # Цикл событий уже закрыт
+                pass
+
+    async def read(self, frames):
+        """
+        Ждёт и возвращает ровно frames кадров. Возвращаемый массив
+        переиспользуется и действителен только до следующего вызова read().
+        """
+        if self._out is None or len(self._out) != frames:
+            self._out = np.empty((frames, self.channels), dtype=self.dtype)
+        while True:
+            with self._lock:
+                if self._written - self._read >= frames:
+                    start = self._read % self.capacity
+                    first = min(frames, self.capacity - start)
+                    self._out[:first] = self._data[start:start + first]
+                    self._out[first:] = self._data[:frames - first]
+                    self._read += frames
+                    return self._out
+                self._waiting = frames
+            await self._event.wait()
+            self._event.clear()
@@ -0,0 +1,52 @@
+"""
+Профиль моделей распознавания на эталонных записях.
+
+Для каждой найденной модели Vosk (asr_models.model_roots) или заданной
+через --model печатает время загрузки, прирост резидентной памяти после
+загрузки и после распознавания, real-time factor (по времени и по CPU) и
+WER — если рядом с WAV лежит расшифровка <имя>.txt. Каждая модель
+профилируется в отдельном процессе.
+
+    python bench_asr.py recordings/*.wav
+    python bench_asr.py recordings/*.wav --model model_small_ru --model models/vosk-model-ru-0.42
+"""
+import json
+import logging
+import argparse
+
+import asr_models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("wav", nargs="+", help="WAV 16 бит (частота любая)")
+    parser.add_argument("--model", action="append", help="имя или путь модели; по умолчанию — все найденные")
+    parser.add_argument("--root", action="append", help="каталог с моделями (вместо model_roots)")
+    parser.add_argument("--json", help="записать результаты в файл JSON")
+    parser.add_argument("--no-isolate", action="store_true", help="все модели в этом процессе")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    registry = asr_models.ASRModelRegistry(args.root)
+    names = args.model or registry.names()
+    if not names:
+        parser.error("модели Vosk не найдены, укажите --model или --root")
+    results = asr_models.profile(registry, names, args.wav, isolate=not args.no_isolate)
+
+    print(f"{'Модель':<28}{'загрузка':>10}{'память':>10}{'с распозн.':>12}{'RTF':>8}{'CPU RTF':>9}{'WER':>8}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<28}  ошибка: {result['error']}")
+            continue
+        wer = f"{result['wer'] * 100:.1f}%" if result["wer"] is not None else "—"
+        print(f"{name:<28}{result['load_seconds']:9.2f}с"
+              f"{result['load_rss_bytes'] / 2 ** 20:8.0f}МБ"
+              f"{result['rss_bytes'] / 2 ** 20:10.0f}МБ"
+              f"{result['rtf']:8.3f}{result['cpu_rtf']:9.3f}{wer:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Проверка хеджированных запросов к LLM на локальных фейковых серверах.
+
+Поднимает несколько OpenAI-совместимых серверов (SSE) с заданными задержками
+и долей ошибок и сравнивает время до первого токена: один провайдер против
+HedgedBackend (providers.py) поверх всех. Сеть и g4f не нужны.
+
+    python bench_llm.py --requests 100
+"""
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import llm
+import metrics
+from providers import HedgedBackend, Provider
+from bench_pipeline import percentile
+
+
+class FakeLLMServer:
+    """
+    Фейковый OpenAI-совместимый сервер: первый токен через first_token_delay
+    (с вероятностью tail_rate — через tail_delay), доля error_rate запросов
+    отвечает 500.
+    """
+
+    def __init__(self, first_token_delay=0.2, tail_rate=0.0, tail_delay=5.0,
+                 error_rate=0.0, token_delay=0.01, seed=0):
+        self.first_token_delay = first_token_delay
+        self.tail_rate = tail_rate
+        self.tail_delay = tail_delay
+        self.error_rate = error_rate
+        self.token_delay = token_delay
+        self.random = random.Random(seed)
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                fake.requests += 1
+                if fake.random.random() < fake.error_rate:
+                    self.send_error(500)
+                    return
+                tail = fake.random.random() < fake.tail_rate
+                time.sleep(fake.tail_delay if tail else fake.first_token_delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                try:
+                    for word in ["Это ", "тестовый ", "ответ."]:
+                        chunk = {"choices": [{"delta": {"content": word}}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                        time.sleep(fake.token_delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+async def measure(backend, count):
+    client = llm.LLMClient(backend, model="fake", timeout=30)
+    first_tokens, errors = [], 0
+    messages = [{"role": "user", "content": "привет"}]
+    for _ in range(count):
+        start = time.perf_counter()
+        first = None
+        try:
+            async for _ in client.stream(messages):
+                if first is None:
+                    first = time.perf_counter() - start
+        except Exception:
+            errors += 1
+            continue
+        first_tokens.append(first)
+    client.close()
+    return first_tokens, errors
+
+
+def report(label, first_tokens, errors, count):
+    print(f"  {label:<28}" + "".join(
+        f"{percentile(first_tokens, q) * 1000:>9.0f}" for q in (50, 90, 99))
+        + f"{errors:>9}/{count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--hedge-after", type=float, default=None,
+                        help="порог хеджирования, с (по умолчанию — по p90)")
+    args = parser.parse_args()
+    logging.getLogger('sonya_assistant_gui').setLevel(logging.ERROR)
+
+    servers = {
+        "быстрый с хвостом": FakeLLMServer(0.2, tail_rate=0.1, tail_delay=3.0, seed=1),
+        "медленный": FakeLLMServer(0.6, seed=2),
+        "сбойный": FakeLLMServer(0.1, error_rate=0.5, seed=3),
+    }
+    print(f"{'':<30}{'p50, мс':>9}{'p90, мс':>9}{'p99, мс':>9}{'ошибок':>12}")
+    try:
+        for name, server in servers.items():
+            report(f"только «{name}»", *asyncio.run(measure(llm.HTTPBackend(server.url), args.requests)),
+                   args.requests)
+        providers = [Provider(name, llm.HTTPBackend(server.url), "fake", reset_timeout=5.0)
+                     for name, server in servers.items()]
+        backend = HedgedBackend(providers, hedge_after=args.hedge_after)
+        report("хеджирование по всем", *asyncio.run(measure(backend, args.requests)), args.requests)
+        print(f"Дублировано запросов: {metrics.registry.get('sonya_llm_hedged_total').value}, "
+              f"срабатываний автоматов: {metrics.registry.get('sonya_llm_breaker_open_total').value}")
+        for name, status in backend.status().items():
+            print(f"  {name}: {status}")
+    finally:
+        for server in servers.values():
+            server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Стресс-тест цикла событий: задержка планирования под нагрузкой.
+
+Несколько ассистентов в одном цикле событий (как сессии сервера или
+приложение с очередью команд) одновременно получают записи в реальном
+времени, распознают их, отвечают через llm.FakeBackend, синтезируют ответы
+и проигрывают их в реальном времени; параллельно из группы задач идут
+текстовые команды. concurrency.LoopLagMonitor меряет, насколько позже
+запланированного просыпается цикл. Блокирующая работа при этом идёт в
+пулах concurrency.executors; с --compare тот же прогон повторяется с
+декодированием Vosk прямо в цикле событий — для сравнения.
+
+Ответы идут тем же путём, что и в приложении: общий PlaybackEngine
+(передискретизация под скорость речи, очередь вывода) и опорный сигнал
+эхоподавления. --output null (по умолчанию) — тот же движок без
+звуковой карты, device — настоящая звуковая карта, sink — упрощённый
+вывод, который только ждёт длительность фрагмента. Кэш TTS — во
+временном каталоге, как в bench_pipeline.py.
+
+Первой строкой печатается задержка холостого цикла — нижняя граница для
+этой машины (таймеры ОС, виртуализация). Код возврата 1, если p99
+задержки под нагрузкой больше, чем у холостого цикла плюс --max-lag-ms.
+
+    python bench_loop.py recordings/*.wav --streams 4 --seconds 30
+    python bench_loop.py recordings/*.wav --no-tts --compare
+    python bench_loop.py recordings/*.wav --output device
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+import vosk
+
+import llm
+import voice
+import earcons
+import concurrency
+import assistant as assistant_module
+from assistant import Assistant
+from bench_pipeline import read_wav, block_seconds, percentile, temp_tts_cache
+
+command_interval = 0.5
+
+
+class RealtimeSink:
+    """
+    Упрощённый вывод (--output sink): «играет» фрагмент столько, сколько
+    он звучал бы, блокируя поток пула audio, но без PlaybackEngine.
+    """
+
+    def __call__(self, audio):
+        time.sleep(len(audio) / voice.sample_rate / voice.playback_speed)
+
+
+async def voice_stream(assistant, recordings, deadline):
+    # Записи по кругу в реальном времени, пока не истечёт deadline
+    while time.perf_counter() < deadline:
+        for _, samplerate, blocks in recordings:
+            for data in blocks:
+                await assistant.feed(data)
+                await asyncio.sleep(block_seconds)
+            await assistant.wait_reply()
+            if time.perf_counter() >= deadline:
+                return
+
+
+async def text_commands(assistant, group, deadline, counters):
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        group.create_task(assistant.process_command(f"расскажи историю номер {n}"),
+                          name="command", deadline=10.0)
+        counters["commands"] += 1
+        await asyncio.sleep(command_interval)
+
+
+async def idle(seconds, interval):
+    monitor = concurrency.LoopLagMonitor(interval=interval)
+    task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return monitor.samples
+
+
+async def run(args, model, inline):
+    backend = llm.FakeBackend(first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+    recordings = [(path, *read_wav(path)) for path in args.wavs]
+    monitor = concurrency.LoopLagMonitor(interval=args.interval)
+    group = concurrency.TaskGroup("bench")
+    counters = {"commands": 0}
+
+    def make_assistant():
+        a = Assistant(llm_client=llm.LLMClient(backend, timeout=30, executor=concurrency.executors["llm"]),
+                      play=RealtimeSink() if args.output == "sink" else None,
+                      memory_file=None, cache_file=None,
+                      asr_executor=None if inline else concurrency.executors["asr"])
+        a.earcons = args.output != "sink"
+        a.response_cache = None
+        a.mute_voice = args.no_tts
+        # Своя очередь реплик; общий PlaybackEngine ставит фрагменты друг за другом
+        a.speak_lock = asyncio.Lock()
+        return a
+
+    assistants = [make_assistant() for _ in range(args.streams)]
+    for a, (_, samplerate, _) in zip(assistants, recordings * args.streams):
+        a.start_recognition(model, samplerate)
+    texts = make_assistant()
+    texts.mute_voice = True  # иначе озвучка команд копится в очереди своего вывода
+
+    lag_task = asyncio.create_task(monitor.run())
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    deadline = wall_start + args.seconds
+    for i, a in enumerate(assistants):
+        # Потоки сдвинуты по фазе, чтобы блоки не приходили разом
+        shift = i % len(recordings)
+        group.create_task(voice_stream(a, recordings[shift:] + recordings[:shift], deadline), name=f"stream-{i}")
+    group.create_task(text_commands(texts, group, deadline, counters), name="commands")
+    await asyncio.sleep(args.seconds)
+    await group.close(timeout=args.first_token_delay + 10.0)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    lag_task.cancel()
+    await asyncio.gather(lag_task, return_exceptions=True)
+    for a in assistants + [texts]:
+        await a.shutdown()
+    return monitor.samples, counters, cpu / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("wavs", nargs="+", help="WAV 16 бит моно")
+    parser.add_argument("--model", default="model_small_ru")
+    parser.add_argument("--streams", type=int, default=2, help="одновременных аудиопотоков")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--interval", type=float, default=0.01, help="период замера задержки, с")
+    parser.add_argument("--max-lag-ms", type=float, default=5.0,
+                        help="допустимый прирост p99 задержки над холостым циклом, мс")
+    parser.add_argument("--compare", action="store_true", help="ещё прогон с декодированием в цикле")
+    parser.add_argument("--no-tts", action="store_true", help="не синтезировать речь")
+    parser.add_argument("--output", choices=("null", "device", "sink"), default="null",
+                        help="вывод ответов: PlaybackEngine без звуковой карты, со звуковой картой "
+                             "или упрощённый")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    logging.getLogger('sonya_assistant_gui').setLevel(logging.WARNING)
+    vosk.SetLogLevel(-1)
+    if not all(os.path.isfile(path) for path in args.wavs):
+        sys.exit("Не все WAV-файлы найдены")
+    assistant_module.vad_gate = True
+    concurrency.executors.sizes.update(asr=args.streams, audio=args.streams + 1, tts=2)
+    voice.output_device = None if args.output == "device" else "null"
+    cache_dir = temp_tts_cache()
+    model = vosk.Model(args.model)
+    if not args.no_tts:
+        voice.load_model()
+    if args.output != "sink":
+        earcons.preload()
+
+    print(f"{args.streams} аудиопотоков + команды каждые {command_interval:.1f} с, {args.seconds:.0f} с")
+    print(f"{'режим':<28}{'p50, мс':>9}{'p99, мс':>9}{'макс, мс':>10}{'команд':>8}{'CPU':>7}")
+    samples = asyncio.run(idle(min(5.0, args.seconds), args.interval))
+    idle_p99 = percentile(samples, 99) * 1000
+    print(f"{'холостой цикл':<28}{percentile(samples, 50) * 1000:9.2f}{idle_p99:9.2f}{max(samples) * 1000:10.1f}")
+    failed = False
+    modes = [("пулы concurrency", False)] + ([("декодирование в цикле", True)] if args.compare else [])
+    for label, inline in modes:
+        samples, counters, load = asyncio.run(run(args, model, inline))
+        p50, p99 = percentile(samples, 50) * 1000, percentile(samples, 99) * 1000
+        print(f"{label:<28}{p50:9.2f}{p99:9.2f}{max(samples) * 1000:10.1f}"
+              f"{counters['commands']:8d}{load:7.0%}")
+        if not inline and p99 > idle_p99 + args.max_lag_ms:
+            failed = True
+    concurrency.executors.shutdown()
+    if voice.output is not None:
+        voice.output.close()
+    cache_dir.cleanup()
+    if failed:
+        print(f"p99 задержки цикла выросла больше чем на {args.max_lag_ms:.1f} мс")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
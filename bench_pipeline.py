@@ -0,0 +1,333 @@
+"""
+Headless-бенчмарк всего конвейера на записанном аудио.
+
+WAV-файлы (16 бит, моно, например «Соня, расскажи анекдот») прогоняются
+через тот же Assistant, что и в приложении: распознавание → wake word →
+маршрутизация команд → LLM → TTS. Вместо g4f — детерминированный
+llm.FakeBackend, вместо звуковой карты — «немой» вывод. Микрофон, колонки,
+дисплей и сеть не нужны.
+
+Отчёт: перцентили задержек по этапам и от конца команды до первого звука,
+RTF распознавания и синтеза, загрузка CPU. Кэш TTS на время прогона —
+во временном каталоге: постоянный tts_cache не подменяет синтез попаданиями
+и не засоряется фразами бенчмарка.
+
+С --barge-in запись после команды звучит ещё раз поверх ответа (в реальном
+времени, с эхом ответа в «микрофоне»): замеряется время от начала
+перебивающей речи до остановки вывода и число ложных перебиваний эхом.
+
+С --response-cache все прогоны делят один кэш ответов LLM (в памяти): со
+второго повтора вопросы отвечаются из кэша, и «final → первый звук»
+показывает выигрыш от попаданий.
+
+    python bench_pipeline.py recordings/*.wav --repeat 5
+    python bench_pipeline.py recordings/*.wav --barge-in
+    python bench_pipeline.py recordings/*.wav --response-cache
+"""
+import os
+import sys
+import time
+import wave
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+import vosk
+
+import llm
+import voice
+import assistant as assistant_module
+from assistant import Assistant
+from response_cache import ResponseCache
+from resample import Resampler
+from tts_cache import TTSCache
+
+block_seconds = 0.25
+# Тишина после записи, чтобы эндпойнтер Vosk закрыл фразу
+tail_seconds = 1.0
+
+stages = [
+    ("wake → final", "wake", "final"),
+    ("final → routed", "final", "routed"),
+    ("routed → llm 1-й токен", "routed", "llm_first_token"),
+    ("llm 1-й токен → конец", "llm_first_token", "llm_done"),
+    ("final → первый звук", "final", "audio_start"),
+]
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+            raise ValueError(f"{path}: нужен WAV 16 бит моно")
+        samplerate = wf.getframerate()
+        frames = int(samplerate * block_seconds)
+        blocks = []
+        while True:
+            data = wf.readframes(frames)
+            if not data:
+                break
+            blocks.append(data)
+    silence = bytes(2 * frames)
+    blocks.extend([silence] * int(tail_seconds / block_seconds))
+    return samplerate, blocks
+
+
+class Trace:
+    """
+    Собирает события Assistant.on_event за одну запись.
+    """
+
+    def __init__(self):
+        self.marks = {}
+        self.decode_seconds = 0.0
+
+    def __call__(self, name, value):
+        if name == "asr_decode":
+            self.decode_seconds += value
+        else:
+            self.marks.setdefault(name, value)
+
+
+class TTSTimer:
+    """
+    Замеряет чистое время синтеза (без кэша) — для RTF синтеза.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.audio_seconds = 0.0
+        self._render = voice._render
+
+    def __call__(self, text):
+        start = time.perf_counter()
+        audio = self._render(text)
+        self.seconds += time.perf_counter() - start
+        self.audio_seconds += len(audio) / voice.sample_rate
+        return audio
+
+
+def null_sink(audio):
+    pass
+
+
+class PlaybackSink:
+    """
+    Вывод для замера перебивания: «играет» фрагмент столько, сколько он
+    звучал бы, останавливается по stop() и отдаёт своё эхо в микрофон
+    (с задержкой echo_delay и ослаблением echo_gain).
+    """
+
+    def __init__(self, samplerate, echo_gain=0.3, echo_delay=0.05):
+        self.samplerate = samplerate
+        self.echo_gain = echo_gain
+        self.echo_delay = echo_delay
+        self.rate = voice.sample_rate * voice.playback_speed
+        self.stopped = None
+        self._segments = []  # (начало эха, отсчёты на частоте микрофона)
+        self._resampler = Resampler(self.rate, samplerate)
+        self._stop = threading.Event()
+
+    def __call__(self, audio):
+        # Поток исполнителя, как и настоящий вывод
+        self._stop.clear()
+        self._resampler.reset()
+        echo = self._resampler.process(audio).astype(np.float32) * self.echo_gain
+        self._segments.append((time.perf_counter() + self.echo_delay, echo))
+        self._stop.wait(len(audio) / self.rate)
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+        self._stop.set()
+        moment = self.stopped + self.echo_delay
+        self._segments = [(start, echo[:max(0, int((moment - start) * self.samplerate))])
+                          for start, echo in self._segments]
+
+    def mix(self, data, end):
+        """
+        Добавляет к блоку микрофона эхо, звучавшее до момента end.
+        """
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        start = end - len(samples) / self.samplerate
+        for seg_start, echo in list(self._segments):
+            offset = int(round((seg_start - start) * self.samplerate))
+            a, b = max(0, offset), min(len(samples), offset + len(echo))
+            if a < b:
+                samples[a:b] += echo[a - offset:b - offset]
+        return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+
+def has_speech(data, threshold=0.01):
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+    return bool(len(samples)) and float(np.sqrt(np.mean(samples ** 2))) > threshold
+
+
+async def barge_in_run(assistant, trace, blocks, samplerate, args):
+    """
+    Команда, затем та же запись поверх ответа. Возвращает (задержка
+    остановки вывода или None, было ли ложное перебивание до речи).
+    """
+    sink = voice.play_audio = PlaybackSink(samplerate)
+    silence = bytes(len(blocks[0]))
+    next_block = time.perf_counter()
+
+    async def feed(data):
+        nonlocal next_block
+        next_block += block_seconds
+        await asyncio.sleep(max(0.0, next_block - time.perf_counter()))
+        now = time.perf_counter()
+        await assistant.feed(sink.mix(data, now), now)
+
+    for data in blocks:
+        await feed(data)
+    deadline = time.perf_counter() + 30
+    while "audio_start" not in trace.marks and time.perf_counter() < deadline:
+        await feed(silence)
+    for _ in range(int(args.barge_in_after / block_seconds)):
+        await feed(silence)
+    false_barge_in = "barge_in" in trace.marks
+    onset = None
+    for data in blocks:
+        if onset is None and has_speech(data):
+            onset = next_block + block_seconds  # блок «записан» к этому моменту
+        await feed(data)
+    await assistant.flush()
+    if false_barge_in or onset is None or sink.stopped is None or sink.stopped < onset - block_seconds:
+        return None, false_barge_in
+    # Речь в блоке начинается не раньше его начала
+    return sink.stopped - (onset - block_seconds), false_barge_in
+
+
+async def run(args):
+    backend = llm.FakeBackend(first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+    model = vosk.Model(args.model)
+    if not args.no_tts:
+        voice.load_model()
+        voice._render = tts_timer = TTSTimer()
+    voice.play_audio = null_sink
+
+    recordings = [(path, *read_wav(path)) for path in args.wavs]
+    results = {name: [] for name, _, _ in stages}
+    interruptions, false_barge_ins = [], 0
+    decode_seconds = audio_seconds = skipped_seconds = 0.0
+    missed = 0
+    assistant_module.vad_gate = not args.no_vad
+    response_cache = ResponseCache(
+        fuzzy_threshold=assistant_module.response_cache_fuzzy) if args.response_cache else None
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(args.repeat):
+        for path, samplerate, blocks in recordings:
+            trace = Trace()
+            assistant = Assistant(llm_client=llm.LLMClient(backend, timeout=30), on_event=trace,
+                                  memory_file=None)
+            assistant.earcons = False
+            # Без --response-cache каждый прогон — настоящий запрос к LLM
+            assistant.response_cache = response_cache
+            assistant.mute_voice = args.no_tts
+            assistant.start_recognition(model, samplerate)
+            if args.barge_in:
+                latency, false_barge_in = await barge_in_run(assistant, trace, blocks, samplerate, args)
+                false_barge_ins += false_barge_in
+                if latency is not None:
+                    interruptions.append(latency)
+            else:
+                for data in blocks:
+                    await assistant.feed(data)
+                    if args.realtime:
+                        await asyncio.sleep(block_seconds)
+                await assistant.flush()
+            assistant.close()
+
+            decode_seconds += trace.decode_seconds
+            audio_seconds += len(blocks) * block_seconds
+            if assistant.vad is not None:
+                skipped_seconds += assistant.vad.stats["skipped_seconds"]
+            if "final" not in trace.marks:
+                missed += 1
+                print(f"  {os.path.basename(path)}: команда не распознана")
+                continue
+            for name, start, end in stages:
+                if start in trace.marks and end in trace.marks:
+                    results[name].append(trace.marks[end] - trace.marks[start])
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    runs = args.repeat * len(recordings)
+    print(f"Записей: {len(recordings)} × {args.repeat}, аудио {audio_seconds:.1f} с, "
+          f"нераспознано {missed}/{runs}")
+    print(f"{'этап':<26}{'n':>5}{'p50, мс':>10}{'p90, мс':>10}{'p99, мс':>10}")
+    for name, _, _ in stages:
+        values = results[name]
+        print(f"{name:<26}{len(values):>5}" + "".join(
+            f"{percentile(values, q) * 1000:>10.1f}" for q in (50, 90, 99)))
+    print(f"RTF распознавания: {decode_seconds / audio_seconds:.3f}")
+    if not args.no_vad:
+        print(f"VAD: пропущено {skipped_seconds / audio_seconds:.0%} аудио "
+              f"(сравните RTF с --no-vad)")
+    if args.barge_in:
+        print(f"Перебивание: остановка вывода p50 {percentile(interruptions, 50) * 1000:.0f} мс, "
+              f"p90 {percentile(interruptions, 90) * 1000:.0f} мс (блок {block_seconds * 1000:.0f} мс); "
+              f"сработало {len(interruptions)}/{runs}, ложных (эхо) {false_barge_ins}")
+    if not args.no_tts and tts_timer.audio_seconds:
+        print(f"RTF синтеза: {tts_timer.seconds / tts_timer.audio_seconds:.3f} "
+              f"(кэш TTS: {voice.cache.stats})")
+    if response_cache is not None:
+        print(f"Кэш ответов: {response_cache.stats}")
+    print(f"CPU: {cpu:.1f} с за {wall:.1f} с ({cpu / wall:.0%} одного ядра)")
+
+
+def temp_tts_cache():
+    """
+    Подменяет voice.cache пустым кэшем во временном каталоге; каталог
+    удаляется вместе с возвращённым объектом (или явно через cleanup()).
+    """
+    directory = tempfile.TemporaryDirectory(prefix="bench_tts_cache_")
+    voice.cache = TTSCache(directory.name)
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("wavs", nargs="+", help="WAV 16 бит моно")
+    parser.add_argument("--model", default="model_small_ru")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--realtime", action="store_true",
+                        help="подавать аудио в реальном времени, а не максимально быстро")
+    parser.add_argument("--no-tts", action="store_true", help="не синтезировать речь")
+    parser.add_argument("--no-vad", action="store_true", help="декодировать и тишину")
+    parser.add_argument("--barge-in", action="store_true",
+                        help="перебивать ответ той же записью и замерять остановку вывода")
+    parser.add_argument("--barge-in-after", type=float, default=0.5,
+                        help="через сколько секунд ответа перебивать")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="общий кэш ответов LLM на все прогоны")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+    if args.barge_in and args.no_tts:
+        parser.error("--barge-in нужен синтез речи")
+
+    logging.getLogger('sonya_assistant_gui').setLevel(logging.WARNING)
+    vosk.SetLogLevel(-1)
+    if not all(os.path.isfile(path) for path in args.wavs):
+        sys.exit("Не все WAV-файлы найдены")
+    cache_dir = temp_tts_cache()
+    try:
+        asyncio.run(run(args))
+    finally:
+        cache_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
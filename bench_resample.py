@@ -0,0 +1,89 @@
+"""
+Бенчмарк передискретизации перед распознаванием.
+
+Запись (WAV 16 бит моно) поднимается до частоты микрофона (по умолчанию
+48 кГц) и распознаётся двумя способами: Vosk получает поток устройства как
+есть и передискретизирует сам, либо resample.Resampler сначала приводит его
+к 16 кГц. Печатает процессорное время обоих вариантов, объём данных,
+прошедших через AcceptWaveform, и тексты — они должны совпадать.
+
+    python bench_resample.py recordings/sonya.wav --rate 48000
+"""
+import json
+import time
+import wave
+import argparse
+
+import numpy as np
+import vosk
+
+from resample import Resampler
+
+block_seconds = 0.5
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+            raise ValueError(f"{path}: нужен WAV 16 бит моно")
+        return wf.getframerate(), np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def recognize(model, rate, blocks, convert=None):
+    rec = vosk.KaldiRecognizer(model, rate)
+    fed = 0
+    cpu_start = time.process_time()
+    for block in blocks:
+        if convert is not None:
+            block = convert(block)
+        data = block.tobytes()
+        fed += len(data)
+        rec.AcceptWaveform(data)
+    text = json.loads(rec.FinalResult())["text"]
+    return time.process_time() - cpu_start, fed, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("wav", help="WAV 16 бит моно")
+    parser.add_argument("--rate", type=int, default=48000, help="частота «микрофона»")
+    parser.add_argument("--model", default="model_small_ru")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    vosk.SetLogLevel(-1)
+
+    source_rate, audio = read_wav(args.wav)
+    device_audio = Resampler(source_rate, args.rate).process(audio)
+    step = int(args.rate * block_seconds)
+    blocks = [device_audio[i:i + step] for i in range(0, len(device_audio), step)]
+    seconds = len(device_audio) / args.rate
+
+    # Стоимость самого передискретизатора
+    resampler = Resampler(args.rate, 16000)
+    start = time.process_time()
+    for _ in range(args.repeat):
+        for block in blocks:
+            resampler.process(block)
+    resample_cpu = (time.process_time() - start) / args.repeat
+    print(f"Аудио {seconds:.1f} с; Resampler {args.rate} → 16000: "
+          f"{resample_cpu * 1000:.1f} мс CPU ({resample_cpu / seconds * 3600:.1f} с на час)")
+
+    model = vosk.Model(args.model)
+    results = {}
+    for label, rate, make_convert in (
+            (f"Vosk на {args.rate} Гц", args.rate, lambda: None),
+            ("Resampler + Vosk на 16000 Гц", 16000, lambda: Resampler(args.rate, 16000).process)):
+        cpu = []
+        for _ in range(args.repeat):
+            seconds_cpu, fed, text = recognize(model, rate, blocks, make_convert())
+            cpu.append(seconds_cpu)
+        results[label] = text
+        best = min(cpu)
+        print(f"  {label:<30} CPU {best:6.2f} с (RTF {best / seconds:.3f}), "
+              f"в AcceptWaveform {fed / 1024:.0f} КиБ")
+    texts = list(results.values())
+    print("Тексты совпадают" if texts[0] == texts[1] else f"Тексты различаются: {results}")
+
+
+if __name__ == "__main__":
+    main()
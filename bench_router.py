@@ -0,0 +1,72 @@
+"""
+Микробенчмарк маршрутизации команд.
+
+Меряет среднее время router.match для точных совпадений, нечётких совпадений
+и промахов (уходят в LLM) — на реестре из commands.py и на синтетическом
+реестре с большим числом команд.
+
+    python bench_router.py --intents 500 --repeat 2000
+"""
+import time
+import random
+import argparse
+
+import commands
+from intents import IntentRouter
+
+hits = [
+    "соня открой браузер пожалуйста",
+    "сделай громче",
+    "уменьши яркость экрана",
+]
+fuzzy = [
+    "открой брузер",
+    "уменши громкость",
+]
+misses = [
+    "расскажи мне анекдот про программистов",
+    "какая завтра будет погода в москве",
+]
+
+words = ["включи", "выключи", "поставь", "запусти", "покажи", "найди", "свет",
+         "музыку", "таймер", "камеру", "чайник", "кондиционер", "новости", "почту"]
+
+
+def synthetic_router(count):
+    rng = random.Random(0)
+    router = IntentRouter()
+    for i in range(count):
+        phrase = " ".join(rng.sample(words, 2)) + f" {i}"
+        router.register([phrase], lambda assistant, command: None, name=f"intent_{i}")
+    for intent in commands.router.intents:
+        router.register(intent.phrases, intent.handler, name=intent.name, exact=intent.exact)
+    return router
+
+
+def measure(router, texts, repeat):
+    router.build()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            router.match(text)
+    elapsed = time.perf_counter() - start
+    calls = repeat * len(texts)
+    return elapsed / calls * 1e6, calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--intents", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, router in (("commands.py", commands.router),
+                         (f"синтетический ({args.intents})", synthetic_router(args.intents))):
+        print(f"{name}: {len(router.intents)} команд")
+        for label, texts in (("точные", hits), ("нечёткие", fuzzy), ("промахи", misses)):
+            micros, rate = measure(router, texts, args.repeat)
+            print(f"  {label:<10} {micros:9.2f} мкс/запрос  {rate:12.0f} запросов/с")
+
+
+if __name__ == "__main__":
+    main()
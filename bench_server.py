@@ -0,0 +1,148 @@
+"""
+Нагрузочный тест сервера (server.py) синтетическими клиентами.
+
+Каждый клиент в реальном времени шлёт блоки аудио из WAV-записи по кругу
+и раз в секунду — метку синхронизации. Задержка возврата метки показывает,
+насколько сервер отстаёт от реального времени. Число клиентов растёт
+ступенями; ступень считается выдержанной, если p95 задержки меньше
+--max-lag и ни одно подключение не отклонено.
+
+По умолчанию сервер поднимается в этом же процессе с тестовой заглушкой
+LLM; --connect направляет клиентов на уже запущенный сервер.
+
+    python bench_server.py recordings/sonya.wav --sessions 1 2 4 8 16 --duration 20
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+import vosk
+
+import llm
+import voice
+import server
+from bench_pipeline import read_wav, percentile, block_seconds
+
+sync_every = int(1 / block_seconds)
+
+
+async def client(host, port, samplerate, blocks, duration, tts):
+    """
+    Один синтетический клиент; возвращает словарь с результатами.
+    """
+    result = {"rejected": False, "lags": [], "audio_bytes": 0, "replies": 0}
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(json.dumps({"samplerate": samplerate, "tts": tts}).encode("utf-8") + b"\n")
+    await writer.drain()
+    hello = json.loads(await reader.readline())
+    if hello.get("status") != "ok":
+        result["rejected"] = True
+        writer.close()
+        return result
+
+    sent = {}
+
+    async def receive():
+        while (frame := await server.read_frame(reader)) is not None:
+            kind, payload = frame
+            if kind == b"P":
+                result["audio_bytes"] += len(payload)
+                continue
+            event = json.loads(payload)
+            if event["type"] == "sync":
+                result["lags"].append(time.perf_counter() - sent.pop(event["id"]))
+            elif event["type"] == "stream" and event["finished"]:
+                result["replies"] += 1
+
+    receiver = asyncio.create_task(receive())
+    start = time.perf_counter()
+    count = 0
+    while time.perf_counter() - start < duration:
+        writer.write(server.pack_frame(b"A", blocks[count % len(blocks)]))
+        count += 1
+        if count % sync_every == 0:
+            sent[str(count)] = time.perf_counter()
+            writer.write(server.pack_frame(b"S", str(count).encode("utf-8")))
+        await writer.drain()
+        # Темп реального времени, без накопления ошибки
+        await asyncio.sleep(max(0.0, start + count * block_seconds - time.perf_counter()))
+    writer.write(server.pack_frame(b"E", b""))
+    await writer.drain()
+    try:
+        await asyncio.wait_for(receiver, timeout=30)
+    except asyncio.TimeoutError:
+        receiver.cancel()
+    # Метки, так и не вернувшиеся, считаем отставанием на весь остаток
+    result["lags"].extend(time.perf_counter() - t for t in sent.values())
+    writer.close()
+    return result
+
+
+async def run(args):
+    samplerate, blocks = read_wav(args.wav)
+    host, port = args.host, args.port
+    assistant_server = None
+    if not args.connect:
+        server.size_executors(max(args.sessions))
+        model = vosk.Model(args.model)
+        if args.tts:
+            voice.start_pool()
+        backend = llm.FakeBackend(first_token_delay=args.first_token_delay)
+        assistant_server = server.AssistantServer(
+            model, backend, max_sessions=max(args.sessions), tts=args.tts)
+        await assistant_server.start(host, port)
+
+    print(f"{'клиентов':>9}{'отклонено':>11}{'p50, мс':>10}{'p95, мс':>10}"
+          f"{'max, мс':>10}{'ответов':>9}  итог")
+    sustained = 0
+    try:
+        for count in args.sessions:
+            results = await asyncio.gather(*(
+                client(host, port, samplerate, blocks, args.duration, args.tts)
+                for _ in range(count)))
+            rejected = sum(r["rejected"] for r in results)
+            lags = [lag for r in results for lag in r["lags"]]
+            replies = sum(r["replies"] for r in results)
+            p95 = percentile(lags, 95)
+            ok = not rejected and lags and p95 < args.max_lag
+            if ok:
+                sustained = count
+            print(f"{count:>9}{rejected:>11}{percentile(lags, 50) * 1000:>10.0f}"
+                  f"{p95 * 1000:>10.0f}{max(lags, default=float('nan')) * 1000:>10.0f}"
+                  f"{replies:>9}  {'да' if ok else 'нет'}")
+            if not ok and not args.keep_going:
+                break
+    finally:
+        if assistant_server is not None:
+            await assistant_server.close()
+    print(f"Выдержано одновременных сессий: {sustained}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("wav", help="WAV 16 бит моно (лучше с командой «Соня, ...»)")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=20.0, help="длительность ступени, с")
+    parser.add_argument("--max-lag", type=float, default=0.5, help="допустимая p95 задержка, с")
+    parser.add_argument("--keep-going", action="store_true", help="не останавливаться на первой неудаче")
+    parser.add_argument("--tts", action="store_true", help="синтезировать ответы")
+    parser.add_argument("--connect", action="store_true", help="подключиться к запущенному серверу")
+    parser.add_argument("--host", default=server.server_host)
+    parser.add_argument("--port", type=int, default=server.server_port)
+    parser.add_argument("--model", default="model_small_ru")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    args = parser.parse_args()
+
+    logging.getLogger('sonya_assistant_gui').setLevel(logging.WARNING)
+    vosk.SetLogLevel(-1)
+    try:
+        asyncio.run(run(args))
+    except OSError as e:
+        sys.exit(f"Ошибка подключения: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Бенчмарк пакетного синтеза Silero.
+
+Сравнивает пропускную способность (секунд аудио за секунду) при синтезе
+фраз по одной и пакетами (tts_batch.synthesize_batch): сначала через пул
+процессов (все фразы поставлены в очередь разом, как от нескольких сессий),
+затем в этом процессе.
+
+    python bench_tts.py --batch 1 2 4 8 --workers 2
+"""
+import time
+import logging
+import argparse
+
+import voice
+import tts_batch
+from tts_pool import TTSPool
+
+sentences = [
+    "Добрый день! Чем могу помочь?",
+    "Сегодня в Москве облачно, без осадков.",
+    "Температура воздуха около пятнадцати градусов.",
+    "Вечером ожидается небольшой ветер.",
+    "Я поставила будильник на семь утра.",
+    "Напоминаю, что завтра у вас встреча в десять часов.",
+    "Громкость увеличена.",
+    "Открываю браузер.",
+]
+
+
+def report(label, seconds, audio_seconds, baseline=None):
+    speed = audio_seconds / seconds
+    suffix = f"  ×{speed / baseline:.2f}" if baseline else ""
+    print(f"  {label:<22}{seconds:8.2f} с  {speed:8.2f} с аудио/с{suffix}")
+    return speed
+
+
+def bench_pool(texts, sizes, workers, threads):
+    print(f"Пул: {workers} процессов × {threads} потоков, {len(texts)} фраз разом")
+    baseline = None
+    for size in sizes:
+        pool = TTSPool(workers, threads, batch_window=0.01, max_batch=size, model_file=voice.local_file)
+        pool.synthesize("Прогрев.", voice.speaker, voice.sample_rate)
+        start = time.perf_counter()
+        futures = [pool.submit(text, voice.speaker, voice.sample_rate) for text in texts]
+        audio_seconds = sum(len(f.result()[0]) for f in futures) / voice.sample_rate
+        speed = report(f"пакет до {size}", time.perf_counter() - start, audio_seconds, baseline)
+        baseline = baseline or speed
+        if pool.stats["batches"]:
+            print(f"    пакетов: {pool.stats['batches']}, в среднем по "
+                  f"{pool.stats['texts'] / pool.stats['batches']:.1f} фраз, "
+                  f"не удалось разрезать: {pool.stats['fallbacks']}")
+        pool.close()
+
+
+def bench_inline(texts, sizes):
+    print(f"В этом процессе, {len(texts)} фраз")
+    model = voice.model
+    tts_batch.synthesize_batch(model, ["Прогрев."], voice.speaker, voice.sample_rate)
+    baseline = None
+    for size in sizes:
+        tts_batch.stats.update(batches=0, texts=0, fallbacks=0)
+        start = time.perf_counter()
+        audio_seconds = 0.0
+        for i in range(0, len(texts), size):
+            audios = tts_batch.synthesize_batch(model, texts[i:i + size], voice.speaker, voice.sample_rate)
+            audio_seconds += sum(len(audio) for audio in audios) / voice.sample_rate
+        label = "по одной" if size == 1 else f"пакеты по {size}"
+        speed = report(label, time.perf_counter() - start, audio_seconds, baseline)
+        baseline = baseline or speed
+        if tts_batch.stats["fallbacks"]:
+            print(f"    пакетов не удалось разрезать: {tts_batch.stats['fallbacks']}/{tts_batch.stats['batches']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=2, help="сколько раз повторить набор фраз")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=voice.tts_threads)
+    parser.add_argument("--no-pool", action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger('sonya_assistant_gui').setLevel(logging.WARNING)
+    texts = sentences * args.repeat
+    sizes = sorted(set([1] + args.batch))
+    voice.load_model()
+    if not args.no_pool:
+        bench_pool(texts, sizes, args.workers, args.threads)
+    bench_inline(texts, sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Бенчмарк детектора wake word на корпусе записей.
+
+Структура корпуса:
+    corpus/positive/*.wav  — записи, где имя произносится
+    corpus/negative/*.wav  — записи без имени (речь, шум, ТВ)
+
+WAV: 16 бит, моно. Отчёт: доля ложных срабатываний (FA), доля пропусков (FR)
+и процессорное время на час аудио — для детектора и, для сравнения,
+для полного распознавателя, который раньше работал постоянно. Детектор
+меряется в обоих режимах: по итоговым результатам и по частичным
+(use_partial, как в приложении при assistant.wake_on_partial).
+
+    python bench_wakeword.py corpus --sensitivity 0.3 0.5 0.7
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+
+import vosk
+from fuzzywuzzy import fuzz
+
+from wakeword import WakeWordDetector, wake_words
+
+block_seconds = 0.5
+
+
+def read_blocks(path):
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+            raise ValueError(f"{path}: нужен WAV 16 бит моно")
+        samplerate = wf.getframerate()
+        frames = int(samplerate * block_seconds)
+        blocks = []
+        while True:
+            data = wf.readframes(frames)
+            if not data:
+                break
+            blocks.append(data)
+        return samplerate, blocks, wf.getnframes() / samplerate
+
+
+def load_corpus(corpus_dir):
+    files = []
+    for label in ("positive", "negative"):
+        folder = os.path.join(corpus_dir, label)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".wav"):
+                files.append((label == "positive", read_blocks(os.path.join(folder, name))))
+    return files
+
+
+def run_detector(model, samplerate, blocks, sensitivity, use_partial):
+    detector = WakeWordDetector(model, samplerate, sensitivity=sensitivity, use_partial=use_partial)
+    for data in blocks:
+        if detector.accept(data):
+            return True
+    return detector.finish()
+
+
+def run_full_decoder(model, samplerate, blocks):
+    # Прежняя схема: полный словарь + нечёткое сравнение итогового текста
+    rec = vosk.KaldiRecognizer(model, samplerate)
+    texts = []
+    for data in blocks:
+        if rec.AcceptWaveform(data):
+            texts.append(json.loads(rec.Result())["text"])
+    texts.append(json.loads(rec.FinalResult())["text"])
+    text = " ".join(texts).lower()
+    return any(fuzz.partial_ratio(text, word) > 80 for word in wake_words)
+
+
+def evaluate(name, corpus, detect):
+    false_accepts = false_rejects = positives = negatives = 0
+    audio_seconds = 0.0
+    cpu_start = time.process_time()
+    for is_positive, (samplerate, blocks, duration) in corpus:
+        audio_seconds += duration
+        fired = detect(samplerate, blocks)
+        if is_positive:
+            positives += 1
+            false_rejects += not fired
+        else:
+            negatives += 1
+            false_accepts += fired
+    cpu = time.process_time() - cpu_start
+    fa = false_accepts / negatives if negatives else 0.0
+    fr = false_rejects / positives if positives else 0.0
+    cpu_per_hour = cpu / audio_seconds * 3600 if audio_seconds else 0.0
+    print(f"{name:<28} FA={fa:6.2%} ({false_accepts}/{negatives})  "
+          f"FR={fr:6.2%} ({false_rejects}/{positives})  "
+          f"CPU={cpu_per_hour:7.1f} с/ч аудио")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", help="каталог с positive/ и negative/")
+    parser.add_argument("--model", default="model_small_ru")
+    parser.add_argument("--sensitivity", type=float, nargs="+", default=[0.5])
+    args = parser.parse_args()
+
+    vosk.SetLogLevel(-1)
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"В {args.corpus} нет записей")
+    model = vosk.Model(args.model)
+
+    for use_partial, mode in ((True, "частичные"), (False, "итоговые")):
+        for sensitivity in args.sensitivity:
+            evaluate(f"детектор, {mode} ({sensitivity})", corpus,
+                     lambda sr, blocks: run_detector(model, sr, blocks, sensitivity, use_partial))
+    evaluate("полный распознаватель", corpus,
+             lambda sr, blocks: run_full_decoder(model, sr, blocks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import os
+import json
+from datetime import datetime
+
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView
+from PyQt6.QtGui import QFont, QColor, QPixmap, QFontMetrics, QPainterPath
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QSize
+
+avatar_size = 50
+bubble_max_width = 300
+bubble_padding = 10
+margin = 10
+
+_colors = {
+    "user": QColor("#7289DA"),
+    "sonya": QColor("#99AAB5"),
+}
+
+
+class AvatarCache:
+    """
+    Общий кэш аватаров: каждый файл читается и масштабируется один раз.
+    """
+
+    def __init__(self, size=avatar_size):
+        self.size = size
+        self._pixmaps = {}
+
+    def get(self, path):
+        if path not in self._pixmaps:
+            pixmap = None
+            if path and os.path.exists(path):
+                pixmap = QPixmap(path).scaled(
+                    self.size, self.size,
+                    Qt.AspectRatioMode.KeepAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation
+                )
+            self._pixmaps[path] = pixmap
+        return self._pixmaps[path]
+
+
+class ChatModel(QAbstractListModel):
+    """
+    Модель истории чата.
+
+    В памяти — не больше max_messages последних сообщений. Вытесненные
+    сообщения дописываются в history_file (JSON Lines), их смещения
+    запоминаются, и при прокрутке вверх старые сообщения подгружаются
+    с диска страницами по page_size.
+    Файл переживает перезапуск: при открытии он индексируется, последняя
+    страница сразу подгружается, а close() дописывает то, что ещё в памяти.
+    Сообщение — кортеж (sender, text, time); снаружи на него ссылаются
+    по глобальному номеру, который не меняется при вытеснении и подгрузке.
+    """
+
+    def __init__(self, history_file="chat_history.jsonl", max_messages=200, page_size=50):
+        super().__init__()
+        self.max_messages = max_messages
+        self.page_size = page_size
+        self._rows = []
+        self._first = 0  # глобальный номер первого сообщения в памяти
+        self._offsets = []  # смещения в файле для сообщений, уже сохранённых на диск
+        # Двоичный режим: смещения — честные байты, запись всегда в конец файла
+        self._file = open(history_file, "a+b")
+        self._index()
+        self._first = len(self._offsets)
+        self.fetch_older()
+
+    def _index(self):
+        self._file.seek(0)
+        position = 0
+        for line in self._file:
+            # Недописанная строка (сбой при записи) в историю не попадает
+            if line.endswith(b"\n"):
+                self._offsets.append(position)
+            position += len(line)
+        if position and not line.endswith(b"\n"):
+            self._file.write(b"\n")
+
+    def _write(self, message):
+        self._offsets.append(self._file.tell())
+        self._file.write(json.dumps(list(message), ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        sender, text, time = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return text
+        if role == Qt.ItemDataRole.UserRole:
+            return sender, text, time
+        return None
+
+    def append(self, sender, text):
+        """
+        Добавляет сообщение, возвращает его глобальный номер.
+        """
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.append((sender, text, datetime.now().strftime("%H:%M")))
+        self.endInsertRows()
+        return self._first + row
+
+    def set_text(self, message_id, text):
+        row = message_id - self._first
+        if not 0 <= row < len(self._rows):
+            # Сообщение уже вытеснено на диск
+            return
+        sender, _, time = self._rows[row]
+        self._rows[row] = (sender, text, time)
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def trim(self):
+        """
+        Вытесняет самые старые сообщения на диск, пока в памяти их больше max_messages.
+        """
+        excess = len(self._rows) - self.max_messages
+        if excess <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+        self._file.seek(0, os.SEEK_END)
+        for message in self._rows[:excess]:
+            if self._first == len(self._offsets):
+                # Ещё не сохранено (а не подгружено обратно с диска)
+                self._write(message)
+            self._first += 1
+        del self._rows[:excess]
+        self._file.flush()
+        self.endRemoveRows()
+
+    def can_fetch_older(self):
+        return self._first > 0
+
+    def fetch_older(self):
+        """
+        Подгружает с диска страницу более старых сообщений, возвращает их число.
+        """
+        count = min(self.page_size, self._first)
+        if count <= 0:
+            return 0
+        start = self._first - count
+        self._file.seek(self._offsets[start])
+        older = []
+        for _ in range(count):
+            try:
+                older.append(tuple(json.loads(self._file.readline())))
+            except ValueError:
+                older.append(("sonya", "…", ""))  # испорченная запись
+        self.beginInsertRows(QModelIndex(), 0, count - 1)
+        self._rows[0:0] = older
+        self._first = start
+        self.endInsertRows()
+        return count
+
+    def close(self):
+        # Несохранённые сообщения — в историю для следующего запуска
+        self._file.seek(0, os.SEEK_END)
+        for message in self._rows[len(self._offsets) - self._first:]:
+            self._write(message)
+        self._file.close()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """
+    Рисует «пузырёк» сообщения прямо в QPainter: без виджетов,
+    таблиц стилей и анимаций на каждое сообщение.
+    """
+
+    def __init__(self, avatars, parent=None):
+        super().__init__(parent)
+        self.avatars = avatars
+        self.font = QFont("Arial", 11)
+        self.time_font = QFont("Arial", 8)
+        self._metrics = QFontMetrics(self.font)
+        self._time_height = QFontMetrics(self.time_font).height()
+
+    @staticmethod
+    def avatar_path(sender):
+        return "user_avatar.png" if sender == "user" else "bot_avatar.png"
+
+    def _text_rect(self, text):
+        return self._metrics.boundingRect(
+            QRect(0, 0, bubble_max_width - 2 * bubble_padding, 100000),
+            Qt.TextFlag.TextWordWrap, text)
+
+    def sizeHint(self, option, index):
+        sender, text, _ = index.data(Qt.ItemDataRole.UserRole)
+        text_rect = self._text_rect(text)
+        bubble_height = text_rect.height() + 2 * bubble_padding
+        height = max(bubble_height + self._time_height + 4, avatar_size) + 2 * margin
+        return QSize(option.rect.width(), height)
+
+    def paint(self, painter, option, index):
+        sender, text, time = index.data(Qt.ItemDataRole.UserRole)
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        rect = option.rect.adjusted(margin, margin, -margin, -margin)
+        is_user = sender == "user"
+
+        avatar = self.avatars.get(self.avatar_path(sender))
+        x_offset = 0
+        if avatar is not None:
+            x = rect.right() - avatar_size if is_user else rect.left()
+            painter.drawPixmap(x, rect.top(), avatar)
+            x_offset = avatar_size + margin
+
+        text_rect = self._text_rect(text)
+        width = text_rect.width() + 2 * bubble_padding
+        height = text_rect.height() + 2 * bubble_padding
+        if is_user:
+            left = rect.right() - x_offset - width
+        else:
+            left = rect.left() + x_offset
+        bubble = QRectF(left, rect.top(), width, height)
+
+        path = QPainterPath()
+        path.addRoundedRect(bubble, 15, 15)
+        painter.fillPath(path, _colors.get(sender, _colors["sonya"]))
+
+        painter.setPen(QColor("white"))
+        painter.setFont(self.font)
+        painter.drawText(bubble.adjusted(bubble_padding, bubble_padding, -bubble_padding, -bubble_padding),
+                         Qt.TextFlag.TextWordWrap, text)
+
+        painter.setPen(QColor("gray"))
+        painter.setFont(self.time_font)
+        align = Qt.AlignmentFlag.AlignRight if is_user else Qt.AlignmentFlag.AlignLeft
+        painter.drawText(QRectF(bubble.left(), bubble.bottom() + 2, bubble.width(), self._time_height),
+                         align, time)
+        painter.restore()
+
+
+class ChatView(QListView):
+    """
+    Виртуализированный чат: рисуются только видимые строки, стоимость
+    нового сообщения не растёт с длиной сессии.
+    """
+
+    def __init__(self, history_file="chat_history.jsonl", max_messages=200):
+        super().__init__()
+        self.avatars = AvatarCache()
+        self.chat_model = ChatModel(history_file, max_messages=max_messages)
+        self.setModel(self.chat_model)
+        self.setItemDelegate(MessageDelegate(self.avatars, self))
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setWordWrap(True)
+        self.setStyleSheet("""
+            QListView {
+                background-color: #2C2F33;
+                border: 2px solid #23272A;
+                border-radius: 10px;
+            }
+        """)
+        self.verticalScrollBar().valueChanged.connect(self._on_scroll)
+
+    def _at_bottom(self):
+        bar = self.verticalScrollBar()
+        return bar.value() >= bar.maximum() - 5
+
+    def add_message(self, sender, text):
+        follow = self._at_bottom()
+        message_id = self.chat_model.append(sender, text)
+        if follow:
+            # Вытесняем старое, только когда пользователь не листает историю
+            self.chat_model.trim()
+            self.scrollToBottom()
+        return message_id
+
+    def set_text(self, message_id, text):
+        follow = self._at_bottom()
+        self.chat_model.set_text(message_id, text)
+        if follow:
+            self.scrollToBottom()
+
+    def _on_scroll(self, value):
+        if value == self.verticalScrollBar().minimum() and self.chat_model.can_fetch_older():
+            count = self.chat_model.fetch_older()
+            if count:
+                # Сохраняем видимую позицию: прежняя первая строка остаётся на месте
+                self.scrollTo(self.chat_model.index(count), QAbstractItemView.ScrollHint.PositionAtTop)
@@ -0,0 +1,70 @@
+"""
+Локальные команды ассистента.
+
+Каждый обработчик — корутина handler(assistant, command), объявленная
+через @router.intent(...) со своими фразами-триггерами. Всё, что здесь
+нашлось, выполняется без обращения к LLM.
+"""
+import sys
+import asyncio
+import logging
+import webbrowser
+
+import concurrency
+from intents import IntentRouter
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+router = IntentRouter()
+
+
+async def _run(*args) -> bool:
+    # Внешняя утилита без блокировки цикла событий
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+    except FileNotFoundError:
+        logger.error(f"Не найдена утилита {args[0]}")
+        return False
+    return await process.wait() == 0
+
+
+@router.intent("открой браузер", "запусти браузер")
+async def open_browser(assistant, command):
+    await assistant.respond("Открываю браузер")
+    # webbrowser.open ждёт запуска браузера
+    await concurrency.run("commands", webbrowser.open, "https://www.google.com")
+
+
+async def _change(assistant, args, done, failed):
+    if sys.platform.startswith("linux") and await _run(*args):
+        await assistant.respond(done)
+    else:
+        await assistant.respond(failed)
+
+
+@router.intent("увеличь яркость", "прибавь яркость", "сделай ярче", exact=("ярче",))
+async def brightness_up(assistant, command):
+    await _change(assistant, ["brightnessctl", "set", "10%+"],
+                  "Яркость увеличена.", "Не получилось изменить яркость.")
+
+
+@router.intent("уменьши яркость", "убавь яркость", "сделай темнее", exact=("темнее",))
+async def brightness_down(assistant, command):
+    await _change(assistant, ["brightnessctl", "set", "10%-"],
+                  "Яркость уменьшена.", "Не получилось изменить яркость.")
+
+
+@router.intent("увеличь громкость", "прибавь громкость", "сделай громче", exact=("громче",))
+async def volume_up(assistant, command):
+    await _change(assistant, ["pactl", "set-sink-volume", "@DEFAULT_SINK@", "+10%"],
+                  "Громкость увеличена.", "Не получилось изменить громкость.")
+
+
+@router.intent("уменьши громкость", "убавь громкость", "сделай тише", exact=("тише",))
+async def volume_down(assistant, command):
+    await _change(assistant, ["pactl", "set-sink-volume", "@DEFAULT_SINK@", "-10%"],
+                  "Громкость уменьшена.", "Не получилось изменить громкость.")
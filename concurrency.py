@@ -0,0 +1,205 @@
+"""
+Пулы потоков и группы задач ассистента.
+
+Блокирующая работа не идёт ни в цикл событий, ни в общий пул по
+умолчанию: у каждого вида свой пул фиксированного размера (executor_sizes),
+и медленный синтез не занимает потоки, нужные декодированию.
+Долгие корутины живут в группах (TaskGroup): у задачи может быть срок,
+ошибка задачи логируется, не роняя соседей, а close() завершает группу
+за ограниченное время.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+# Потоков на вид работы:
+#   audio — ожидание конца звучания и прочий блокирующий ввод-вывод звука;
+#   asr — декодирование Vosk (один распознаватель не декодирует два блока сразу);
+#   tts — синтез (или ожидание пула процессов tts_pool) и прогрев кэша;
+#   llm — запросы к LLM: поток LLMClient читает ответ;
+#   llm_attempts — попытки HedgedBackend (основная и дубли). Пул отдельный:
+#     в общем пуле читатели, ждущие попыток, могли занять все потоки, и
+#     попытки не запускались бы никогда;
+#   commands — блокирующие части локальных команд и запись кэшей на диск.
+executor_sizes = {"audio": 2, "asr": 1, "tts": 2, "llm": 4, "llm_attempts": 8, "commands": 2}
+# Сколько ждать завершения задач при остановке, прежде чем отменить их
+shutdown_timeout = 3.0
+# Период проверки задержки цикла событий
+lag_interval = 0.05
+
+loop_lag_seconds = metrics.histogram(
+    "sonya_loop_lag_seconds", "Опоздание цикла событий относительно запланированного пробуждения",
+    (0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+task_deadline_exceeded_total = metrics.counter(
+    "sonya_task_deadline_exceeded_total", "Задачи, отменённые по истечении срока")
+
+
+class Executors:
+    """
+    Именованные пулы потоков; пул создаётся при первом обращении.
+    """
+
+    def __init__(self, sizes=None):
+        self.sizes = dict(executor_sizes if sizes is None else sizes)
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __getitem__(self, name):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Пулы потоков уже остановлены")
+            pool = self._pools.get(name)
+            if pool is None:
+                pool = self._pools[name] = ThreadPoolExecutor(
+                    max_workers=self.sizes[name], thread_name_prefix=name)
+            return pool
+
+    def configure(self, **sizes):
+        """
+        Меняет размеры пулов; пул, который уже создан, изменить нельзя.
+        """
+        with self._lock:
+            started = sorted(name for name in sizes if name in self._pools)
+            if started:
+                raise RuntimeError(f"Пулы уже созданы, размер не изменить: {', '.join(started)}")
+            self.sizes.update(sizes)
+
+    async def run(self, name, fn, *args):
+        """
+        Выполняет блокирующую fn(*args) в пуле name.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self[name], fn, *args)
+
+    def shutdown(self, wait=False):
+        """
+        Останавливает все пулы: ещё не начатые задания отменяются.
+        """
+        with self._lock:
+            self._closed = True
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+executors = Executors()
+
+
+def run(name, fn, *args):
+    return executors.run(name, fn, *args)
+
+
+class TaskGroup:
+    """
+    Группа задач одной подсистемы.
+
+    В отличие от asyncio.TaskGroup ошибка одной задачи не отменяет
+    остальные (сбой напоминания не должен останавливать микрофон): она
+    пишется в лог. deadline — срок задачи в секундах, по истечении
+    задача отменяется. close() перестаёт принимать задачи, ждёт
+    оставшиеся до timeout и отменяет то, что не успело.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._tasks = set()
+        self._closing = False
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def create_task(self, coro, name=None, deadline=None):
+        if self._closing:
+            coro.close()
+            raise RuntimeError(f"Группа задач {self.name} закрывается")
+        if deadline is not None:
+            coro = self._with_deadline(coro, deadline, name)
+        task = asyncio.get_running_loop().create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    async def _with_deadline(self, coro, deadline, name):
+        try:
+            async with asyncio.timeout(deadline) as scope:
+                return await coro
+        except TimeoutError:
+            # Таймаут внутри самой задачи (например, сетевой) — её ошибка, а не срок группы
+            if not scope.expired():
+                raise
+            task_deadline_exceeded_total.inc()
+            logger.warning(f"{self.name}: задача {name or coro} не уложилась в {deadline:g} с")
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{self.name}: ошибка в задаче {task.get_name()}: {task.exception()!r}")
+
+    async def wait(self, timeout=None):
+        """
+        Ждёт завершения всех задач; False — не дождались за timeout.
+        """
+        if not self._tasks:
+            return True
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        return not pending
+
+    def cancel(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def close(self, timeout=shutdown_timeout, cancel=False):
+        """
+        Завершает группу не дольше чем за timeout (плюс время на отмену).
+        cancel — не ждать, а сразу отменить (бесконечные циклы).
+        """
+        self._closing = True
+        if not cancel and not await self.wait(timeout):
+            logger.warning(f"{self.name}: {len(self._tasks)} задач не завершились за {timeout:.1f} с, отменяю")
+        self.cancel()
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if pending:
+                logger.error(f"{self.name}: {len(pending)} задач не ответили на отмену")
+
+
+class LoopLagMonitor:
+    """
+    Задержка цикла событий: корутина засыпает на interval и меряет, насколько
+    позже запланированного проснулась. Если что-то блокирует цикл, лаг
+    растёт на длительность блокировки.
+    """
+
+    def __init__(self, interval=lag_interval, keep=10000):
+        self.interval = interval
+        self.keep = keep
+        self.samples = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            loop_lag_seconds.observe(lag)
+            self.samples.append(lag)
+            if len(self.samples) > self.keep:
+                del self.samples[:len(self.samples) - self.keep]
+
+    def stats(self):
+        """
+        {"p50", "p99", "max"} в секундах по последним замерам.
+        """
+        if not self.samples:
+            return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+        values = sorted(self.samples)
+        return {
+            "p50": values[len(values) // 2],
+            "p99": values[min(len(values) - 1, int(len(values) * 0.99))],
+            "max": values[-1],
+        }
@@ -0,0 +1,164 @@
+import os
+import wave
+import logging
+import threading
+import subprocess
+
+import numpy as np
+
+import voice
+from resample import Resampler
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+# Частота, на которой хранятся декодированные файлы и сгенерированные тоны
+sample_rate = 48000
+volume = 0.6
+
+# Событие → файл (WAV, MP3, ...); без файла или если его не удалось декодировать — тон из tones
+sound_files = {
+    "wake": "beep.mp3",
+}
+
+# Встроенные сигналы: [(частота, с), ...], частота 0 — пауза
+tones = {
+    "wake": [(880, 0.12)],
+    "listen_stop": [(880, 0.07), (0, 0.02), (660, 0.09)],
+    "alarm": [(1000, 0.15), (0, 0.1), (1000, 0.15), (0, 0.1), (1000, 0.15)],
+    "error": [(330, 0.12), (0, 0.04), (220, 0.2)],
+}
+
+
+def tone(parts, rate=sample_rate):
+    """
+    Склеивает тоны с мягкими краями (без щелчков на стыках).
+    """
+    pieces = []
+    fade = int(rate * 0.005)
+    for freq, seconds in parts:
+        count = int(rate * seconds)
+        if not freq:
+            pieces.append(np.zeros(count, dtype=np.float32))
+            continue
+        piece = np.sin(2 * np.pi * freq * np.arange(count) / rate).astype(np.float32)
+        ramp = np.linspace(0.0, 1.0, min(fade, count // 2), dtype=np.float32)
+        piece[:len(ramp)] *= ramp
+        piece[count - len(ramp):] *= ramp[::-1]
+        pieces.append(piece)
+    return np.concatenate(pieces)
+
+
+def _to_rate(audio, rate):
+    if rate == sample_rate:
+        return audio.astype(np.float32)
+    return Resampler(rate, sample_rate).process(audio).astype(np.float32) / 32768.0
+
+
+def decode(path):
+    """
+    Декодирует файл в моно float32 на sample_rate: WAV — сам, остальное —
+    через soundfile (если установлен) или ffmpeg.
+    """
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"{path}: нужен WAV 16 бит")
+            audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+            audio = audio.reshape(-1, wf.getnchannels()).mean(axis=1) / 32768.0
+            return _to_rate(audio, wf.getframerate())
+    try:
+        import soundfile
+        audio, rate = soundfile.read(path, dtype="float32", always_2d=True)
+        return _to_rate(audio.mean(axis=1), rate)
+    except (ImportError, RuntimeError):
+        pass
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32).copy()
+
+
+class Earcons:
+    """
+    Реестр коротких звуковых сигналов событий (wake word, начало и конец
+    прослушивания, будильник, ошибка).
+
+    preload() один раз декодирует файлы, генерирует недостающие тоны и
+    приводит всё к частоте устройства вывода. play() не блокирует: сигнал
+    подмешивается в шину эффектов общего выходного потока (playback.py)
+    поверх речи и возвращает Playback (или None, если вывода нет).
+    """
+
+    def __init__(self, files=None, tones=None):
+        self.files = dict(sound_files if files is None else files)
+        self.tones = dict(globals()["tones"] if tones is None else tones)
+        self._sounds = {}  # имя → float32 на частоте вывода
+        self._output = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def register(self, name, audio, rate=sample_rate):
+        """
+        Добавляет или заменяет сигнал (float, моно, rate Гц).
+        """
+        audio = _to_rate(np.asarray(audio, dtype=np.float32).reshape(-1), rate) * volume
+        if self._output is not None:
+            audio = self._output.prepare(audio, sample_rate)
+        self._sounds[name] = audio
+
+    def preload(self):
+        """
+        Готовит все сигналы; вызывается при запуске, вне критического пути.
+        """
+        with self._lock:
+            if self._loaded:
+                return self
+            try:
+                self._output = voice.get_output()
+            except Exception as e:
+                logger.warning(f"Сигналы без вывода звука: {e}")
+            for name in set(self.tones) | set(self.files):
+                path = self.files.get(name)
+                if path and os.path.exists(path):
+                    try:
+                        self.register(name, decode(path))
+                        continue
+                    except Exception as e:
+                        logger.warning(f"Не удалось декодировать {path}: {e}")
+                if name in self.tones:
+                    self.register(name, tone(self.tones[name]))
+            self._loaded = True
+            logger.info(f"Звуковые сигналы загружены: {', '.join(sorted(self._sounds))}")
+            return self
+
+    def names(self):
+        return sorted(self._sounds)
+
+    def get(self, name):
+        """
+        (аудио, частота) сигнала или None.
+        """
+        audio = self._sounds.get(name)
+        if audio is None:
+            return None
+        return audio, self._output.samplerate if self._output is not None else sample_rate
+
+    def play(self, name):
+        if not self._loaded:
+            logger.warning("Сигналы не загружены заранее — загружаю сейчас")
+            self.preload()
+        audio = self._sounds.get(name)
+        if audio is None or self._output is None:
+            return None
+        return self._output.play_effect(audio)
+
+
+registry = Earcons()
+
+
+def preload():
+    return registry.preload()
+
+
+def play(name):
+    return registry.play(name)
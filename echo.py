@@ -0,0 +1,198 @@
+import threading
+
+import numpy as np
+
+from resample import Resampler
+
+
+class EchoSuppressor:
+    """
+    Подавление собственного голоса ассистента в сигнале микрофона по опорному сигналу.
+
+    Всё, что проигрывается, регистрируется через add_reference(audio, rate,
+    start) с моментом начала по perf_counter. Для блока микрофона:
+      - задержка эха (вывод → комната → микрофон) оценивается по GCC-PHAT
+        между блоком и опорным сигналом в окне до max_delay;
+      - для каждой полосы оценивается усиление пути эха |H|² — отношение
+        мощностей микрофона и опорного сигнала, сглаженное снизу: речь
+        человека поверх эха его почти не завышает;
+      - спектр эха |H|²·|R|² вычитается из спектра микрофона винеровским
+        коэффициентом (не ниже floor).
+    STFT с перекрытием 50% и корнем из окна Ханна: без опорного сигнала
+    блок проходит без искажений, с задержкой hop отсчётов.
+
+    Пока задержка не найдена и подавление не вышло на converged_db
+    (converged), эхо почти не подавляется; путь эха от ответа к ответу не
+    меняется, так что это только первые блоки самого первого вывода.
+    reference_active — в последнем блоке мог звучать собственный вывод;
+    near_end — тот же блок без кадров, где эхо преобладало (подавление
+    сняло больше 1 - near_ratio мощности): по нему ищется речь человека.
+    """
+
+    def __init__(self, samplerate=16000, n_fft=512, max_delay=0.5, oversubtract=3.0,
+                 floor=0.02, tail_decay=0.5, near_ratio=0.3,
+                 converged_db=10.0, jitter=0.06):
+        self.samplerate = samplerate
+        self.n_fft = n_fft
+        self.hop = n_fft // 2
+        self.max_delay = int(max_delay * samplerate)
+        self.oversubtract = oversubtract
+        self.floor = floor
+        self.tail_decay = tail_decay
+        self.near_ratio = near_ratio
+        self.converged_db = converged_db
+        self.jitter = int(jitter * samplerate)
+        self._window = np.sqrt(np.hanning(n_fft + 1)[:n_fft]).astype(np.float32)
+        self._segments = []  # (начало по perf_counter, аудио 16 кГц float32)
+        # Опорный сигнал добавляется из цикла событий, а блоки могут обрабатываться в пуле ASR
+        self._lock = threading.Lock()
+        # Передискретизация опорного сигнала — под своей блокировкой, не задерживая process()
+        self._resample_lock = threading.Lock()
+        self._resamplers = {}
+        self._gcc = None
+        self._candidate = None
+        self.delay = 0  # отсчётов
+        self.locked = False
+        self.converged = False
+        self.erle_db = 0.0  # сглаженное ослабление эха
+        self.reference_active = False
+        self.near_end = np.zeros(0, dtype=np.int16)
+        bins = n_fft // 2 + 1
+        self._gain = np.ones(bins, dtype=np.float32)  # |H|² по полосам
+        self._tail = np.zeros(bins, dtype=np.float32)
+        self._mic = np.zeros(self.hop, dtype=np.float32)
+        self._ref = np.zeros(self.hop, dtype=np.float32)
+        self._out = np.zeros(self.hop, dtype=np.float32)
+        self._near = np.zeros(self.hop, dtype=np.float32)
+
+    # --- Опорный сигнал ---
+
+    def add_reference(self, audio, rate, start):
+        """
+        Регистрирует проигрываемый фрагмент (float, rate Гц), начавшийся в момент start.
+        """
+        with self._resample_lock:
+            resampler = self._resamplers.get(rate)
+            if resampler is None:
+                resampler = self._resamplers[rate] = Resampler(rate, self.samplerate)
+            resampler.reset()
+            samples = resampler.process(np.asarray(audio, dtype=np.float32)).astype(np.float32) / 32768.0
+        with self._lock:
+            self._segments.append((start, samples))
+            # Момент начала вывода известен с точностью до планировщика потоков:
+            # у каждого фрагмента своё смещение, усреднение по старым блокам ему мешает
+            self._gcc = None
+
+    def truncate(self, moment):
+        """
+        Вывод остановлен в момент moment: опорный сигнал после него — тишина.
+        """
+        with self._lock:
+            self._segments = [(start, samples[:max(0, int((moment - start) * self.samplerate))])
+                              for start, samples in self._segments if start < moment]
+
+    def _prune(self, moment):
+        # Фрагменты, эхо которых уже не может прийти
+        horizon = moment - self.max_delay / self.samplerate - 1.0
+        self._segments = [(s, a) for s, a in self._segments if s + len(a) / self.samplerate > horizon]
+
+    def _reference(self, start, count):
+        out = np.zeros(count, dtype=np.float32)
+        for seg_start, samples in self._segments:
+            offset = int(round((seg_start - start) * self.samplerate))
+            a, b = max(0, offset), min(count, offset + len(samples))
+            if a < b:
+                out[a:b] += samples[a - offset:b - offset]
+        return out
+
+    # --- Обработка микрофона ---
+
+    def _estimate_delay(self, mic, ref_window):
+        if np.dot(ref_window, ref_window) < 1e-6 or np.dot(mic, mic) < 1e-8:
+            return
+        size = 1 << int(np.ceil(np.log2(len(ref_window) + len(mic))))
+        spectrum = np.fft.rfft(ref_window, size) * np.conj(np.fft.rfft(mic, size))
+        # PHAT только в полосе речи: пустые полосы дают ложный пик на нулевой задержке
+        freqs = np.fft.rfftfreq(size, 1 / self.samplerate)
+        spectrum = np.where((freqs > 200) & (freqs < 4000), spectrum / (np.abs(spectrum) + 1e-12), 0)
+        # Взаимный спектр усредняется по блокам: одиночный блок речи даёт ложные пики
+        gcc = self._gcc  # add_reference может сбросить его из другого потока
+        gcc = spectrum if gcc is None or len(gcc) != len(spectrum) else 0.7 * gcc + 0.3 * spectrum
+        self._gcc = gcc
+        corr = np.fft.irfft(gcc, size)[:self.max_delay + 1]
+        peak = int(np.argmax(corr))
+        # Пик должен заметно выделяться на фоне остальной корреляции
+        if corr[peak] > 6 * np.std(corr):
+            # Первая задержка (и скачок больше jitter) принимается, когда два блока
+            # подряд согласны (±2 мс); небольшой сдвиг нового фрагмента — сразу
+            candidate = self.max_delay - peak
+            if self.locked and abs(candidate - self.delay) <= self.jitter:
+                self.delay = candidate
+            elif self._candidate is not None and abs(candidate - self._candidate) <= self.samplerate // 500:
+                self.delay = candidate
+                self.locked = True
+            self._candidate = candidate
+
+    def process(self, data, end):
+        """
+        Принимает блок int16 моно, последний отсчёт которого записан в момент end
+        (perf_counter); возвращает блок int16 с подавленным эхом.
+        """
+        mic = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        count = len(mic)
+        start = end - count / self.samplerate
+        with self._lock:
+            self._prune(end)
+            window = None
+            if self._segments:
+                window = self._reference(start - self.max_delay / self.samplerate, count + self.max_delay)
+        if window is not None:
+            self._estimate_delay(mic, window)
+            ref = window[self.max_delay - self.delay:self.max_delay - self.delay + count]
+            self.reference_active = bool(window.any())
+        else:
+            ref = np.zeros(count, dtype=np.float32)
+            self.reference_active = False
+
+        mic = np.concatenate((self._mic, mic))
+        ref = np.concatenate((self._ref, ref))
+        frames = (len(mic) - self.hop) // self.hop
+        out = np.zeros(frames * self.hop + self.hop, dtype=np.float32)
+        near = np.zeros_like(out)
+        out[:self.hop] = self._out
+        near[:self.hop] = self._near
+        for i in range(frames):
+            a = i * self.hop
+            m = np.fft.rfft(mic[a:a + self.n_fft] * self._window)
+            r = np.fft.rfft(ref[a:a + self.n_fft] * self._window)
+            r_power = (r * np.conj(r)).real
+            # Реверберация тянет эхо дольше кадра: опорная мощность затухает, а не обнуляется
+            self._tail = np.maximum(r_power, self.tail_decay * self._tail)
+            dominant = False
+            if self._tail.sum() > 1e-8:
+                m_power = (m * np.conj(m)).real + 1e-12
+                if r_power.sum() > 1e-8:
+                    # Усиление пути эха по полосам: быстро вниз, медленно вверх — речь
+                    # человека поверх эха только поднимает отношение
+                    ratio = m_power / (self._tail + 1e-12)
+                    active = r_power > 1e-3 * r_power.max()
+                    rate = np.where(ratio < self._gain, 0.3, 0.02) * active
+                    self._gain += rate * (ratio - self._gain)
+                echo = self._gain * self._tail
+                gain = np.maximum(self.floor, 1.0 - self.oversubtract * echo / m_power)
+                m = m * gain
+                kept = np.sum(gain ** 2 * m_power) / np.sum(m_power)
+                dominant = kept < self.near_ratio
+                if self.locked and r_power.sum() > 1e-8:
+                    self.erle_db = 0.9 * self.erle_db - 0.1 * 10 * np.log10(kept)
+                    self.converged = self.converged or self.erle_db >= self.converged_db
+            frame = np.fft.irfft(m, self.n_fft) * self._window
+            out[a:a + self.n_fft] += frame
+            if not dominant:
+                near[a:a + self.n_fft] += frame
+        used = frames * self.hop
+        self._mic, self._ref = mic[used:], ref[used:]
+        self._out = out[used:used + self.hop].copy()
+        self._near = near[used:used + self.hop].copy()
+        self.near_end = (np.clip(near[:used], -1.0, 1.0) * 32767).astype(np.int16)
+        return (np.clip(out[:used], -1.0, 1.0) * 32767).astype(np.int16).tobytes()
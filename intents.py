@@ -0,0 +1,153 @@
+import re
+from collections import deque
+
+from fuzzywuzzy import fuzz
+
+_token = re.compile(r"\w+")
+# Длина префикса слова для предварительного отбора кандидатов в нечётком поиске
+_prefix = 3
+
+
+def tokenize(text):
+    return _token.findall(text.lower().replace("ё", "е"))
+
+
+class Intent:
+    def __init__(self, name, phrases, handler, exact=()):
+        self.name = name
+        self.phrases = phrases
+        self.exact = exact  # фразы, срабатывающие только как вся команда целиком
+        self.handler = handler
+
+
+class IntentMatch:
+    def __init__(self, intent, phrase, score):
+        self.intent = intent
+        self.phrase = phrase
+        self.score = score  # 100 — точное совпадение по индексу
+
+    @property
+    def handler(self):
+        return self.intent.handler
+
+
+class IntentRouter:
+    """
+    Реестр локальных команд.
+
+    Обработчик объявляет фразы-триггеры. Все фразы собираются в автомат
+    Ахо — Корасик по словам, поэтому поиск идёт за один проход по команде
+    независимо от числа фраз. Если точного совпадения нет, пробуем нечёткое
+    сравнение (fuzz.partial_ratio) с порогом fuzzy_threshold.
+
+    Фразы из exact (обычно одно слово вроде «тише») не ищутся внутри
+    команды: они срабатывают, только если команда из них и состоит.
+    """
+
+    def __init__(self, fuzzy_threshold=90):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.intents = []
+        self._built = False
+
+    def register(self, phrases, handler, name=None, exact=()):
+        intent = Intent(name or handler.__name__, list(phrases), handler, list(exact))
+        self.intents.append(intent)
+        self._built = False
+        return intent
+
+    def intent(self, *phrases, name=None, exact=()):
+        """
+        Декоратор: @router.intent("открой браузер", "запусти браузер")
+        """
+        def decorator(handler):
+            self.register(phrases, handler, name=name, exact=exact)
+            return handler
+        return decorator
+
+    def build(self):
+        # Узел автомата: переходы по словам, суффиксная ссылка, найденные фразы
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._fuzzy = []
+        self._fuzzy_index = {}
+        self._exact = {}
+        for intent in self.intents:
+            for phrase in intent.exact:
+                self._exact.setdefault(" ".join(tokenize(phrase)), (intent, phrase))
+            for phrase in intent.phrases:
+                tokens = tokenize(phrase)
+                if not tokens:
+                    continue
+                entry = (" ".join(tokens), intent, phrase)
+                self._fuzzy.append(entry)
+                for token in tokens:
+                    self._fuzzy_index.setdefault(token[:_prefix], []).append(entry)
+                state = 0
+                for token in tokens:
+                    nxt = self._goto[state].get(token)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[state][token] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._out.append([])
+                    state = nxt
+                self._out[state].append((len(tokens), intent, phrase))
+
+        # Суффиксные ссылки обходом в ширину; у детей корня они ведут в корень
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                if state:
+                    self._fail[nxt] = self._goto[fail].get(token, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def match(self, text):
+        """
+        Возвращает IntentMatch или None. При нескольких совпадениях
+        побеждает самая длинная фраза.
+        """
+        if not self._built:
+            self.build()
+        tokens = tokenize(text)
+        exact = self._exact.get(" ".join(tokens))
+        if exact is not None:
+            return IntentMatch(exact[0], exact[1], 100)
+        best = None
+        state = 0
+        for token in tokens:
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for length, intent, phrase in self._out[state]:
+                if best is None or length > best[0]:
+                    best = (length, intent, phrase)
+        if best is not None:
+            return IntentMatch(best[1], best[2], 100)
+        return self._match_fuzzy(tokens)
+
+    def _match_fuzzy(self, tokens):
+        if not tokens or self.fuzzy_threshold is None:
+            return None
+        # Сравниваем только с фразами, у которых есть слово с тем же началом
+        candidates = {}
+        for token in tokens:
+            for entry in self._fuzzy_index.get(token[:_prefix], ()):
+                candidates[id(entry)] = entry
+        text = " ".join(tokens)
+        best = None
+        for phrase_text, intent, phrase in candidates.values():
+            # Фраза длиннее команды не может в ней «содержаться»
+            if len(phrase_text) > len(text) + 2:
+                continue
+            score = fuzz.partial_ratio(phrase_text, text)
+            if score >= self.fuzzy_threshold and (best is None or score > best.score):
+                best = IntentMatch(intent, phrase, score)
+        return best
@@ -0,0 +1,230 @@
+import json
+import time
+import asyncio
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LLMCancelled(Exception):
+    """
+    Запрос отменён (например, пришла новая команда).
+    """
+
+
+class LLMFormatError(Exception):
+    """
+    Бэкенд вернул ответ непредвиденного формата.
+    """
+
+
+class G4FBackend:
+    """
+    Бэкенд на g4f. Импорт g4f ленивый — он заметно замедляет запуск.
+    provider — имя провайдера g4f (g4f.Provider.<имя>); None — выбор g4f.
+    """
+
+    def __init__(self, provider=None):
+        self.provider = provider
+
+    def stream(self, messages, model):
+        import g4f
+
+        kwargs = {}
+        if self.provider:
+            kwargs["provider"] = getattr(g4f.Provider, self.provider)
+        response = g4f.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            **kwargs,
+        )
+        if isinstance(response, str):
+            yield response
+            return
+        for chunk in response:
+            if not isinstance(chunk, str):
+                raise LLMFormatError(f"Непредвиденный фрагмент ответа: {type(chunk)!r}")
+            yield chunk
+
+
+class HTTPBackend:
+    """
+    Бэкенд для OpenAI-совместимого сервера (/v1/chat/completions, stream=true).
+    Годится и для локального тестового сервера вместо g4f.
+    """
+
+    def __init__(self, base_url, timeout=30.0):
+        self.url = base_url.rstrip("/") + "/v1/chat/completions"
+        self.timeout = timeout
+
+    def stream(self, messages, model):
+        body = json.dumps({"model": model, "messages": messages, "stream": True})
+        request = urllib.request.Request(
+            self.url,
+            data=body.encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            for raw_line in response:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                try:
+                    delta = json.loads(data)["choices"][0]["delta"]
+                except (ValueError, KeyError, IndexError) as e:
+                    raise LLMFormatError(f"Непредвиденный фрагмент ответа: {data!r}") from e
+                content = delta.get("content")
+                if content:
+                    yield content
+
+
+class FakeBackend:
+    """
+    Детерминированный локальный бэкенд для тестов и бенчмарков: отвечает
+    заданным текстом (или эхом вопроса) с фиксированными задержками.
+    """
+
+    def __init__(self, replies=None, first_token_delay=0.3, token_delay=0.02):
+        self.replies = replies or {}
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    def reply_for(self, messages):
+        question = messages[-1]["content"] if messages else ""
+        return self.replies.get(question, f"Вы спросили: {question}. Это тестовый ответ.")
+
+    def stream(self, messages, model):
+        time.sleep(self.first_token_delay)
+        words = self.reply_for(messages).split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + " "
+
+
+class _Request:
+    def __init__(self, loop, queue):
+        self.loop = loop
+        self.queue = queue
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, ("cancelled", None))
+        except RuntimeError:
+            # Цикл событий уже закрыт
+            pass
+
+
+class LLMClient:
+    """
+    Асинхронный клиент LLM поверх синхронного бэкенда.
+
+    Бэкенд — любой объект с методом stream(messages, model), возвращающим
+    итератор текстовых фрагментов. Он выполняется в отдельном пуле потоков,
+    поэтому медленный провайдер не блокирует цикл событий. Новый запрос
+    отменяет предыдущий; на каждый запрос действует общий таймаут.
+    Несколько клиентов (сессии сервера) могут делить один пул executor.
+    """
+
+    def __init__(self, backend=None, model="gpt-4o", timeout=60.0, max_workers=4, executor=None):
+        self.backend = backend or G4FBackend()
+        self.model = model
+        self.timeout = timeout
+        # Свой пул: зависший провайдер не займёт потоки пула по умолчанию
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._current = None
+
+    def cancel(self):
+        """
+        Отменяет текущий запрос, если он есть.
+        """
+        if self._current is not None:
+            self._current.cancel()
+            self._current = None
+
+    def detached(self):
+        """
+        Клиент с тем же бэкендом и пулом, но своей отменой: его запросы
+        (например, служебные) не отменяют запросы этого клиента и наоборот.
+        """
+        return LLMClient(self.backend, model=self.model, timeout=self.timeout, executor=self._executor)
+
+    async def stream(self, messages, timeout=None):
+        """
+        Асинхронный генератор фрагментов ответа.
+        Бросает LLMCancelled при отмене и TimeoutError по истечении таймаута.
+        """
+        self.cancel()
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        request = _Request(loop, queue)
+        self._current = request
+        messages = [dict(message) for message in messages]
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass
+
+        def worker():
+            chunks = None
+            try:
+                chunks = iter(self.backend.stream(messages, self.model))
+                for chunk in chunks:
+                    if request.cancelled:
+                        return
+                    if chunk:
+                        put(("token", chunk))
+            except Exception as e:
+                put(("error", e))
+            else:
+                put(("done", None))
+            finally:
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+
+        loop.run_in_executor(self._executor, worker)
+        deadline = loop.time() + (timeout if timeout is not None else self.timeout)
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise TimeoutError("LLM не ответила вовремя")
+                try:
+                    kind, value = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    raise TimeoutError("LLM не ответила вовремя") from None
+                if kind == "token":
+                    yield value
+                elif kind == "done":
+                    return
+                elif kind == "error":
+                    raise value
+                else:
+                    raise LLMCancelled()
+        finally:
+            request.cancelled = True
+            if self._current is request:
+                self._current = None
+
+    async def complete(self, messages, timeout=None):
+        """
+        Возвращает ответ целиком.
+        """
+        parts = []
+        async for token in self.stream(messages, timeout=timeout):
+            parts.append(token)
+        return "".join(parts)
+
+    def close(self):
+        self.cancel()
+        if self._own_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,175 @@
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+summary_prefix = "Краткое содержание предыдущего разговора: "
+
+
+def estimate_tokens(text):
+    # Грубая оценка без токенизатора: для русского текста ~3 символа на токен
+    return len(text) // 3 + 1
+
+
+def message_tokens(message):
+    # +4 — служебные токены роли и разметки сообщения
+    return estimate_tokens(message["content"]) + 4
+
+
+def extractive_summary(summary, turns, max_tokens):
+    """
+    Сводка без LLM: к прежней сводке дописываются сокращённые реплики,
+    при переполнении отбрасывается самое старое.
+    """
+    lines = [summary] if summary else []
+    for message in turns:
+        who = "Пользователь" if message["role"] == "user" else "Соня"
+        content = message["content"]
+        if len(content) > 200:
+            content = content[:200].rsplit(" ", 1)[0] + "…"
+        lines.append(f"{who}: {content}")
+    text = " ".join(lines)
+    max_chars = max_tokens * 3
+    if len(text) > max_chars:
+        text = "…" + text[-max_chars:].split(" ", 1)[-1]
+    return text
+
+
+class ConversationMemory:
+    """
+    Память разговора с бюджетом токенов.
+
+    Последние реплики хранятся дословно. Когда они превышают token_budget,
+    самые старые сжимаются в сводку, и в памяти остаётся около половины
+    бюджета. Сжатие — корутина compact(): её можно запускать в фоне после
+    ответа, а messages() и без неё не выходит за бюджет, просто отбрасывая
+    лишние старые реплики из запроса. Так размер запроса к LLM (и его
+    задержка) не растёт с длиной разговора.
+
+    summarize(summary, turns) — корутина, возвращающая новую сводку
+    (например, через LLM); None или ошибка — сводка без LLM.
+    Разговор сохраняется в path (JSON), None — только в памяти. add(),
+    compact() и clear() только помечают разговор изменённым; на диск его
+    пишет save() — её можно звать пореже и не из цикла событий.
+    """
+
+    def __init__(self, system_messages, path=None, token_budget=1500, summary_budget=300,
+                 summarize=None):
+        self.system_messages = [dict(message) for message in system_messages]
+        self.path = path
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.summarize = summarize
+        self.summary = ""
+        self.turns = []
+        self._compacting = False
+        self._dirty = False
+        self._save_lock = threading.Lock()
+        if path and os.path.isfile(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.summary = data.get("summary", "")
+            self.turns = data.get("turns", [])
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать {self.path}: {e}")
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def save(self):
+        """
+        Пишет разговор на диск, если он менялся с прошлой записи (блокирует;
+        безопасно звать из другого потока: реплики после добавления не меняются).
+        """
+        if not self.path or not self._dirty:
+            return
+        with self._save_lock:
+            self._dirty = False
+            data = {"summary": self.summary, "turns": list(self.turns)}
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                self._dirty = True
+                logger.error(f"Не удалось сохранить {self.path}: {e}")
+
+    def add(self, role, content):
+        self.turns.append({"role": role, "content": content})
+        self._dirty = True
+
+    def turn_tokens(self):
+        return sum(message_tokens(message) for message in self.turns)
+
+    def needs_compaction(self):
+        return self.turn_tokens() > self.token_budget
+
+    def messages(self, pending=()):
+        """
+        Сообщения для запроса к LLM: системный промпт, сводка, последние реплики
+        в пределах бюджета и pending (новые, ещё не записанные реплики).
+        """
+        messages = [dict(message) for message in self.system_messages]
+        if self.summary:
+            messages.append({"role": "system", "content": summary_prefix + self.summary})
+        budget = self.token_budget - sum(message_tokens(message) for message in pending)
+        recent = []
+        for message in reversed(self.turns):
+            budget -= message_tokens(message)
+            if budget < 0:
+                break
+            recent.append(dict(message))
+        messages.extend(reversed(recent))
+        messages.extend(dict(message) for message in pending)
+        return messages
+
+    async def compact(self):
+        """
+        Сжимает старые реплики в сводку, пока реплики не уложатся в половину бюджета.
+        """
+        if self._compacting or not self.needs_compaction():
+            return
+        self._compacting = True
+        try:
+            tokens = self.turn_tokens()
+            count = 0
+            # Реплики уходят в сводку парами «вопрос — ответ»
+            while count < len(self.turns) - 2 and tokens > self.token_budget // 2:
+                tokens -= message_tokens(self.turns[count])
+                count += 1
+            if count % 2:
+                count += 1
+            if not count:
+                return
+            old = self.turns[:count]
+            summary = None
+            if self.summarize is not None:
+                try:
+                    summary = await self.summarize(self.summary, old)
+                except Exception as e:
+                    logger.error(f"Ошибка сжатия разговора: {e}")
+            if not summary:
+                summary = extractive_summary(self.summary, old, self.summary_budget)
+            elif estimate_tokens(summary) > self.summary_budget:
+                # Сводка от LLM не должна раздувать запрос
+                summary = summary[:self.summary_budget * 3].rsplit(" ", 1)[0] + "…"
+            # Пока шло сжатие, могли добавиться новые реплики — убираем только сжатые
+            self.summary = summary
+            del self.turns[:count]
+            self._dirty = True
+            logger.info(f"Разговор сжат: {count} реплик в сводку, осталось {self.turn_tokens()} токенов")
+        finally:
+            self._compacting = False
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
+        self._dirty = True
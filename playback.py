@@ -0,0 +1,287 @@
+import time
+import logging
+import threading
+from types import SimpleNamespace
+from collections import deque
+
+import numpy as np
+
+import metrics
+from resample import Resampler
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    # Нет sounddevice или PortAudio (headless-машина): синтез работает, вывод подменяется
+    sd = None
+
+playback_underflows_total = metrics.counter(
+    "sonya_playback_underflows_total", "Недоборы выходного аудиопотока (щелчки)")
+
+
+class NullOutputStream:
+    """
+    Выходной поток без звуковой карты: callback вызывается из своего потока
+    в реальном времени блоками по blocksize, отсчёты выбрасываются. Нужен,
+    чтобы мерить на headless-машине тот же путь вывода, что и со звуковой
+    картой (bench_loop.py).
+    """
+
+    def __init__(self, samplerate, channels, callback, blocksize=480, latency=0.02):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.latency = latency
+        self._callback = callback
+        self._origin = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def time(self):
+        return time.monotonic() - self._origin
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="null-output", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        out = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        period = self.blocksize / self.samplerate
+        time_info = SimpleNamespace(outputBufferDacTime=0.0)
+        status = SimpleNamespace(output_underflow=False)
+        wake = time.monotonic()
+        while not self._stop.is_set():
+            time_info.outputBufferDacTime = self.time + self.latency
+            self._callback(out, self.blocksize, time_info, status)
+            wake += period
+            delay = wake - time.monotonic()
+            # Опоздали больше чем на блок — на настоящей карте это был бы недобор
+            status.output_underflow = delay < -period
+            if status.output_underflow:
+                wake = time.monotonic()
+            elif delay > 0:
+                self._stop.wait(delay)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def close(self):
+        self.stop()
+
+
+class Playback:
+    """
+    Фрагмент в очереди вывода. wait() возвращается, когда его последний
+    отсчёт прозвучал (по времени ЦАП из callback'а), а не когда он
+    просто отдан звуковой карте.
+    """
+
+    def __init__(self, engine, samples):
+        self.engine = engine
+        self.samples = samples
+        self.position = 0
+        self.stopping = False
+        self.cancelled = False
+        self._dac_end = None  # время потока, когда прозвучит последний отсчёт
+        self._done = threading.Event()
+
+    @property
+    def seconds(self):
+        return len(self.samples) / self.engine.samplerate
+
+    def _finish(self, dac_end, cancelled=False):
+        self._dac_end = dac_end
+        self.cancelled = cancelled
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set() and self.engine.stream_time() >= (self._dac_end or 0.0)
+
+    def wait(self, timeout=None):
+        """
+        Блокирует до конца звучания; False — не дождались за timeout.
+        """
+        if not self._done.wait(timeout):
+            return False
+        remaining = (self._dac_end or 0.0) - self.engine.stream_time()
+        if remaining > 0:
+            time.sleep(min(remaining, 1.0))
+        return True
+
+
+class PlaybackEngine:
+    """
+    Один долгоживущий выходной поток вместо sd.play() на каждую фразу.
+
+    Callback потока сам забирает отсчёты из очередей (deque: добавление из
+    любого потока и извлечение в callback'е без блокировок):
+      - речь — фрагменты TTS подряд, без щелей между ними;
+      - шина эффектов — звуки, подмешиваемые поверх речи и друг друга.
+    Всё приводится к частоте устройства при постановке в очередь; скорость
+    речи задаётся передискретизацией (Resampler), а не подменой частоты
+    устройства. stop() обрывает речь с коротким затуханием, без щелчка.
+    device="null" — вывод без звуковой карты (NullOutputStream).
+    """
+
+    def __init__(self, samplerate=None, device=None, channels=1, latency="low", fade_ms=8):
+        null = device == "null"
+        if sd is None and not null:
+            raise RuntimeError("Нет sounddevice/PortAudio — вывод звука недоступен")
+        if samplerate is None:
+            samplerate = 48000 if null else int(sd.query_devices(device, "output")["default_samplerate"])
+        self.samplerate = int(samplerate)
+        self.channels = channels
+        self.fade = int(self.samplerate * fade_ms / 1000)
+        self._speech = deque()
+        self._effects = deque()
+        self._resamplers = {}  # частота → Resampler; состояние тянется от фрагмента к фрагменту
+        self._resampler_lock = threading.Lock()
+        self._mix = np.zeros(0, dtype=np.float32)
+        if null:
+            self.stream = NullOutputStream(self.samplerate, channels, self._callback)
+        else:
+            self.stream = sd.OutputStream(samplerate=self.samplerate, channels=channels, dtype="float32",
+                                          device=device, latency=latency, callback=self._callback)
+        self.stream.start()
+        logger.info(f"Вывод звука: {self.samplerate} Гц, задержка {self.stream.latency * 1000:.0f} мс")
+
+    def stream_time(self):
+        return self.stream.time
+
+    # --- Очереди ---
+
+    def _convert(self, audio, rate, continuous):
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        rate = int(round(rate))
+        if rate == self.samplerate:
+            return audio
+        if not continuous:
+            return Resampler(rate, self.samplerate).process(audio).astype(np.float32) / 32768.0
+        with self._resampler_lock:
+            resampler = self._resamplers.get(rate)
+            if resampler is None:
+                resampler = self._resamplers[rate] = Resampler(rate, self.samplerate)
+            return resampler.process(audio).astype(np.float32) / 32768.0
+
+    def prepare_speech(self, audio, rate, speed=1.0):
+        """
+        Приводит фрагмент речи к частоте устройства с учётом скорости
+        (для enqueue без rate). Фрагменты одной реплики готовятся по порядку:
+        состояние передискретизатора тянется от фрагмента к фрагменту.
+        """
+        return self._convert(audio, rate * speed, continuous=True)
+
+    def enqueue(self, audio, rate=None, speed=1.0):
+        """
+        Ставит фрагмент речи (float, rate Гц) в очередь за уже играющими
+        и сразу возвращает Playback. speed > 1 — быстрее (и выше).
+        rate=None — фрагмент уже подготовлен prepare_speech().
+        """
+        if rate is not None:
+            audio = self.prepare_speech(audio, rate, speed)
+        handle = Playback(self, audio)
+        self._speech.append(handle)
+        return handle
+
+    def play(self, audio, rate, speed=1.0):
+        """
+        Проигрывает фрагмент речи и ждёт конца звучания.
+        """
+        handle = self.enqueue(audio, rate, speed)
+        handle.wait()
+        return handle
+
+    def prepare(self, audio, rate):
+        """
+        Приводит звук к частоте устройства заранее (для play_effect без rate).
+        """
+        return self._convert(audio, rate, continuous=False)
+
+    def play_effect(self, audio, rate=None):
+        """
+        Подмешивает звук поверх речи, не дожидаясь очереди. rate=None —
+        звук уже подготовлен prepare() и не пересчитывается.
+        """
+        if rate is not None:
+            audio = self._convert(audio, rate, continuous=False)
+        handle = Playback(self, audio)
+        self._effects.append(handle)
+        return handle
+
+    def stop(self):
+        """
+        Обрывает речь (играющий фрагмент затухает за fade_ms, очередь
+        очищается); эффекты доигрывают.
+        """
+        # Сама очередь чистится в callback'е: новые фрагменты стоят за помеченными
+        for handle in list(self._speech):
+            handle.stopping = True
+        with self._resampler_lock:
+            for resampler in self._resamplers.values():
+                resampler.reset()
+
+    def pending_seconds(self):
+        return sum(len(h.samples) - h.position for h in list(self._speech)) / self.samplerate
+
+    def close(self):
+        self.stop()
+        self.stream.stop()
+        self.stream.close()
+        for handle in list(self._speech) + list(self._effects):
+            handle._finish(0.0, cancelled=True)
+
+    # --- Callback потока PortAudio ---
+
+    def _take(self, handle, out, filled=0, add=False, fade=False):
+        # Копирует (или подмешивает) в out отсчёты фрагмента; True — фрагмент кончился
+        count = min(len(out) - filled, len(handle.samples) - handle.position)
+        if fade:
+            count = min(count, self.fade)
+        chunk = handle.samples[handle.position:handle.position + count]
+        if fade:
+            chunk = chunk * np.linspace(1.0, 0.0, count, dtype=np.float32)
+        if add:
+            out[filled:filled + count] += chunk
+        else:
+            out[filled:filled + count] = chunk
+        handle.position += count
+        return count, handle.position >= len(handle.samples)
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            playback_underflows_total.inc()
+        if len(self._mix) != frames:
+            self._mix = np.zeros(frames, dtype=np.float32)
+        mix = self._mix
+        mix[:] = 0.0
+        dac = time_info.outputBufferDacTime or self.stream.time + self.stream.latency
+        filled = 0
+        while self._speech and self._speech[0].stopping:
+            # Остановленный фрагмент: уже звучавший затухает, остальные снимаются
+            handle = self._speech.popleft()
+            if handle.position and filled < frames:
+                count, _ = self._take(handle, mix, filled, fade=True)
+                filled += count
+            handle._finish(dac + filled / self.samplerate, cancelled=True)
+        while filled < frames and self._speech:
+            handle = self._speech[0]
+            count, finished = self._take(handle, mix, filled)
+            filled += count
+            if finished:
+                self._speech.popleft()
+                handle._finish(dac + filled / self.samplerate)
+        # Эффекты: каждый со своей позиции, все одновременно
+        for _ in range(len(self._effects)):
+            handle = self._effects.popleft()
+            count, finished = self._take(handle, mix, add=True)
+            if finished:
+                handle._finish(dac + count / self.samplerate)
+            else:
+                self._effects.append(handle)
+        np.clip(mix, -1.0, 1.0, out=mix)
+        outdata[:] = mix[:, None]
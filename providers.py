@@ -0,0 +1,294 @@
+import time
+import queue
+import logging
+import threading
+from collections import deque
+
+import llm
+import metrics
+import concurrency
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+hedged_total = metrics.counter("sonya_llm_hedged_total", "Запросы, продублированные другому провайдеру")
+breaker_open_total = metrics.counter("sonya_llm_breaker_open_total", "Срабатывания автоматов провайдеров LLM")
+
+
+class CircuitBreaker:
+    """
+    Автомат провайдера: после failure_threshold ошибок подряд провайдер
+    выключается на reset_timeout секунд, затем получает один пробный запрос.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def release(self):
+        # Пробный запрос отменён, не дав результата
+        self._trial = False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                breaker_open_total.inc()
+            self.opened_at = time.monotonic()
+
+
+class Provider:
+    """
+    Провайдер LLM: бэкенд, модель и скользящая статистика —
+    время до первого токена и исходы последних window запросов.
+    """
+
+    def __init__(self, name, backend, model, window=50, failure_threshold=3, reset_timeout=30.0):
+        self.name = name
+        self.backend = backend
+        self.model = model
+        self.first_token = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True — успех
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    def latency(self, q=0.5, default=None):
+        if not self.first_token:
+            return default
+        values = sorted(self.first_token)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def score(self, default_latency):
+        # Медиана первого токена, штраф за ошибки: провайдер с 50% ошибок «вдвое медленнее»
+        return self.latency(0.5, default_latency) / max(0.05, 1.0 - self.error_rate())
+
+    def status(self):
+        return {
+            "state": self.breaker.state,
+            "p50": self.latency(0.5),
+            "p90": self.latency(0.9),
+            "error_rate": round(self.error_rate(), 3),
+        }
+
+
+class _Attempt:
+    def __init__(self, provider):
+        self.provider = provider
+        self.cancelled = False
+        self.recorded = False  # исход уже учтён в статистике и автомате
+        self.first_token = None
+        self.started = time.monotonic()
+
+
+class HedgedBackend:
+    """
+    Бэкенд поверх нескольких провайдеров с хеджированием.
+
+    Запрос уходит самому быстрому по статистике провайдеру. Если за
+    hedge_after секунд не пришло ни одного токена, тот же запрос
+    параллельно уходит следующему; ответ берётся от того, кто первым
+    выдал токен, остальные отменяются. hedge_after=None — по p90 времени
+    до первого токена основного провайдера (в пределах min_hedge..max_hedge).
+    Ошибка до первого токена сразу передаёт запрос следующему провайдеру,
+    даже если дубль уже идёт. Провайдеры с открытым автоматом пропускаются,
+    пока есть другие. Исход каждой попытки учитывается в автомате один раз:
+    отменённые попытки не считаются ни успехом, ни ошибкой.
+
+    Интерфейс тот же, что у остальных бэкендов: stream(messages, model) —
+    синхронный итератор, выполняется в пуле LLMClient. Сами попытки идут
+    в пуле executor (по умолчанию concurrency.executors["llm_attempts"]),
+    он не должен совпадать с пулом LLMClient. Пока токенов нет, итератор
+    раз в poll_interval секунд выдаёт пустую строку: читатель успевает
+    заметить отмену или таймаут запроса и освободить поток.
+    """
+
+    def __init__(self, providers, hedge_after=None, min_hedge=0.5, max_hedge=5.0,
+                 default_latency=2.0, executor=None, poll_interval=0.5):
+        self.providers = list(providers)
+        self.hedge_after = hedge_after
+        self.min_hedge = min_hedge
+        self.max_hedge = max_hedge
+        self.default_latency = default_latency
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+
+    def _order(self):
+        with self._lock:
+            ranked = sorted(self.providers, key=lambda p: p.score(self.default_latency))
+            usable = [p for p in ranked if p.breaker.state != "open"]
+        # Все автоматы открыты — пробуем всех, а не отказываем сразу
+        return usable or ranked, not usable
+
+    def _allow(self, provider, force):
+        with self._lock:
+            return provider.breaker.allow() or force
+
+    def _cancel(self, attempt):
+        attempt.cancelled = True
+        with self._lock:
+            attempt.provider.breaker.release()
+
+    def _hedge_delay(self, provider):
+        if self.hedge_after is not None:
+            return self.hedge_after
+        delay = provider.latency(0.9, self.default_latency)
+        return min(self.max_hedge, max(self.min_hedge, delay))
+
+    def _record(self, attempt, ok):
+        provider = attempt.provider
+        with self._lock:
+            if attempt.recorded:
+                return
+            attempt.recorded = True
+            provider.outcomes.append(ok)
+            if attempt.first_token is not None:
+                provider.first_token.append(attempt.first_token)
+            if ok:
+                provider.breaker.success()
+            else:
+                provider.breaker.failure()
+
+    def _run(self, attempt, messages, events):
+        provider = attempt.provider
+        chunks = None
+        first = True
+        try:
+            chunks = iter(provider.backend.stream(messages, provider.model))
+            for chunk in chunks:
+                if attempt.cancelled:
+                    return
+                if not chunk:
+                    continue
+                if first:
+                    events.put(("first", attempt, time.monotonic() - attempt.started))
+                    first = False
+                events.put(("token", attempt, chunk))
+        except Exception as e:
+            events.put(("error", attempt, e))
+        else:
+            events.put(("done", attempt, None))
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    def stream(self, messages, model=None):
+        # model игнорируется: у каждого провайдера своя модель
+        events = queue.Queue()
+        waiting, force = self._order()
+        active = []
+        winner = None
+
+        executor = self.executor or concurrency.executors["llm_attempts"]
+
+        def launch():
+            while waiting:
+                provider = waiting.pop(0)
+                if not self._allow(provider, force):
+                    continue
+                attempt = _Attempt(provider)
+                active.append(attempt)
+                executor.submit(self._run, attempt, messages, events)
+                return attempt
+            return None
+
+        primary = launch()
+        if primary is None:
+            raise RuntimeError("Нет доступных провайдеров LLM")
+        hedge_at = time.monotonic() + self._hedge_delay(primary.provider)
+        try:
+            while True:
+                timeout = self.poll_interval
+                hedge = winner is None and waiting
+                if hedge:
+                    timeout = min(timeout, max(0.0, hedge_at - time.monotonic()))
+                try:
+                    kind, attempt, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    if not hedge or time.monotonic() < hedge_at:
+                        yield ""  # читатель проверит отмену запроса
+                        continue
+                    if launch() is not None:
+                        hedged_total.inc()
+                        logger.info(f"LLM: {primary.provider.name} молчит, дублирую запрос")
+                    hedge_at = time.monotonic() + self._hedge_delay(primary.provider)
+                    continue
+                if attempt.cancelled or (winner is not None and attempt is not winner):
+                    continue
+                if kind == "first":
+                    winner = attempt
+                    attempt.first_token = value
+                    for other in active:
+                        if other is not attempt:
+                            self._cancel(other)
+                elif kind == "token":
+                    yield value
+                elif kind == "done":
+                    # Успех (в том числе пустой ответ без токенов)
+                    self._record(attempt, True)
+                    return
+                else:
+                    self._record(attempt, False)
+                    logger.warning(f"LLM: ошибка провайдера {attempt.provider.name}: {value}")
+                    if winner is attempt:
+                        # Ответ уже начался — подменить провайдера нельзя
+                        raise value
+                    active.remove(attempt)
+                    # Сразу следующему провайдеру, не дожидаясь идущего дубля
+                    if launch() is not None:
+                        hedge_at = time.monotonic() + self._hedge_delay(primary.provider)
+                    elif not active:
+                        raise value
+        finally:
+            for attempt in active:
+                if attempt is winner:
+                    # Ответ дочитан не до конца (отмена): провайдер всё же ответил
+                    self._record(attempt, True)
+                elif not attempt.cancelled and not attempt.recorded:
+                    self._cancel(attempt)
+                attempt.cancelled = True
+
+    def status(self):
+        return {p.name: p.status() for p in self.providers}
+
+
+def make_provider(spec):
+    """
+    Провайдер из описания: {"name", "model", "url"} — OpenAI-совместимый
+    сервер, или {"name", "model", "provider"} — g4f (provider можно не указывать).
+    """
+    if spec.get("url"):
+        backend = llm.HTTPBackend(spec["url"])
+    else:
+        backend = llm.G4FBackend(spec.get("provider"))
+    return Provider(spec["name"], backend, spec["model"])
@@ -0,0 +1,81 @@
+from math import gcd
+
+import numpy as np
+
+
+def design_filter(up, down, half_width=8, beta=8.0):
+    """
+    ФНЧ для полифазной передискретизации: sinc с окном Кайзера,
+    half_width пересечений нуля в каждую сторону, частота среза — ниже
+    Найквиста более низкой из двух частот.
+    """
+    factor = max(up, down)
+    cutoff = 0.5 / factor * 0.92  # в циклах на отсчёт повышенной частоты
+    length = 2 * half_width * factor + 1
+    n = np.arange(length) - (length - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+    return h * up
+
+
+class Resampler:
+    """
+    Потоковый полифазный передискретизатор на NumPy: int16/float32,
+    моно или многоканальный вход → моно int16 на частоте out_rate.
+
+    Повышение в up раз и понижение в down раз не выполняются явно: для
+    каждого выходного отсчёта берётся своя фаза фильтра (строка матрицы
+    up × taps) и окно из taps входных отсчётов, и всё это считается
+    одним einsum на блок. Хвост блока сохраняется между вызовами, так
+    что на границах блоков нет щелчков.
+    """
+
+    def __init__(self, in_rate, out_rate=16000, half_width=8):
+        divisor = gcd(int(in_rate), int(out_rate))
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = int(out_rate) // divisor
+        self.down = int(in_rate) // divisor
+        h = design_filter(self.up, self.down, half_width)
+        self.taps = -(-len(h) // self.up)
+        h = np.pad(h, (0, self.taps * self.up - len(h)))
+        # phases[p, k] = h[p + k * up]; окно берётся в обратном порядке, поэтому разворачиваем
+        self.phases = h.reshape(self.taps, self.up).T[:, ::-1].astype(np.float32).copy()
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._first = -(self.taps - 1)  # абсолютный номер первого отсчёта в _history
+        self._produced = 0  # выдано выходных отсчётов
+
+    @staticmethod
+    def to_mono_float(block):
+        block = np.asarray(block)
+        if block.dtype == np.int16:
+            block = block.astype(np.float32) / 32768.0
+        else:
+            block = block.astype(np.float32, copy=False)
+        if block.ndim == 2:
+            block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+        return block
+
+    def process(self, block):
+        """
+        Принимает блок (кадры × каналы или одномерный), возвращает int16 моно.
+        """
+        x = self.to_mono_float(block)
+        if self.up == self.down == 1:
+            y = x
+        else:
+            buffer = np.concatenate((self._history, x))
+            last = self._first + len(buffer) - 1  # абсолютный номер последнего отсчёта
+            # Выходной отсчёт n лежит на входной позиции n * down / up
+            count = ((last + 1) * self.up - 1) // self.down + 1 - self._produced
+            n = self._produced + np.arange(max(count, 0))
+            position = n * self.down
+            index = position // self.up - self._first - (self.taps - 1)
+            windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps)[index]
+            y = np.einsum("nk,nk->n", windows, self.phases[position % self.up])
+            self._produced += len(n)
+            self._history = buffer[-(self.taps - 1):].copy()
+            self._first += len(buffer) - (self.taps - 1)
+        return (np.clip(y, -1.0, 1.0) * 32767).astype(np.int16)
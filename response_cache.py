@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from fuzzywuzzy import fuzz
+
+from intents import tokenize
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+# Запрос короче стольких слов — скорее всего, продолжение разговора («почему?»)
+min_words = 2
+# Слова, отсылающие к прошлым репликам: с ними ответ зависит от разговора
+context_words = frozenset((
+    "он", "она", "оно", "они", "его", "ее", "их", "им", "ему", "ей", "ним", "ней", "них",
+    "это", "этот", "эта", "эти", "этого", "этой", "этом", "тот", "та", "те", "того", "том",
+    "там", "тогда", "туда", "оттуда", "еще", "тоже", "также", "подробнее", "дальше",
+    "снова", "опять", "продолжи", "продолжай", "повтори",
+))
+# Первое слово, продолжающее прошлую реплику: «а почему?», «и что дальше?»
+context_starts = frozenset(("а", "и", "но", "ну", "так"))
+
+
+def normalize(text):
+    return " ".join(tokenize(text))
+
+
+def depends_on_context(query):
+    """
+    True, если ответ на query зависит от предыдущих реплик и кэшировать его нельзя.
+    """
+    words = tokenize(query)
+    return (len(words) < min_words or words[0] in context_starts
+            or any(word in context_words for word in words))
+
+
+class ResponseCache:
+    """
+    Кэш ответов LLM на повторяющиеся вопросы.
+
+    Ключ — нормализованный текст запроса (нижний регистр, ё → е, только слова).
+    Запросы, ответ на которые зависит от разговора («а почему?»), кэшировать
+    не нужно — их отсеивает depends_on_context(). При fuzzy_threshold не None
+    подходит и близкий запрос (fuzz.token_sort_ratio); сравниваются только
+    записи с общими словами, так что поиск остаётся дешёвым. Записи живут ttl секунд; сверх max_entries
+    вытесняются давно не использованные.
+
+    Кэш хранится в path (JSON) и переживает перезапуск; put() только
+    помечает кэш изменённым, на диск его пишет save() (её можно звать
+    пореже и не из цикла событий).
+
+    Аудио ответа отдельно не хранится: при первом ответе каждое предложение
+    попадает в кэш TTS (voice.cache, на диске), и повторная озвучка
+    обходится без модели.
+    """
+
+    def __init__(self, path=None, ttl=6 * 3600, max_entries=500, fuzzy_threshold=92):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.fuzzy_threshold = fuzzy_threshold
+        self._entries = {}  # ключ -> {"query", "response", "created", "used"}
+        self._words = {}  # слово -> множество ключей
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.stats = {"hits": 0, "fuzzy_hits": 0, "misses": 0}
+        if path and os.path.isfile(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать {self.path}: {e}")
+            return
+        now = time.time()
+        for entry in entries.values():
+            # Записи с отпечатком разговора («context») остались от прежнего формата
+            if now - entry["created"] < self.ttl and not entry.get("context"):
+                entry.pop("context", None)
+                self._index(normalize(entry["query"]), entry)
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def save(self):
+        """
+        Пишет кэш на диск, если он менялся с прошлой записи (блокирует).
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._entries, ensure_ascii=False)
+            self._dirty = False
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить {self.path}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    @staticmethod
+    def _index_words(key):
+        # Короткие служебные слова («и», «на») не сужают выбор кандидатов
+        return [word for word in key.split() if len(word) > 2]
+
+    def _index(self, key, entry):
+        self._entries[key] = entry
+        for word in self._index_words(key):
+            self._words.setdefault(word, set()).add(key)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        for word in self._index_words(key):
+            keys = self._words.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._words[word]
+
+    def _fresh(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry["created"] >= self.ttl:
+            self._remove(key)
+            return None
+        return entry
+
+    def get(self, query):
+        """
+        Возвращает закэшированный ответ на query или None.
+        """
+        key = normalize(query)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._fresh(key, now)
+            if entry is not None:
+                self.stats["hits"] += 1
+            elif self.fuzzy_threshold is not None:
+                entry = self._fuzzy(key, now)
+                if entry is not None:
+                    self.stats["fuzzy_hits"] += 1
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            entry["used"] = now
+            return entry["response"]
+
+    def _fuzzy(self, text, now):
+        # Кандидаты — записи хотя бы с одним общим словом
+        candidates = set()
+        for word in self._index_words(text):
+            candidates.update(self._words.get(word, ()))
+        best, best_score = None, self.fuzzy_threshold - 1
+        for candidate in candidates:
+            if abs(len(candidate) - len(text)) > len(text) * (100 - self.fuzzy_threshold) / 50:
+                continue
+            score = fuzz.token_sort_ratio(text, candidate)
+            if score > best_score:
+                best, best_score = candidate, score
+        return self._fresh(best, now) if best is not None else None
+
+    def put(self, query, response):
+        key = normalize(query)
+        if not key or not response:
+            return
+        now = time.time()
+        with self._lock:
+            self._remove(key)
+            self._index(key, {"query": query, "response": response, "created": now, "used": now})
+            if len(self._entries) > self.max_entries:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k]["used"])
+                for old_key in oldest[:len(self._entries) - self.max_entries]:
+                    self._remove(old_key)
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._words.clear()
+            self._dirty = True
+        self.save()
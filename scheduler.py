@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import heapq
+import logging
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+# Дольше этого таймер не спит: после сна системы или перевода часов он перепроверит время
+max_sleep = 60.0
+
+
+class Scheduler:
+    """
+    Планировщик будильников и напоминаний.
+
+    Таймеры лежат в мини-куче по времени срабатывания, а в цикле событий
+    взведён ровно один loop.call_at — на ближайший из них. Отменённые
+    таймеры удаляются из кучи лениво. Все изменения сразу сохраняются
+    на диск атомарной заменой файла, так что после падения ничего не теряется.
+
+    Таймер — словарь {"id", "when" (unix time), "kind", "text", "repeat"},
+    repeat — период повтора в секундах или None. Методы вызываются
+    из потока цикла событий.
+    """
+
+    def __init__(self, path="schedule.json", on_fire=None):
+        self.path = path
+        self.on_fire = on_fire
+        self._timers = {}
+        self._heap = []
+        self._next_id = 1
+        self._loop = None
+        self._handle = None
+
+    def start(self, loop):
+        self._loop = loop
+        self._load()
+        self._arm()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def add(self, when, kind, text="", repeat=None):
+        """
+        Добавляет таймер (when — datetime или unix time), возвращает его id.
+        """
+        if hasattr(when, "timestamp"):
+            when = when.timestamp()
+        timer = {"id": self._next_id, "when": float(when), "kind": kind,
+                 "text": text, "repeat": repeat}
+        self._next_id += 1
+        self._timers[timer["id"]] = timer
+        heapq.heappush(self._heap, (timer["when"], timer["id"]))
+        self._save()
+        self._arm()
+        return timer["id"]
+
+    def cancel(self, timer_id):
+        timer = self._timers.pop(timer_id, None)
+        if timer is None:
+            return False
+        self._save()
+        self._arm()
+        return True
+
+    def timers(self):
+        return sorted(self._timers.values(), key=lambda timer: timer["when"])
+
+    def _peek(self):
+        # Выбрасываем из вершины кучи отменённые и перенесённые записи
+        while self._heap:
+            when, timer_id = self._heap[0]
+            timer = self._timers.get(timer_id)
+            if timer is not None and timer["when"] == when:
+                return timer
+            heapq.heappop(self._heap)
+        return None
+
+    def _arm(self):
+        if self._loop is None:
+            return
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        timer = self._peek()
+        if timer is None:
+            return
+        delay = min(max(timer["when"] - time.time(), 0.0), max_sleep)
+        self._handle = self._loop.call_at(self._loop.time() + delay, self._wake)
+
+    def _wake(self):
+        self._handle = None
+        now = time.time()
+        fired = []
+        while True:
+            timer = self._peek()
+            if timer is None or timer["when"] > now:
+                break
+            heapq.heappop(self._heap)
+            fired.append(dict(timer))
+            if timer["repeat"]:
+                # Пропущенные повторы (например, пока ПК был выключен) не копим
+                periods = int((now - timer["when"]) // timer["repeat"]) + 1
+                timer["when"] += periods * timer["repeat"]
+                heapq.heappush(self._heap, (timer["when"], timer["id"]))
+            else:
+                del self._timers[timer["id"]]
+        if fired:
+            self._save()
+        self._arm()
+        for timer in fired:
+            lateness = now - timer["when"]
+            logger.info(f"Таймер {timer['id']} ({timer['kind']}) сработал, опоздание {lateness:.3f} с")
+            if self.on_fire is not None:
+                try:
+                    self.on_fire(timer)
+                except Exception as e:
+                    logger.error(f"Ошибка обработчика таймера: {e}")
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать расписание {self.path}: {e}")
+            return
+        self._next_id = state.get("next_id", 1)
+        for timer in state.get("timers", []):
+            self._timers[timer["id"]] = timer
+            self._heap.append((timer["when"], timer["id"]))
+        heapq.heapify(self._heap)
+
+    def _save(self):
+        state = {"next_id": self._next_id, "timers": list(self._timers.values())}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
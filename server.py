@@ -0,0 +1,305 @@
+"""
+Headless-сервер ассистента для нескольких тонких клиентов (киоски, колонки в комнатах).
+
+Модель Vosk и модель Silero загружаются один раз и общие для всех сессий;
+у каждой сессии свой KaldiRecognizer (через Assistant), свой контекст диалога
+и свой вывод звука.
+
+Протокол (TCP или Unix-сокет):
+  1. Клиент шлёт строку JSON: {"samplerate": 16000, "tts": true}.
+     Сервер отвечает строкой JSON: {"status": "ok", "session": 1, "tts_sample_rate": 48000}
+     или {"status": "busy"} (сессий уже max_sessions) и закрывает соединение.
+  2. Дальше — кадры: тип (1 байт) + длина (4 байта, big-endian) + данные.
+     От клиента: b"A" — аудио int16 моно, b"T" — текстовая команда (UTF-8),
+     b"S" — метка синхронизации (сервер вернёт её, когда обработает всё до неё),
+     b"E" — конец потока.
+     От сервера: b"J" — событие JSON (chat, stream, notify, sync),
+     b"P" — речь ассистента, int16 моно с частотой tts_sample_rate.
+
+Обратное давление: у сессии ограниченная очередь входящих кадров. Если
+распознавание не успевает, сервер перестаёт читать сокет и клиент упирается
+в TCP-окно, а не копит задержку на сервере.
+
+    python server.py --port 8765 --max-sessions 8
+"""
+import os
+import json
+import struct
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import vosk
+
+import llm
+import voice
+import metrics
+import asr_models
+import concurrency
+from assistant import Assistant, fixed_phrases, default_llm_backend
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+server_host = "127.0.0.1"
+server_port = 8765
+max_sessions = 8
+# Очередь входящих кадров одной сессии (при блоках по 0,25 с — около 4 с аудио)
+session_queue_frames = 16
+max_frame_bytes = 1 << 20
+
+_header = struct.Struct(">cI")
+
+sessions_active = metrics.gauge("sonya_server_sessions", "Активные сессии сервера")
+sessions_rejected_total = metrics.counter(
+    "sonya_server_rejected_total", "Отклонённые подключения (превышен max_sessions)")
+backpressure_total = metrics.counter(
+    "sonya_server_backpressure_total", "Кадры, которым пришлось ждать места в очереди сессии")
+
+
+class ProtocolError(Exception):
+    """
+    Клиент нарушил протокол.
+    """
+
+
+async def read_frame(reader):
+    """
+    Читает кадр, возвращает (тип, данные) или None в конце потока.
+    """
+    try:
+        kind, length = _header.unpack(await reader.readexactly(_header.size))
+    except asyncio.IncompleteReadError:
+        return None
+    if length > max_frame_bytes:
+        raise ProtocolError(f"Слишком большой кадр: {length} байт")
+    return kind, await reader.readexactly(length)
+
+
+def pack_frame(kind, payload):
+    return _header.pack(kind, len(payload)) + payload
+
+
+class Session:
+    """
+    Одно подключение: свой Assistant, своя очередь входящих кадров и свой вывод.
+    """
+
+    def __init__(self, server, session_id, reader, writer, samplerate, tts):
+        self.server = server
+        self.id = session_id
+        self.reader = reader
+        self.writer = writer
+        self.samplerate = samplerate
+        self.loop = asyncio.get_running_loop()
+        self.inbox = asyncio.Queue(maxsize=session_queue_frames)
+        self.assistant = Assistant(
+            llm_client=llm.LLMClient(server.backend, executor=server.llm_executor),
+            play=self.play,
+            on_chat=lambda sender, text: self.send_event("chat", sender=sender, text=text),
+            on_stream=lambda text, finished: self.send_event("stream", text=text, finished=finished),
+            on_notify=lambda text: self.send_event("notify", text=text),
+            asr_executor=server.asr_executor,
+            memory_file=None,
+            cache_file=None,
+        )
+        self.assistant.earcons = False
+        self.assistant.mute_voice = not tts
+        # Звук играет у клиента: опорного сигнала для подавления эха нет
+        self.assistant.barge_in = False
+        # Свой вывод — своя блокировка: сессии не ждут друг друга
+        self.assistant.speak_lock = asyncio.Lock()
+
+    def send_event(self, kind, **fields):
+        if self.writer.is_closing():
+            return
+        fields["type"] = kind
+        self.writer.write(pack_frame(b"J", json.dumps(fields, ensure_ascii=False).encode("utf-8")))
+
+    def play(self, audio):
+        # Вызывается из потока исполнителя (voice.speak_stream); ждём, пока
+        # данные уйдут в сокет, — так медленный клиент притормаживает синтез
+        pcm = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+        payload = (pcm * 32767).astype(np.int16).tobytes()
+        asyncio.run_coroutine_threadsafe(self._send_audio(payload), self.loop).result()
+
+    async def _send_audio(self, payload):
+        if self.writer.is_closing():
+            return
+        self.writer.write(pack_frame(b"P", payload))
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _read_frames(self):
+        try:
+            while True:
+                frame = await read_frame(self.reader)
+                if frame is None or frame[0] == b"E":
+                    break
+                if self.inbox.full():
+                    backpressure_total.inc()
+                await self.inbox.put(frame)
+        except (ProtocolError, ConnectionError) as e:
+            logger.warning(f"Сессия {self.id}: {e}")
+        finally:
+            await self.inbox.put(None)
+
+    async def run(self):
+        self.assistant.start_recognition(self.server.model, self.samplerate)
+        reader_task = asyncio.create_task(self._read_frames())
+        try:
+            while (frame := await self.inbox.get()) is not None:
+                kind, payload = frame
+                if kind == b"A":
+                    await self.assistant.feed(payload)
+                elif kind == b"T":
+                    command = payload.decode("utf-8").strip()
+                    if command:
+                        await self.assistant.process_command(command)
+                elif kind == b"S":
+                    self.send_event("sync", id=payload.decode("utf-8"))
+                else:
+                    logger.warning(f"Сессия {self.id}: неизвестный кадр {kind!r}")
+            await self.assistant.flush()
+            await self.writer.drain()
+        finally:
+            reader_task.cancel()
+            await asyncio.gather(reader_task, return_exceptions=True)
+            self.assistant.close()
+
+
+class AssistantServer:
+    """
+    Принимает подключения и держит общие для всех сессий модели и пулы потоков.
+    """
+
+    def __init__(self, model, backend=None, max_sessions=max_sessions,
+                 asr_workers=None, llm_workers=8, tts=True):
+        self.model = model
+        self.tts = tts
+        self.backend = backend or default_llm_backend()
+        self.max_sessions = max_sessions
+        self.asr_executor = ThreadPoolExecutor(
+            max_workers=asr_workers or os.cpu_count() or 1, thread_name_prefix="asr")
+        self.llm_executor = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="llm")
+        self.sessions = {}
+        self._next_id = 1
+        self._server = None
+
+    async def start(self, host=server_host, port=server_port, path=None):
+        if path:
+            self._server = await asyncio.start_unix_server(self._handle, path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Сервер слушает {', '.join(str(s.getsockname()) for s in self._server.sockets)}")
+        return self._server
+
+    async def _reply(self, writer, **fields):
+        writer.write(json.dumps(fields).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                hello = json.loads(await reader.readline())
+                samplerate = int(hello["samplerate"])
+            except (ValueError, KeyError, TypeError):
+                await self._reply(writer, status="error", error="нужна строка JSON с samplerate")
+                return
+            if len(self.sessions) >= self.max_sessions:
+                sessions_rejected_total.inc()
+                await self._reply(writer, status="busy")
+                return
+            session = Session(self, self._next_id, reader, writer, samplerate,
+                              self.tts and hello.get("tts", True))
+            self._next_id += 1
+            self.sessions[session.id] = session
+            sessions_active.inc()
+            logger.info(f"Сессия {session.id} открыта ({len(self.sessions)}/{self.max_sessions})")
+            try:
+                await self._reply(writer, status="ok", session=session.id,
+                                  tts_sample_rate=voice.sample_rate)
+                await session.run()
+            finally:
+                del self.sessions[session.id]
+                sessions_active.dec()
+                logger.info(f"Сессия {session.id} закрыта")
+        except ConnectionError:
+            pass
+        except Exception as e:
+            logger.error(f"Ошибка сессии: {e}")
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.asr_executor.shutdown(wait=False, cancel_futures=True)
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def size_executors(sessions=max_sessions):
+    """
+    Синтез и отправка звука каждой сессии ждут в своём потоке: пулы tts и
+    audio — по числу сессий. Вызывается до первого обращения к этим пулам.
+    """
+    concurrency.executors.configure(audio=sessions, tts=sessions)
+
+
+def make_backend(args):
+    if args.fake_llm:
+        return llm.FakeBackend()
+    if args.llm_url:
+        return llm.HTTPBackend(args.llm_url)
+    return default_llm_backend()
+
+
+async def serve(args):
+    size_executors(args.max_sessions)
+    loop = asyncio.get_running_loop()
+    model = await loop.run_in_executor(None, asr_models.ASRModelRegistry().load, args.model)
+    background = concurrency.TaskGroup("server")  # прогрев кэша TTS
+    if not args.no_tts:
+        await loop.run_in_executor(None, voice.start_pool)
+        background.create_task(voice.warm_up_async(fixed_phrases), name="tts-warm-up")
+    server = AssistantServer(model, make_backend(args), max_sessions=args.max_sessions,
+                             tts=not args.no_tts)
+    await server.start(args.host, args.port, args.unix)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await background.close(cancel=True)
+        await server.close()
+        if voice.pool is not None:
+            voice.pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=server_host)
+    parser.add_argument("--port", type=int, default=server_port)
+    parser.add_argument("--unix", help="путь Unix-сокета вместо TCP")
+    parser.add_argument("--model", default=asr_models.default_model, help="имя модели Vosk или путь к ней")
+    parser.add_argument("--max-sessions", type=int, default=max_sessions)
+    parser.add_argument("--llm-url", help="OpenAI-совместимый сервер вместо g4f")
+    parser.add_argument("--fake-llm", action="store_true", help="тестовая заглушка вместо LLM")
+    parser.add_argument("--no-tts", action="store_true", help="не загружать модель TTS")
+    parser.add_argument("--metrics-port", type=int, default=9464)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+    vosk.SetLogLevel(-1)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+# Точка отсчёта — момент первого импорта этого модуля (app.py импортирует его первым)
+_t0 = time.perf_counter()
+
+
+class StartupTimer:
+    """
+    Отметки времени запуска (секунды от старта) и отчёт о них.
+    """
+
+    def __init__(self, report_file="startup_times.jsonl"):
+        self.report_file = report_file
+        self.marks = {}
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def mark(self, name):
+        with self._lock:
+            self.marks[name] = time.perf_counter() - _t0
+
+    def mark_once(self, name):
+        with self._lock:
+            if name not in self.marks:
+                self.marks[name] = time.perf_counter() - _t0
+
+    def report(self):
+        """
+        Пишет отчёт в лог и дописывает строку в report_file,
+        чтобы можно было следить за регрессиями между запусками.
+        """
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+            marks = dict(sorted(self.marks.items(), key=lambda item: item[1]))
+        logger.info("Время запуска: " + ", ".join(
+            f"{name}={seconds:.3f}s" for name, seconds in marks.items()))
+        record = {"time": datetime.now().isoformat(timespec="seconds"), **marks}
+        try:
+            with open(self.report_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.warning(f"Не удалось записать отчёт о запуске: {e}")
+
+
+timer = StartupTimer()
+
+# Модели ASR и TTS грузятся параллельно в фоновых потоках
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader")
+_futures = {}
+_futures_lock = threading.Lock()
+
+
+def future(name, loader):
+    """
+    Возвращает Future загрузки модели name. При первом вызове
+    запускает loader() в фоне; повторные вызовы возвращают тот же Future.
+    """
+    with _futures_lock:
+        fut = _futures.get(name)
+        if fut is None:
+            fut = _executor.submit(_load, name, loader)
+            _futures[name] = fut
+        return fut
+
+
+def _load(name, loader):
+    start = time.perf_counter()
+    try:
+        return loader()
+    finally:
+        timer.mark(f"{name}_loaded")
+        logger.info(f"Модель {name} загружена за {time.perf_counter() - start:.2f} с")
@@ -0,0 +1,51 @@
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+# Пауза между фразами пакета; по ней аудио режется обратно на части
+break_ms = 700
+silence_threshold = 1e-4
+
+stats = {"batches": 0, "texts": 0, "fallbacks": 0}
+
+
+def _split_on_breaks(audio, count, min_gap):
+    """
+    Режет аудио по count - 1 длинным паузам, или возвращает None,
+    если столько пауз не нашлось.
+    """
+    silent = np.concatenate(([False], np.abs(audio) < silence_threshold, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]
+    keep = (ends - starts >= min_gap) & (starts > 0) & (ends < len(audio))
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) != count - 1:
+        return None
+    return [audio[a:b] for a, b in zip([0, *ends], [*starts, len(audio)])]
+
+
+def synthesize_batch(model, texts, speaker, sample_rate):
+    """
+    Синтезирует несколько фраз одним вызовом модели Silero и возвращает
+    список аудио в том же порядке.
+
+    Фразы склеиваются в один SSML-текст с паузами <break>, так что разбор
+    текста и прогон модели выполняются один раз на пакет. Затем аудио режется
+    по этим паузам. Если число пауз не сошлось (например, длинная пауза внутри
+    фразы), пакет синтезируется по одной фразе.
+    """
+    if len(texts) == 1:
+        audio = model.apply_tts(text=texts[0], speaker=speaker, sample_rate=sample_rate)
+        return [np.asarray(audio, dtype=np.float32)]
+    stats["batches"] += 1
+    stats["texts"] += len(texts)
+    separator = f'<break time="{break_ms}ms"/>'
+    ssml = "<speak>" + separator.join(f"<s>{escape(text)}</s>" for text in texts) + "</speak>"
+    audio = np.asarray(model.apply_tts(ssml_text=ssml, speaker=speaker, sample_rate=sample_rate),
+                       dtype=np.float32)
+    parts = _split_on_breaks(audio, len(texts), int(sample_rate * break_ms / 1000 * 0.8))
+    if parts is None:
+        stats["fallbacks"] += 1
+        return [np.asarray(model.apply_tts(text=text, speaker=speaker, sample_rate=sample_rate),
+                           dtype=np.float32) for text in texts]
+    return parts
@@ -0,0 +1,171 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TTSCache:
+    """
+    Двухуровневый кэш синтезированной речи.
+
+    Ключ — (текст, голос, частота дискретизации).
+      - Память: LRU, ограниченный суммарным размером аудио в байтах.
+      - Диск: сырой PCM float32, при чтении файл отображается в память (memmap);
+        тоже LRU, ограниченный max_disk_bytes (порядок переживает перезапуск
+        через время изменения файлов).
+    """
+
+    def __init__(self, cache_dir="tts_cache", max_memory_bytes=64 * 1024 * 1024,
+                 max_disk_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # ключ → размер файла, от давно использованных к недавним
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evicted_files": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan_disk()
+
+    @staticmethod
+    def _key(text, speaker, sample_rate):
+        raw = f"{speaker}\0{sample_rate}\0{text}".encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pcm")
+
+    def _scan_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not name.endswith(".pcm"):
+                if name.endswith(".tmp") and self._stale(path):
+                    # Остаток прерванной записи. Свежий .tmp может дописывать
+                    # другой процесс с тем же каталогом — его не трогаем
+                    self._unlink(path)
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-len(".pcm")], st.st_size))
+        with self._lock:
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_bytes += size
+            victims = self._evict_disk()
+        self._remove(victims)
+
+    def _touch_disk(self, key, size):
+        # Вызывается под self._lock
+        self._disk_bytes += size - self._disk.pop(key, 0)
+        self._disk[key] = size
+
+    def _evict_disk(self):
+        # Вызывается под self._lock; возвращает пути на удаление
+        victims = []
+        while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            victims.append(self._path(key))
+        self.stats["evicted_files"] += len(victims)
+        return victims
+
+    @staticmethod
+    def _stale(path, age=600.0):
+        try:
+            return time.time() - os.path.getmtime(path) > age
+        except OSError:
+            return False
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except OSError:
+            # Файл занят (memmap на Windows) или уже удалён — не страшно
+            pass
+
+    def _remove(self, paths):
+        for path in paths:
+            self._unlink(path)
+
+    def _remember(self, key, audio):
+        # Вызывается под self._lock
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = audio
+        self._memory_bytes += audio.nbytes
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= old.nbytes
+
+    def get(self, text, speaker, sample_rate):
+        """
+        Возвращает аудио из кэша или None.
+        """
+        key = self._key(text, speaker, sample_rate)
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return audio
+        path = self._path(key)
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            audio = np.memmap(path, dtype=np.float32, mode="r")
+            try:
+                # Время изменения хранит порядок LRU между запусками
+                os.utime(path)
+            except OSError:
+                pass
+            with self._lock:
+                self._remember(key, audio)
+                self._touch_disk(key, audio.nbytes)
+                self.stats["disk_hits"] += 1
+            return audio
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, text, speaker, sample_rate, audio):
+        """
+        Сохраняет аудио в оба уровня кэша; на диске вытесняются давно
+        не использованные фразы.
+        """
+        key = self._key(text, speaker, sample_rate)
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        # Атомарная запись: недописанный файл никогда не попадёт в кэш
+        audio.tofile(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, audio)
+            self._touch_disk(key, audio.nbytes)
+            victims = self._evict_disk()
+        self._remove(victims)
+        return audio
+
+    def get_or_render(self, text, speaker, sample_rate, render):
+        """
+        Возвращает аудио из кэша, а при промахе синтезирует его через render(text).
+        """
+        audio = self.get(text, speaker, sample_rate)
+        if audio is None:
+            audio = self.put(text, speaker, sample_rate, render(text))
+        return audio
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
@@ -0,0 +1,22 @@
+"""
+Загрузка модели Silero без побочных эффектов при импорте: модуль нужен
+процессам пула синтеза (tts_pool.py), которым незачем тянуть voice.py
+с его кэшем, выводом звука и метриками.
+"""
+import os
+
+model_url = "https://models.silero.ai/models/tts/ru/v4_ru.pt"
+
+
+def load(path, threads):
+    """
+    Загружает модель из path (при необходимости скачивает её) на CPU.
+    """
+    import torch
+
+    torch.set_num_threads(threads)
+    if not os.path.isfile(path):
+        torch.hub.download_url_to_file(model_url, path)
+    model = torch.package.PackageImporter(path).load_pickle("tts_models", "model")
+    model.to(torch.device('cpu'))
+    return model
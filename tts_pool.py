@@ -0,0 +1,226 @@
+import os
+import time
+import heapq
+import signal
+import logging
+import threading
+import itertools
+import multiprocessing
+from concurrent.futures import Future
+
+import tts_batch
+import tts_model
+
+logger = logging.getLogger('sonya_assistant_gui')
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def auto_workers(threads_per_worker, reserved_cores=1):
+    """
+    Число процессов синтеза по доступным ядрам; reserved_cores остаётся
+    под Vosk и цикл событий.
+    """
+    return max(1, (available_cores() - reserved_cores) // threads_per_worker)
+
+
+def _worker_main(conn, threads, model_file):
+    # Процесс загружает модель сам: родитель к этому моменту многопоточный
+    # (Qt, цикл событий, пулы), и fork от него мог бы унести чужие блокировки.
+    # voice.py не импортируется: его кэш, вывод звука и метрики здесь не нужны
+    import torch
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    model = tts_model.load(model_file, threads)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        texts, speaker, sample_rate = job
+        # Счётчики tts_batch.stats живут в этом процессе: родителю уходит их прирост
+        before = dict(tts_batch.stats)
+        try:
+            with torch.inference_mode():
+                start = time.perf_counter()
+                audios = tts_batch.synthesize_batch(model, texts, speaker, sample_rate)
+                seconds = time.perf_counter() - start
+            result = ("ok", audios, seconds)
+        except Exception as e:
+            result = ("error", f"{type(e).__name__}: {e}", 0.0)
+        conn.send(result + ({key: tts_batch.stats[key] - before[key] for key in before},))
+
+
+class _Job:
+    def __init__(self, text, speaker, sample_rate):
+        self.text = text
+        self.speaker = speaker
+        self.sample_rate = sample_rate
+        self.future = Future()
+
+
+class TTSPool:
+    """
+    Пул процессов синтеза Silero.
+
+    Каждый процесс — своя копия модели со своим числом потоков torch, так что
+    синтез не упирается в GIL и не делит ядра с Vosk как попало. Процессы
+    порождаются через forkserver (где его нет — spawn): сервер запускается
+    чистым однопоточным процессом с уже импортированным torch, и процессы,
+    в том числе перезапущенные после падения, не наследуют потоки и
+    блокировки многопоточного родителя.
+
+    Задания ждут в общей очереди с приоритетом: меньше — раньше, по умолчанию
+    приоритет — длина текста, так что короткие фразы обгоняют длинные ответы.
+    Задание уходит только свободному процессу, поэтому очередь не застревает
+    в каналах отдельных процессов.
+
+    Свободный процесс забирает из очереди до max_batch фраз того же голоса,
+    подождав новые не дольше batch_window секунд, и синтезирует их одним
+    вызовом модели (tts_batch.py). stats — счётчики tts_batch.stats,
+    сложенные по всем процессам.
+    """
+
+    def __init__(self, workers=None, threads_per_worker=2, start_method=None,
+                 batch_window=0.0, max_batch=1, model_file="model.pt"):
+        self.threads = threads_per_worker
+        self.model_file = model_file
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.size = workers or auto_workers(threads_per_worker)
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            # Импорт torch один раз в сервере, а не в каждом процессе
+            self._context.set_forkserver_preload(["torch", "tts_batch", "tts_model"])
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats = {key: 0 for key in tts_batch.stats}
+        self._stats_lock = threading.Lock()
+        self._workers = [self._spawn(index) for index in range(self.size)]
+        self._dispatchers = []
+        for index in range(self.size):
+            thread = threading.Thread(target=self._dispatch, args=(index,),
+                                      name=f"tts-dispatch-{index}", daemon=True)
+            thread.start()
+            self._dispatchers.append(thread)
+        logger.info(f"Пул TTS: {self.size} процессов × {self.threads} потоков ({start_method})")
+
+    def _spawn(self, index):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_conn, self.threads, self.model_file),
+                                        name=f"tts-worker-{index}", daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def submit(self, text, speaker, sample_rate, priority=None):
+        """
+        Ставит фразу в очередь, возвращает concurrent.futures.Future с (аудио, время синтеза).
+        """
+        job = _Job(text, speaker, sample_rate)
+        if priority is None:
+            priority = len(text)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Пул TTS закрыт")
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+            self._cond.notify()
+        return job.future
+
+    def synthesize(self, text, speaker, sample_rate, priority=None):
+        """
+        Синхронный вариант submit: ждёт результат.
+        """
+        return self.submit(text, speaker, sample_rate, priority).result()
+
+    def pending(self):
+        return len(self._heap)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._heap and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            batch = [heapq.heappop(self._heap)[2]]
+            key = (batch[0].speaker, batch[0].sample_rate)
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                if self._heap:
+                    job = self._heap[0][2]
+                    if (job.speaker, job.sample_rate) != key:
+                        break
+                    batch.append(heapq.heappop(self._heap)[2])
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _dispatch(self, index):
+        # Поток-диспетчер владеет одним процессом и перезапускает его при падении
+        process, conn = self._workers[index]
+        try:
+            while (batch := self._next_batch()) is not None:
+                batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                try:
+                    conn.send(([job.text for job in batch], batch[0].speaker, batch[0].sample_rate))
+                    status, value, seconds, stats = conn.recv()
+                except (EOFError, OSError) as e:
+                    for job in batch:
+                        job.future.set_exception(RuntimeError(f"Процесс TTS упал: {e}"))
+                    logger.error(f"Процесс TTS {index} упал, перезапуск")
+                    conn.close()
+                    process.join(timeout=1)
+                    process, conn = self._workers[index] = self._spawn(index)
+                    continue
+                with self._stats_lock:
+                    for key, count in stats.items():
+                        self.stats[key] = self.stats.get(key, 0) + count
+                if status != "ok":
+                    for job in batch:
+                        job.future.set_exception(RuntimeError(value))
+                    continue
+                # Время пакета делим между фразами пропорционально длине аудио
+                total = sum(len(audio) for audio in value) or 1
+                for job, audio in zip(batch, value):
+                    job.future.set_result((audio, seconds * len(audio) / total))
+        finally:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+            conn.close()
+            process.join(timeout=1)
+
+    def close(self, timeout=2.0):
+        """
+        Останавливает пул не дольше чем за timeout: ещё не начатые фразы
+        отменяются, процессы, не успевшие досинтезировать, завершаются.
+        """
+        with self._cond:
+            self._closed = True
+            pending, self._heap = self._heap, []
+            self._cond.notify_all()
+        for _, _, job in pending:
+            job.future.cancel()
+        deadline = time.monotonic() + timeout
+        for thread in self._dispatchers:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        for process, _ in self._workers:
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,117 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class VADGate:
+    """
+    Лёгкий детектор речи перед Vosk: в тишине блоки не декодируются.
+
+    Каждый блок режется на кадры по frame_ms; для кадра считаются энергия (дБ)
+    и спектральная плоскостность (у шума спектр ровный, у голоса — с
+    формантами и гармониками). Кадр — речь, если энергия выше уровня шума на
+    margin_db и спектр не плоский. Уровень шума подстраивается по кадрам без
+    речи: быстро вниз, медленно вверх.
+
+    Блок пропускается, если в нём меньше min_speech_frames речевых кадров и
+    после последней речи прошло больше hangover_ms. Хвост тишины нужен
+    эндпойнтеру Vosk, чтобы закрыть фразу, поэтому hangover_ms должен быть
+    больше его паузы. При открытии в распознаватель сначала уходит pre-roll —
+    последние preroll_ms перед речью, чтобы не срезать её начало.
+    """
+
+    def __init__(self, samplerate, frame_ms=20, preroll_ms=300, hangover_ms=800,
+                 margin_db=9.0, flatness_max=0.45, min_speech_frames=2, floor_db=-70.0):
+        self.samplerate = samplerate
+        self.frame = int(samplerate * frame_ms / 1000)
+        self.preroll = int(samplerate * preroll_ms / 1000)
+        self.hangover = hangover_ms / 1000
+        self.margin_db = margin_db
+        self.flatness_max = flatness_max
+        self.min_speech_frames = min_speech_frames
+        self.min_floor_db = floor_db
+        self.noise_db = None
+        self._window = np.hanning(self.frame).astype(np.float32)
+        self._recent = deque()  # блоки тишины для pre-roll
+        self._recent_samples = 0
+        self._silence = self.hangover  # секунд с последней речи
+        self.open = False
+        self.stats = {"audio_seconds": 0.0, "skipped_seconds": 0.0, "vad_seconds": 0.0}
+
+    def _features(self, samples):
+        count = len(samples) // self.frame
+        if not count:
+            return np.empty(0), np.empty(0)
+        frames = samples[:count * self.frame].reshape(count, self.frame).astype(np.float32) / 32768.0
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        return energy_db, flatness
+
+    def _speech_frames(self, energy_db, flatness):
+        if self.noise_db is None and len(energy_db):
+            self.noise_db = max(float(np.min(energy_db)), self.min_floor_db)
+        speech = 0
+        for energy, flat in zip(energy_db, flatness):
+            if energy > self.noise_db + self.margin_db and flat < self.flatness_max:
+                speech += 1
+            elif energy < self.noise_db:
+                self.noise_db += 0.2 * (energy - self.noise_db)
+            else:
+                self.noise_db += 0.02 * (energy - self.noise_db)
+            self.noise_db = max(self.noise_db, self.min_floor_db)
+        return speech
+
+    def speech_frames(self, samples):
+        """
+        Число речевых кадров в блоке int16 (без учёта pre-roll и hangover).
+        """
+        return self._speech_frames(*self._features(samples))
+
+    def process(self, data):
+        """
+        Принимает блок int16 (bytes или массив), возвращает байты для
+        распознавателя (с pre-roll при открытии) или None, если блок пропущен.
+        """
+        start = time.process_time()
+        samples = np.frombuffer(data, dtype=np.int16) if isinstance(data, (bytes, bytearray)) \
+            else np.asarray(data, dtype=np.int16).reshape(-1)
+        seconds = len(samples) / self.samplerate
+        self.stats["audio_seconds"] += seconds
+        speech = self.speech_frames(samples)
+        if speech >= self.min_speech_frames:
+            self._silence = 0.0
+        else:
+            self._silence += seconds
+        was_open = self.open
+        self.open = self._silence < self.hangover + seconds
+        if not self.open:
+            self._remember(samples)
+            self.stats["skipped_seconds"] += seconds
+            self.stats["vad_seconds"] += time.process_time() - start
+            return None
+        out = samples.tobytes()
+        if not was_open and self._recent:
+            out = np.concatenate(list(self._recent)).tobytes()[-self.preroll * 2:] + out
+            self.stats["skipped_seconds"] -= min(self._recent_samples, self.preroll) / self.samplerate
+            self._recent.clear()
+            self._recent_samples = 0
+        self.stats["vad_seconds"] += time.process_time() - start
+        return out
+
+    def _remember(self, samples):
+        self._recent.append(samples.copy())
+        self._recent_samples += len(samples)
+        while self._recent and self._recent_samples - len(self._recent[0]) >= self.preroll:
+            self._recent_samples -= len(self._recent.popleft())
+
+    def skipped_fraction(self):
+        total = self.stats["audio_seconds"]
+        return self.stats["skipped_seconds"] / total if total else 0.0
+
+    def reset(self):
+        self._recent.clear()
+        self._recent_samples = 0
+        self._silence = self.hangover
+        self.open = False
@@ -1,29 +1,280 @@
-import os
-import torch
+import re
+import asyncio
+import threading
+import logging
 import time
-import sounddevice as sd
+import startup
+import metrics
+import concurrency
+import tts_model
+from tts_cache import TTSCache
+from tts_pool import TTSPool
+from playback import PlaybackEngine
 
-device = torch.device('cpu')
-torch.set_num_threads(4)
-local_file = "model.pt"
+logger = logging.getLogger('sonya_assistant_gui')
 
-if not os.path.isfile(local_file):
-    torch.hub.download_url_to_file("https://models.silero.ai/models/tts/ru/v4_ru.pt",
-                                   local_file)
+local_file = "model.pt"
+# Модель грузится лениво (load_model), torch импортируется там же
+model = None
+# Потоки torch при синтезе в этом процессе
+torch_threads = 4
 
-model = torch.package.PackageImporter(
-    local_file).load_pickle("tts_models", "model")
-model.to(device)
+# Пул процессов синтеза (tts_pool.py): None — по числу ядер, 0 — синтез в этом процессе
+tts_workers = None
+tts_threads = 2  # потоков torch на процесс пула
+# Пакетный синтез в пуле: окно ожидания (с) и максимум фраз в пакете
+tts_batch_window = 0.01
+tts_max_batch = 4
+pool = None
+_pool_lock = threading.Lock()
 
 sample_rate = 48000
 speaker = 'baya'
+# Речь проигрывается чуть быстрее синтезированной
+playback_speed = 1.05
 
+# Вывод звука (playback.py): один поток на всё время работы; None — устройство по умолчанию,
+# "null" — без звуковой карты (замеры)
+output_device = None
+output = None
+_output_lock = threading.Lock()
 
-def bot_speak(text):
-    audio = model.apply_tts(text=text,
-                            speaker=speaker,
-                            sample_rate=sample_rate)
+tts_rtf = metrics.histogram(
+    "sonya_tts_rtf", "RTF синтеза: время синтеза / длительность аудио", metrics.ratio_buckets)
+playback_backlog_seconds = metrics.gauge(
+    "sonya_playback_backlog_seconds", "Синтезированное, но ещё не проигранное аудио, с")
+
+# Кэш синтезированных фраз (память + диск)
+cache = TTSCache("tts_cache")
+# Модель Silero не рассчитана на одновременные вызовы из разных потоков
+_model_lock = threading.Lock()
+
+# Граница предложения: знак конца предложения + пробелы
+_sentence_end = re.compile(r'(?<=[.!?…])\s+')
+
+# Одновременно говорит только одна реплика
+_speak_lock = asyncio.Lock()
+
+
+def split_sentences(text):
+    """
+    Разбивает текст на предложения для потокового синтеза.
+    """
+    return [s.strip() for s in _sentence_end.split(text) if s.strip()]
+
+
+def load_model():
+    """
+    Загружает модель Silero (при необходимости скачивает её).
+    Безопасно вызывать повторно и из разных потоков.
+    """
+    global model
+    with _model_lock:
+        if model is None:
+            model = tts_model.load(local_file, torch_threads)
+        return model
+
+
+def start_pool():
+    """
+    Запускает пул процессов синтеза (если tts_workers != 0), иначе загружает
+    модель в этот процесс. Процессы пула загружают модель сами.
+    """
+    global pool
+    if tts_workers == 0:
+        return load_model()
+    with _pool_lock:
+        if pool is None:
+            pool = TTSPool(tts_workers, tts_threads, model_file=local_file,
+                           batch_window=tts_batch_window, max_batch=tts_max_batch)
+    return pool
+
+
+def _render(text):
+    if pool is not None:
+        audio, seconds = pool.synthesize(text, speaker, sample_rate)
+    else:
+        load_model()
+        with _model_lock:
+            start = time.perf_counter()
+            audio = model.apply_tts(text=text,
+                                    speaker=speaker,
+                                    sample_rate=sample_rate)
+            seconds = time.perf_counter() - start
+    if len(audio):
+        tts_rtf.observe(seconds / (len(audio) / sample_rate))
+    return audio
+
+
+def synthesize(text):
+    """
+    Синтезирует один фрагмент текста (с учётом кэша) и возвращает аудио.
+    """
+    return cache.get_or_render(text, speaker, sample_rate, _render)
+
+
+def warm_up(phrases, stop=None):
+    """
+    Заранее синтезирует фиксированные фразы, чтобы они попали в кэш.
+    stop (threading.Event) прерывает прогрев между предложениями.
+    """
+    for phrase in phrases:
+        for sentence in split_sentences(phrase):
+            if stop is not None and stop.is_set():
+                return
+            synthesize(sentence)
+    logger.info(f"Кэш TTS прогрет: {cache.stats}")
+
+
+async def warm_up_async(phrases):
+    """
+    warm_up в пуле tts. При отмене прогрев останавливается, а корутина
+    дожидается текущего предложения: после неё пул TTS можно закрывать.
+    """
+    stop = threading.Event()
+    future = asyncio.get_running_loop().run_in_executor(
+        concurrency.executors["tts"], warm_up, phrases, stop)
+    try:
+        await asyncio.shield(future)
+    except asyncio.CancelledError:
+        stop.set()
+        await asyncio.wait([future])
+        raise
 
-    sd.play(audio, sample_rate * 1.05)
-    time.sleep((len(audio) / sample_rate) + 0.5)
-    sd.stop()
+
+def get_output():
+    """
+    Выходной поток, открываемый при первом звуке и больше не закрываемый.
+    """
+    global output
+    with _output_lock:
+        if output is None:
+            output = PlaybackEngine(device=output_device)
+        return output
+
+
+def _play_blocking(audio):
+    # Выполняется в потоке исполнителя, а не в цикле событий
+    get_output().play(audio, sample_rate, playback_speed)
+
+
+# Функция воспроизведения по умолчанию (можно подменить, например, «немым» выводом)
+play_audio = _play_blocking
+
+
+async def _sentences(text_chunks):
+    # Собирает предложения из потока фрагментов текста по мере их прихода
+    buffer = ""
+    async for piece in text_chunks:
+        buffer += piece
+        # Всё до последней границы предложения — готовые предложения
+        *sentences, buffer = _sentence_end.split(buffer)
+        for sentence in sentences:
+            if sentence.strip():
+                yield sentence.strip()
+    if buffer.strip():
+        yield buffer.strip()
+
+
+async def _single(text):
+    yield text
+
+
+async def speak_stream(text_chunks, play=None, on_audio=None, lock=None):
+    """
+    Потоковое озвучивание асинхронного потока фрагментов текста (например,
+    токенов LLM). Текст режется на предложения, следующее предложение
+    синтезируется, пока играет текущее. Корутина завершается, когда
+    отыграл последний фрагмент. play(audio) — блокирующая функция
+    воспроизведения, по умолчанию play_audio; on_audio(audio) вызывается
+    перед началом каждого фрагмента. lock не даёт двум ответам звучать
+    одновременно в одном выводе; по умолчанию — общий для звуковой карты.
+    Вывод по умолчанию получает следующий фрагмент, пока звучит текущий, —
+    фразы идут без щелей. При отмене вывод обрывается сразу: для вывода по
+    умолчанию — с коротким затуханием, для своего — play.stop(), если он есть.
+    """
+    play = play or play_audio
+    loop = asyncio.get_running_loop()
+    engine = get_output() if play is _play_blocking else None
+    # Очередь на один фрагмент: синтез опережает воспроизведение ровно на шаг
+    chunks = asyncio.Queue(maxsize=1)
+
+    def render(sentence):
+        # Синтез и передискретизация под скорость и частоту вывода — в пуле tts
+        audio = synthesize(sentence)
+        frames = engine.prepare_speech(audio, sample_rate, playback_speed) if engine is not None else None
+        return audio, frames
+
+    async def produce():
+        try:
+            async for sentence in _sentences(text_chunks):
+                audio, frames = await loop.run_in_executor(concurrency.executors["tts"], render, sentence)
+                playback_backlog_seconds.inc(len(audio) / sample_rate)
+                await chunks.put((audio, frames))
+        except Exception as e:
+            # Ошибку синтеза передаём потребителю через ту же очередь
+            await chunks.put(e)
+            return
+        await chunks.put(None)
+
+    async def finished(handle, audio):
+        try:
+            await loop.run_in_executor(concurrency.executors["audio"], handle.wait)
+        finally:
+            playback_backlog_seconds.dec(len(audio) / sample_rate)
+
+    async with lock or _speak_lock:
+        producer = asyncio.create_task(produce())
+        queued = []  # (Playback, аудио) в очереди вывода
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                audio, frames = chunk
+                startup.timer.mark_once("first_audio")
+                if engine is None:
+                    if on_audio is not None:
+                        on_audio(audio)
+                    try:
+                        await loop.run_in_executor(concurrency.executors["audio"], play, audio)
+                    finally:
+                        playback_backlog_seconds.dec(len(audio) / sample_rate)
+                    continue
+                # Фрагмент встаёт в очередь, пока звучит предыдущий, и начнётся сразу за ним
+                queued.append((engine.enqueue(frames), audio))
+                if len(queued) > 1:
+                    await finished(*queued.pop(0))
+                if on_audio is not None:
+                    on_audio(audio)
+            while queued:
+                await finished(*queued.pop(0))
+        except asyncio.CancelledError:
+            if engine is not None:
+                engine.stop()
+            elif hasattr(play, "stop"):
+                play.stop()
+            raise
+        finally:
+            for _, audio in queued:
+                playback_backlog_seconds.dec(len(audio) / sample_rate)
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            # Синтезированное, но так и не взятое из очереди
+            while not chunks.empty():
+                chunk = chunks.get_nowait()
+                if chunk is not None and not isinstance(chunk, Exception):
+                    playback_backlog_seconds.dec(len(chunk[0]) / sample_rate)
+
+
+async def speak_async(text, play=None, on_audio=None, lock=None):
+    """
+    Озвучивает готовый текст через speak_stream.
+    """
+    await speak_stream(_single(text), play=play, on_audio=on_audio, lock=lock)
+
+
+def bot_speak(text):
+    _play_blocking(synthesize(text))
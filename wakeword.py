@@ -0,0 +1,74 @@
+import json
+
+import vosk
+
+# Варианты имени, которые понимает словарь русской модели
+wake_words = ["соня", "сонька", "сонечка"]
+
+
+class WakeWordDetector:
+    """
+    Отдельная ступень поиска wake word перед основным распознавателем.
+
+    Это KaldiRecognizer с грамматикой только из вариантов имени и [unk]:
+    декодировать такой граф намного дешевле, чем полный словарь.
+    Чувствительность sensitivity (0..1) задаёт порог уверенности слова:
+    чем выше чувствительность, тем ниже порог.
+
+    С use_partial детектор срабатывает, не дожидаясь конца фразы. В
+    частичном результате уверенности нет, поэтому чувствительность задаёт
+    там, сколько блоков подряд имя должно продержаться в нём (partial_blocks):
+    случайное созвучие Vosk обычно исправляет уже в следующем блоке.
+    """
+
+    def __init__(self, model, samplerate, words=None, sensitivity=0.5, use_partial=False):
+        self.words = list(words or wake_words)
+        self.sensitivity = sensitivity
+        self.use_partial = use_partial
+        self._partial_hits = 0
+        grammar = json.dumps(self.words + ["[unk]"], ensure_ascii=False)
+        self.rec = vosk.KaldiRecognizer(model, samplerate, grammar)
+        self.rec.SetWords(True)
+
+    @property
+    def min_confidence(self):
+        return 1.0 - self.sensitivity
+
+    @property
+    def partial_blocks(self):
+        # 1.0 и 0.75 — с первого блока, 0.5 — два подряд, 0.25 — три, 0 — четыре
+        return max(1, round((1.0 - self.sensitivity) * 4))
+
+    def accept(self, data) -> bool:
+        """
+        Подаёт блок аудио, возвращает True при срабатывании.
+        """
+        if self.rec.AcceptWaveform(data):
+            self._partial_hits = 0
+            return self._matches(json.loads(self.rec.Result()))
+        if self.use_partial:
+            partial = json.loads(self.rec.PartialResult())["partial"]
+            if any(word in self.words for word in partial.split()):
+                self._partial_hits += 1
+            else:
+                self._partial_hits = 0
+            if self._partial_hits >= self.partial_blocks:
+                self._partial_hits = 0
+                return True
+        return False
+
+    def finish(self) -> bool:
+        """
+        Завершает поток (конец записи) и проверяет последнюю фразу.
+        """
+        return self._matches(json.loads(self.rec.FinalResult()))
+
+    def _matches(self, result) -> bool:
+        return any(
+            word["word"] in self.words and word.get("conf", 1.0) >= self.min_confidence
+            for word in result.get("result", [])
+        )
+
+    def reset(self):
+        self._partial_hits = 0
+        self.rec.Reset()